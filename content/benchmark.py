@@ -0,0 +1,671 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+from collections import defaultdict
+from functools import partial
+from tempfile import TemporaryDirectory, mkdtemp
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Optional
+
+from bs4 import BeautifulSoup
+from rich.table import Table
+
+from .character_definitions import (
+    CharacterEnrichment,
+    get_character_enrichments,
+    hash_character_definitions,
+    merge_definitions,
+    sort_enrich_files,
+)
+from .common import batched_writes, configure_logging, get_console, write_json
+from .external_merge import ExternalMerge
+from .glossary_linker import GlossaryAutomaton, find_terms_naively
+from .http_cache import HttpCache
+from .metrics import Metrics
+from .page_archive import PageArchive
+from .page_index import PageIndex, SearchingPageIndex
+from .scrape_stream import PAGE_KIND_TO_EXTRACTOR, classify_page
+from .scrape_wiki import (
+    CHARACTER_PAGE,
+    CHARACTER_REGIONS,
+    GAME_INFORMATION_PAGE,
+    PARSERS,
+    PageExtractor,
+    get_http_cache_dir,
+    join_text,
+    parse_page,
+)
+
+console = get_console()
+
+# modules whose import dominates how fast their command line starts
+STARTUP_MODULES = ("enrich_characters", "scrape_wiki")
+NUM_REPEATS = 5
+NUM_SYNTHETIC_SECTIONS = 2000
+NUM_SYNTHETIC_DEFINITIONS = 10000
+NUM_SYNTHETIC_ENRICH_FILES = 100
+# number of enrich files contributing to each synthetic character
+NUM_SYNTHETIC_LAYERS = 4
+# runs the external merge benchmark spills synthetic definitions into
+NUM_SYNTHETIC_RUNS = 10
+NUM_SYNTHETIC_GLOSSARY_TERMS = 1000
+NUM_SYNTHETIC_TEXTS = 20
+REGRESSION_THRESHOLD = 0.25
+
+RecordedPage = tuple[str, str, str]
+
+
+class Benchmark(NamedTuple):
+    """A repeatable action processing `items` units"""
+
+    name: str
+    action: Callable[[], Any]
+    items: int
+    unit: str
+
+
+class BenchmarkResult(NamedTuple):
+    """Best wall time and peak traced memory of a benchmark"""
+
+    name: str
+    items: int
+    unit: str
+    seconds: float
+    peak_bytes: int
+
+    @property
+    def throughput(self) -> float:
+        """Units processed per second"""
+        return self.items / self.seconds if self.seconds > 0 else float("inf")
+
+
+def _iter_classified_pages(
+    pages: Iterable[tuple[str, str]], parser: str
+) -> Iterator[RecordedPage]:
+    for url, page_text in pages:
+        page_kind = classify_page(PageIndex(parse_page(page_text, CHARACTER_REGIONS, parser)))
+        if page_kind is not None:
+            yield page_kind, url, page_text
+
+
+def iter_recorded_pages(
+    cache_dirpath: Optional[str] = None,
+    archive_filepath: Optional[str] = None,
+    parser: str = "html.parser",
+) -> Iterator[RecordedPage]:
+    """Iterate over (kind, url, page text) of pages in the archive when given
+
+    Otherwise iterate over pages in the HTTP cache that some output was written from.
+    """
+    if archive_filepath is not None:
+        with PageArchive(archive_filepath) as page_archive:
+            yield from _iter_classified_pages(
+                ((url, page_archive.get(url)) for url in page_archive.get_urls()), parser
+            )
+        return
+
+    http_cache = HttpCache(cache_dirpath or get_http_cache_dir(), offline=True)
+    yield from _iter_classified_pages(
+        (
+            (entry["url"], entry["body"])
+            for entry in http_cache.iter_entries()
+            if entry.get("output")
+        ),
+        parser,
+    )
+
+
+def _measure_best(action: Callable[[], Any], repeats: int) -> tuple[float, Any]:
+    """Best wall time of the action over repeats, along with its last result"""
+    best_seconds = float("inf")
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = action()
+        best_seconds = min(best_seconds, time.perf_counter() - start)
+    return best_seconds, result
+
+
+def _measure_peak_memory(action: Callable[[], Any]) -> int:
+    """Peak bytes allocated by Python while running the action once"""
+    tracemalloc.start()
+    try:
+        action()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _search_and_extract(extractor: PageExtractor, soup: BeautifulSoup, url: str) -> Any:
+    return extractor.extract(SearchingPageIndex(soup), url)
+
+
+def benchmark_extraction(
+    recorded_pages: Iterable[RecordedPage],
+    parser: str = "html.parser",
+    repeats: int = NUM_REPEATS,
+) -> Metrics:
+    """Time parsing, indexing and extracting every recorded page, keeping the best of repeats
+
+    Extracting while searching the tree, the way pages were extracted before they were
+    indexed, is timed on the same pages as the baseline.
+    """
+    benchmark_metrics = Metrics()
+    benchmark_metrics.enabled = True
+
+    for page_kind, url, page_text in recorded_pages:
+        extractor: PageExtractor = PAGE_KIND_TO_EXTRACTOR[page_kind]
+        parse_seconds, soup = _measure_best(
+            partial(parse_page, page_text, extractor.regions, parser), repeats
+        )
+        index_seconds, index = _measure_best(partial(PageIndex, soup), repeats)
+        extract_seconds, _ = _measure_best(partial(extractor.extract, index, url), repeats)
+        search_seconds, _ = _measure_best(
+            partial(_search_and_extract, extractor, soup, url), repeats
+        )
+
+        benchmark_metrics.record(
+            "parse", parse_seconds, url=url, bytes=len(page_text.encode("utf-8"))
+        )
+        benchmark_metrics.record("index", index_seconds, url=url)
+        benchmark_metrics.record(f"extract {page_kind}", extract_seconds, url=url)
+        benchmark_metrics.record("index + extract", index_seconds + extract_seconds, url=url)
+        benchmark_metrics.record("search + extract", search_seconds, url=url)
+
+    return benchmark_metrics
+
+
+def _extract_recorded_pages(
+    pages: list[tuple[str, str]],
+    extractor: PageExtractor,
+    parser: str,
+    index_class: type[PageIndex] = PageIndex,
+) -> None:
+    for url, page_text in pages:
+        extractor.extract(index_class(parse_page(page_text, extractor.regions, parser)), url)
+
+
+def _get_recorded_page_benchmarks(
+    recorded_pages: Iterable[RecordedPage], parser: str
+) -> Iterator[Benchmark]:
+    page_kind_to_pages: dict[str, list[tuple[str, str]]] = defaultdict(list)
+    for page_kind, url, page_text in recorded_pages:
+        page_kind_to_pages[page_kind].append((url, page_text))
+
+    for page_kind, pages in sorted(page_kind_to_pages.items()):
+        yield Benchmark(
+            f"recorded {page_kind} pages",
+            partial(_extract_recorded_pages, pages, PAGE_KIND_TO_EXTRACTOR[page_kind], parser),
+            len(pages),
+            "pages",
+        )
+        yield Benchmark(
+            f"recorded {page_kind} pages searched",
+            partial(
+                _extract_recorded_pages,
+                pages,
+                PAGE_KIND_TO_EXTRACTOR[page_kind],
+                parser,
+                SearchingPageIndex,
+            ),
+            len(pages),
+            "pages",
+        )
+
+
+def _make_synthetic_sections(num_sections: int) -> str:
+    return "".join(
+        f'<h2><span class="mw-headline" id="Section_{i}">Section {i}</span></h2>'
+        f"<p>Section {i} explains when a player is <b>drunk</b> or poisoned.</p>"
+        f'<p>It also links <a href="/wiki/Glossary">the glossary</a>.</p>'
+        f"<ul><li>Tip {i}</li></ul>"
+        for i in range(num_sections)
+    )
+
+
+def make_synthetic_game_information_page(num_sections: int) -> str:
+    """Make a game information page with `num_sections` sections"""
+    return (
+        '<html><body><div id="content"><h1>Synthetic Rules</h1><div id="bodyContent">'
+        f'<div id="toc">Contents</div>{_make_synthetic_sections(num_sections)}'
+        "</div></div></body></html>"
+    )
+
+
+def make_synthetic_character_page(num_sections: int) -> str:
+    """Make a character page with `num_sections` tip sections"""
+    return (
+        '<html><body><div id="content"><h1>Synthetic Character</h1><div id="bodyContent">'
+        '<div>"I don\'t exist."</div>'
+        '<h2><span id="Appears_in">Appears in</span></h2><div><a title="Synthetic">S</a></div>'
+        '<p>"The Synthetic Character only exists in benchmarks."</p><div id="toc">Contents</div>'
+        '<h2><span id="Character_Text">Character Text</span></h2><p>"Each night, do it."</p>'
+        '<h2><span id="Example_Gameplay">Example Gameplay</span></h2>'
+        '<div class="row">Example one.</div><div class="row">Example two.</div>'
+        f"{_make_synthetic_sections(num_sections)}</div>"
+        '<div id="categories"><a title="Category:Synthetic">Synthetic</a> '
+        '<a title="Category:Townsfolk">Townsfolk</a></div></div></body></html>'
+    )
+
+
+def _index_and_extract(extractor: PageExtractor, soup: BeautifulSoup) -> Any:
+    return extractor.extract(PageIndex(soup), "")
+
+
+def _get_synthetic_page_benchmarks(num_sections: int, parser: str) -> Iterator[Benchmark]:
+    for name, page_text, extractor in (
+        (
+            "synthetic game information page",
+            make_synthetic_game_information_page(num_sections),
+            GAME_INFORMATION_PAGE,
+        ),
+        (
+            "synthetic character page",
+            make_synthetic_character_page(num_sections),
+            CHARACTER_PAGE,
+        ),
+    ):
+        soup = parse_page(page_text, extractor.regions, parser)
+        yield Benchmark(
+            f"{name} parse", partial(parse_page, page_text, extractor.regions, parser), 1, "pages"
+        )
+        yield Benchmark(
+            f"{name} index + extract",
+            partial(_index_and_extract, extractor, soup),
+            num_sections,
+            "sections",
+        )
+        yield Benchmark(
+            f"{name} search + extract",
+            partial(_search_and_extract, extractor, soup, ""),
+            num_sections,
+            "sections",
+        )
+
+    paragraphs = parse_page(
+        make_synthetic_game_information_page(num_sections), parser=parser
+    ).find_all("p")
+    yield Benchmark("join text", partial(join_text, paragraphs), len(paragraphs), "paragraphs")
+
+
+def write_synthetic_enrich_files(
+    enrich_dirpath: str, num_definitions: int, num_files: int
+) -> list[str]:
+    """Spread definitions over enrich files, each character defined in several of them"""
+    num_characters = max(num_definitions // NUM_SYNTHETIC_LAYERS, 1)
+    enrich_files = []
+    for file_index in range(num_files):
+        character_definitions = [
+            {
+                "id": f"character{definition_index % num_characters}",
+                f"field{file_index}": f"Value from enrich{file_index}.json",
+                "ability": f"Ability revision {file_index} of character {definition_index}.",
+                "tips": {"Bluffing": f"Tip {definition_index}", "Fighting": "Stay alive."},
+            }
+            for definition_index in range(file_index, num_definitions, num_files)
+        ]
+        enrich_file = os.path.join(enrich_dirpath, f"enrich{file_index}.json")
+        with open(enrich_file, "w", encoding="utf-8") as file_writer:
+            json.dump(character_definitions, file_writer)
+        enrich_files.append(enrich_file)
+    return enrich_files
+
+
+def _hash_enrichments(character_enrichments: Iterable[CharacterEnrichment]) -> None:
+    for character_enrichment in character_enrichments:
+        hash_character_definitions(character_enrichment)
+
+
+def _merge_externally(enrich_files: list[str], dirpath: str, run_size: int) -> None:
+    """Merge definitions through runs spilled into a fresh directory"""
+    for _ in ExternalMerge(mkdtemp(dir=dirpath), run_size).merge(enrich_files):
+        pass
+
+
+def _write_definitions(definitions: Iterable[Any], output_dirpath: str) -> None:
+    for definition in definitions:
+        write_json(os.path.join(output_dirpath, f'{definition["id"]}.json'), definition)
+
+
+def _write_new_definitions(
+    definitions: Iterable[Any], dirpath: str, batched: bool = False, compact: bool = False
+) -> None:
+    """Write definitions into a fresh directory, so none is skipped as unchanged"""
+    output_dirpath = mkdtemp(dir=dirpath)
+    if not batched:
+        _write_definitions(definitions, output_dirpath)
+        return
+    with batched_writes(compact):
+        _write_definitions(definitions, output_dirpath)
+
+
+def _get_enrichment_benchmarks(
+    dirpath: str, num_definitions: int, num_files: int
+) -> Iterator[Benchmark]:
+    enrich_dirpath = os.path.join(dirpath, "enrich")
+    output_dirpath = os.path.join(dirpath, "output")
+    os.makedirs(enrich_dirpath)
+    os.makedirs(output_dirpath)
+
+    enrich_files = write_synthetic_enrich_files(enrich_dirpath, num_definitions, num_files)
+    character_enrichments = list(get_character_enrichments(enrich_files))
+    definitions = list(merge_definitions(character_enrichments))
+
+    yield Benchmark(
+        "enrich read",
+        lambda: list(get_character_enrichments(enrich_files)),
+        num_definitions,
+        "definitions",
+    )
+    yield Benchmark(
+        "enrich hash",
+        partial(_hash_enrichments, character_enrichments),
+        num_definitions,
+        "definitions",
+    )
+    yield Benchmark(
+        "enrich merge",
+        lambda: list(merge_definitions(character_enrichments)),
+        num_definitions,
+        "definitions",
+    )
+    yield Benchmark(
+        "enrich external merge",
+        partial(
+            _merge_externally,
+            sort_enrich_files(enrich_files),
+            dirpath,
+            max(num_definitions // NUM_SYNTHETIC_RUNS, 1),
+        ),
+        num_definitions,
+        "definitions",
+    )
+    yield Benchmark(
+        "write_json",
+        partial(_write_new_definitions, definitions, dirpath),
+        len(definitions),
+        "files",
+    )
+    _write_definitions(definitions, output_dirpath)
+    yield Benchmark(
+        "write_json unchanged",
+        partial(_write_definitions, definitions, output_dirpath),
+        len(definitions),
+        "files",
+    )
+    yield Benchmark(
+        "write_json batched",
+        partial(_write_new_definitions, definitions, dirpath, batched=True),
+        len(definitions),
+        "files",
+    )
+    yield Benchmark(
+        "write_json batched compact",
+        partial(_write_new_definitions, definitions, dirpath, batched=True, compact=True),
+        len(definitions),
+        "files",
+    )
+
+
+def make_synthetic_glossary_terms(num_terms: int) -> list[str]:
+    """Make glossary terms, a third of which extend a shorter term"""
+    return [f"Rule {i // 3}" + " Exception" * (i % 3) for i in range(num_terms)]
+
+
+def make_synthetic_texts(terms: list[str], num_texts: int) -> list[str]:
+    """Make paragraphs mentioning a few of the terms each among plain words"""
+    return [
+        " ".join(
+            f"When a player follows {terms[(i * 7 + j) % len(terms)]}, the Storyteller "
+            f"checks rulebook {i} before the night ends."
+            for j in range(5)
+        )
+        for i in range(num_texts)
+    ]
+
+
+def _link_texts_naively(terms: list[str], texts: Iterable[str]) -> None:
+    for text in texts:
+        find_terms_naively(terms, text)
+
+
+def _get_glossary_benchmarks(num_terms: int, num_texts: int) -> Iterator[Benchmark]:
+    terms = make_synthetic_glossary_terms(num_terms)
+    texts = make_synthetic_texts(terms, num_texts)
+    automaton = GlossaryAutomaton(terms)
+
+    yield Benchmark(
+        "glossary automaton build", partial(GlossaryAutomaton, terms), num_terms, "terms"
+    )
+    yield Benchmark(
+        "glossary link automaton", lambda: list(map(automaton.find, texts)), num_texts, "texts"
+    )
+    yield Benchmark(
+        "glossary link naive", partial(_link_texts_naively, terms, texts), num_texts, "texts"
+    )
+
+
+def _run_python(code: str) -> None:
+    package_parent_dirpath = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=package_parent_dirpath)
+
+
+def _get_startup_benchmarks() -> Iterator[Benchmark]:
+    yield Benchmark("startup python", partial(_run_python, "pass"), 1, "starts")
+    for module in STARTUP_MODULES:
+        yield Benchmark(
+            f"startup {module}", partial(_run_python, f"import content.{module}"), 1, "starts"
+        )
+
+
+def run_benchmark(benchmark: Benchmark, repeats: int = NUM_REPEATS) -> BenchmarkResult:
+    """Run the benchmark for its best wall time, then once more traced for its peak memory
+
+    Each repeat loops the action for at least 0.2 seconds, so short actions are timed stably.
+    """
+    timer = timeit.Timer(benchmark.action)
+    number, _ = timer.autorange()
+    seconds = min(timer.repeat(repeats, number)) / number
+    peak_bytes = _measure_peak_memory(benchmark.action)
+    return BenchmarkResult(benchmark.name, benchmark.items, benchmark.unit, seconds, peak_bytes)
+
+
+def _get_regressions(
+    result: BenchmarkResult, baseline: Optional[dict[str, Any]], threshold: float
+) -> list[str]:
+    if baseline is None:
+        return []
+
+    regressions: list[str] = []
+    if result.throughput < baseline["throughput"] * (1 - threshold):
+        regressions.append(
+            f"throughput {result.throughput:,.1f} < {baseline['throughput']:,.1f} {result.unit}/s"
+        )
+    if result.peak_bytes > baseline["peakBytes"] * (1 + threshold):
+        regressions.append(f"peak memory {result.peak_bytes:,} > {baseline['peakBytes']:,} B")
+    return regressions
+
+
+def _format_change(current: float, previous: Optional[float]) -> str:
+    if not previous:
+        return ""
+    return f"{(current - previous) / previous:+.0%}"
+
+
+def report_results(
+    results: list[BenchmarkResult],
+    baselines: dict[str, dict[str, Any]],
+    threshold: float = REGRESSION_THRESHOLD,
+) -> list[str]:
+    """Print results against their baselines, returning regressions beyond the threshold"""
+    table = Table("Benchmark", "Items", "Best (s)", "Throughput", "Change", "Peak (MiB)", "Change")
+    regressions: list[str] = []
+    for result in results:
+        baseline = baselines.get(result.name)
+        if baseline is not None and baseline["items"] != result.items:
+            # throughput is only comparable over inputs of the same size
+            baseline = None
+        table.add_row(
+            result.name,
+            f"{result.items:,} {result.unit}",
+            f"{result.seconds:.4f}",
+            f"{result.throughput:,.1f}/s",
+            _format_change(
+                result.throughput, None if baseline is None else baseline["throughput"]
+            ),
+            f"{result.peak_bytes / 2**20:.2f}",
+            _format_change(result.peak_bytes, None if baseline is None else baseline["peakBytes"]),
+        )
+        regressions.extend(
+            f"{result.name}: {regression}"
+            for regression in _get_regressions(result, baseline, threshold)
+        )
+    console.print(table)
+    return regressions
+
+
+def write_results(results: list[BenchmarkResult], filepath: str) -> None:
+    """Write results as JSON, which later runs can compare against as their baseline"""
+    with open(filepath, "w", encoding="utf-8") as file_writer:
+        json.dump(
+            {
+                result.name: {
+                    "items": result.items,
+                    "unit": result.unit,
+                    "seconds": result.seconds,
+                    "throughput": result.throughput,
+                    "peakBytes": result.peak_bytes,
+                }
+                for result in results
+            },
+            file_writer,
+            indent=4,
+            sort_keys=True,
+        )
+
+
+def run_suite(args: argparse.Namespace) -> list[BenchmarkResult]:
+    """Run benchmarks over recorded pages, synthetic inputs of every stage and startup"""
+    recorded_pages = iter_recorded_pages(args.cache, args.archive, args.parser)
+    with TemporaryDirectory() as dirpath:
+        benchmarks = [
+            *_get_recorded_page_benchmarks(recorded_pages, args.parser),
+            *_get_synthetic_page_benchmarks(args.sections, args.parser),
+            *_get_enrichment_benchmarks(dirpath, args.definitions, args.enrich_files),
+            *_get_glossary_benchmarks(args.glossary_terms, args.texts),
+            *_get_startup_benchmarks(),
+        ]
+        return [run_benchmark(benchmark, args.repeats) for benchmark in benchmarks]
+
+
+def _add_recorded_page_arguments(parser: argparse.ArgumentParser) -> None:
+    source_group = parser.add_mutually_exclusive_group()
+    source_group.add_argument(
+        "-c", "--cache", default=None, help="Directory of the HTTP cache holding recorded pages"
+    )
+    source_group.add_argument(
+        "-A", "--archive", default=None, help="Archive recorded by scrape_wiki --record"
+    )
+    parser.add_argument(
+        "--parser", choices=PARSERS, default="html.parser", help="BeautifulSoup parser backend"
+    )
+    parser.add_argument(
+        "-r", "--repeats", type=int, default=NUM_REPEATS, help="Repeats kept the best of"
+    )
+
+
+def main() -> None:
+    """Parse the command line arguments and run the benchmark accordingly"""
+    parser = argparse.ArgumentParser(description="Benchmark content scraping on recorded inputs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    extract_parser = subparsers.add_parser(
+        "extract", help="Time per-page extraction on recorded pages"
+    )
+    _add_recorded_page_arguments(extract_parser)
+    extract_parser.add_argument(
+        "-o", "--output", default=None, help="Also write every timing into the JSON file"
+    )
+
+    suite_parser = subparsers.add_parser(
+        "suite",
+        help="Report throughput and peak memory over recorded and synthetic inputs",
+    )
+    _add_recorded_page_arguments(suite_parser)
+    suite_parser.add_argument(
+        "--sections",
+        type=int,
+        default=NUM_SYNTHETIC_SECTIONS,
+        help="Number of sections in synthetic pages",
+    )
+    suite_parser.add_argument(
+        "--definitions",
+        type=int,
+        default=NUM_SYNTHETIC_DEFINITIONS,
+        help="Number of synthetic character definitions",
+    )
+    suite_parser.add_argument(
+        "--enrich-files",
+        type=int,
+        default=NUM_SYNTHETIC_ENRICH_FILES,
+        help="Number of enrich files the synthetic definitions are spread over",
+    )
+    suite_parser.add_argument(
+        "--glossary-terms",
+        type=int,
+        default=NUM_SYNTHETIC_GLOSSARY_TERMS,
+        help="Number of synthetic glossary terms to link",
+    )
+    suite_parser.add_argument(
+        "--texts",
+        type=int,
+        default=NUM_SYNTHETIC_TEXTS,
+        help="Number of synthetic texts glossary terms are linked in",
+    )
+    suite_parser.add_argument(
+        "-o", "--output", default=None, help="Write results into the JSON file"
+    )
+    suite_parser.add_argument(
+        "-b", "--baseline", default=None, help="Results JSON written by an earlier run"
+    )
+    suite_parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=REGRESSION_THRESHOLD,
+        help="Fail when throughput drops or peak memory grows by more than this fraction",
+    )
+
+    args = parser.parse_args()
+    configure_logging()
+
+    if args.command == "extract":
+        benchmark_metrics = benchmark_extraction(
+            iter_recorded_pages(args.cache, args.archive, args.parser), args.parser, args.repeats
+        )
+        benchmark_metrics.print_summary(console)
+        if args.output is not None:
+            benchmark_metrics.write(args.output)
+        return
+
+    results = run_suite(args)
+    baselines = {}
+    if args.baseline is not None:
+        with open(args.baseline, "r", encoding="utf-8") as file_reader:
+            baselines = json.load(file_reader)
+    regressions = report_results(results, baselines, args.threshold)
+    if args.output is not None:
+        write_results(results, args.output)
+
+    if regressions:
+        for regression in regressions:
+            console.print(f"[red]Regression[/red] {regression}")
+        parser.exit(1)
+
+
+if __name__ == "__main__":
+    main()
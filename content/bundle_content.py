@@ -0,0 +1,168 @@
+import argparse
+import gzip
+import importlib.util
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Any, Callable, Iterable
+
+from .common import (
+    configure_logging,
+    create_dir,
+    get_console,
+    get_edition_dir,
+    get_game_information_dir,
+    get_json_files,
+    get_output_characters_dir,
+    get_root_dir,
+    read_json,
+)
+from .glossary_linker import link_glossary
+from .output_writer import write_if_changed
+
+console = get_console()
+
+Bundle = dict[str, Any]
+
+BUNDLE_FILENAME = "content.min.json"
+NUM_LOAD_REPEATS = 5
+
+
+@create_dir
+def get_bundle_dir() -> str:
+    """Get directory path of the content bundle served by the site"""
+    return os.path.join(get_root_dir(), "static", "content")
+
+
+def _get_title(filepath: str) -> str:
+    return os.path.splitext(os.path.basename(filepath))[0]
+
+
+def _build_index(characters: list[dict[str, Any]]) -> dict[str, Any]:
+    """Index offsets into the character list by character id, edition and team"""
+    edition_index: dict[str, list[int]] = defaultdict(list)
+    team_index: dict[str, list[int]] = defaultdict(list)
+
+    for offset, character in enumerate(characters):
+        if "edition" in character:
+            edition_index[character["edition"]].append(offset)
+        if "team" in character:
+            team_index[character["team"]].append(offset)
+
+    return {
+        "characters": {character["id"]: offset for offset, character in enumerate(characters)},
+        "editions": edition_index,
+        "teams": team_index,
+    }
+
+
+def build_bundle(
+    character_files: Iterable[str],
+    edition_files: Iterable[str],
+    game_information_files: Iterable[str],
+) -> Bundle:
+    """Combine characters, editions and game information into one indexed bundle
+
+    Glossary terms found in characters and editions are included as `glossaryLinks`.
+    """
+    characters = sorted(map(read_json, character_files), key=lambda character: character["id"])
+    editions = {_get_title(filepath): read_json(filepath) for filepath in edition_files}
+    game_information = {
+        _get_title(filepath): read_json(filepath) for filepath in game_information_files
+    }
+
+    return {
+        "characters": characters,
+        "editions": editions,
+        "gameInformation": game_information,
+        "glossaryLinks": link_glossary(game_information.get("glossary", {}), characters, editions),
+        "index": _build_index(characters),
+    }
+
+
+def _serialize_bundle(bundle: Bundle) -> bytes:
+    return json.dumps(bundle, separators=(",", ":"), sort_keys=True, ensure_ascii=False).encode(
+        "utf-8"
+    )
+
+
+def write_bundle(
+    bundle: Bundle, bundle_filepath: str, use_gzip: bool = False, use_brotli: bool = False
+) -> list[str]:
+    """Write the minified bundle and its requested precompressed variants
+
+    Each file is replaced atomically, and left untouched when it already holds the same bytes.
+    """
+    data = _serialize_bundle(bundle)
+    variants = [(bundle_filepath, data)]
+    if use_gzip:
+        variants.append((f"{bundle_filepath}.gz", gzip.compress(data, compresslevel=9, mtime=0)))
+    if use_brotli:
+        import brotli  # pylint: disable=import-outside-toplevel
+
+        variants.append((f"{bundle_filepath}.br", brotli.compress(data)))
+
+    for filepath, variant_data in variants:
+        write_if_changed(filepath, variant_data)
+
+    return [filepath for filepath, _ in variants]
+
+
+def _measure_load_time(load: Callable[[], Any]) -> float:
+    """Best wall time of reading and parsing over several repeats"""
+    load_times = []
+    for _ in range(NUM_LOAD_REPEATS):
+        start = time.perf_counter()
+        load()
+        load_times.append(time.perf_counter() - start)
+    return min(load_times)
+
+
+def _report(content_files: list[str], bundle_filepaths: list[str]) -> None:
+    per_file_size = sum(map(os.path.getsize, content_files))
+    per_file_load_time = _measure_load_time(lambda: [read_json(f) for f in content_files])
+    bundle_load_time = _measure_load_time(lambda: read_json(bundle_filepaths[0]))
+
+    console.print(
+        f"Per-file layout: {len(content_files)} files, {per_file_size:,} bytes, "
+        f"loaded in {per_file_load_time * 1000:.2f} ms"
+    )
+    for bundle_filepath in bundle_filepaths:
+        console.print(
+            f"{os.path.basename(bundle_filepath)}: {os.path.getsize(bundle_filepath):,} bytes"
+        )
+    console.print(f"Bundle loaded in {bundle_load_time * 1000:.2f} ms")
+
+
+def bundle_content(use_gzip: bool = False, use_brotli: bool = False) -> None:
+    """Bundle enriched characters, editions and game information for the site"""
+    character_files = get_json_files(get_output_characters_dir())
+    edition_files = get_json_files(get_edition_dir())
+    game_information_files = get_json_files(get_game_information_dir())
+
+    bundle = build_bundle(character_files, edition_files, game_information_files)
+    bundle_filepath = os.path.join(get_bundle_dir(), BUNDLE_FILENAME)
+    bundle_filepaths = write_bundle(bundle, bundle_filepath, use_gzip, use_brotli)
+
+    _report(character_files + edition_files + game_information_files, bundle_filepaths)
+
+
+def main() -> None:
+    """Parse the command line arguments and bundle content accordingly"""
+    parser = argparse.ArgumentParser(description="Bundle content into one file for the site")
+    parser.add_argument("--gzip", action="store_true", help="Also write a gzip-compressed bundle")
+    parser.add_argument(
+        "--brotli", action="store_true", help="Also write a brotli-compressed bundle"
+    )
+
+    args = parser.parse_args()
+    if args.brotli and importlib.util.find_spec("brotli") is None:
+        parser.error("--brotli requires the brotli package, install it from requirements.txt")
+    configure_logging()
+
+    bundle_content(use_gzip=args.gzip, use_brotli=args.brotli)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import re
+from collections import defaultdict
+from functools import partial
+from glob import iglob
+from itertools import chain
+from typing import Any, Iterable, Optional
+
+from .common import get_cache_dir, write_json
+from .metrics import metrics
+
+CharacterDefinition = dict[str, Any]
+CharacterDefinitions = list[CharacterDefinition]
+CharacterEnrichment = CharacterDefinition | CharacterDefinitions
+Manifest = dict[str, dict[str, Any]]
+
+
+def get_manifest_filepath() -> str:
+    """Get path of the manifest of input files the last enrichment was built from"""
+    return os.path.join(get_cache_dir(), "enrich-manifest.json")
+
+
+def load_manifest(manifest_filepath: str) -> Manifest:
+    """Load the enrichment manifest, empty when there is none"""
+    try:
+        with open(manifest_filepath, "r", encoding="utf-8") as file_reader:
+            manifest: Manifest = json.load(file_reader)
+            return manifest
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(manifest_filepath: str, manifest: Manifest) -> None:
+    """Save the enrichment manifest"""
+    write_json(manifest_filepath, manifest)
+
+
+def hash_character_definitions(character_enrichment: CharacterEnrichment) -> dict[str, str]:
+    """Hash the definitions an enrichment contributes to each character id"""
+    character_id_to_definitions: dict[str, CharacterDefinitions] = defaultdict(list)
+    for character_definition in get_character_definitions(character_enrichment):
+        character_id_to_definitions[character_definition["id"]].append(character_definition)
+
+    return {
+        character_id: hashlib.sha256(
+            json.dumps(character_definitions, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        for character_id, character_definitions in character_id_to_definitions.items()
+    }
+
+
+def get_enrich_files(enrich_dirpath: str) -> Iterable[str]:
+    """Get paths of enrichment files in the directory"""
+    return (
+        os.path.join(enrich_dirpath, filename)
+        for filename in iglob("enrich*.json", root_dir=enrich_dirpath)
+    )
+
+
+def get_raw_character_files(raw_characters_dirpath: str) -> Iterable[str]:
+    """Get paths of wiki-scraped character files in the directory"""
+    return (
+        os.path.join(raw_characters_dirpath, filename)
+        for filename in iglob("*.json", root_dir=raw_characters_dirpath)
+    )
+
+
+def get_enrich_order(enrich_filepath: str, default: Optional[int] = None) -> int:
+    """Get the order of an enrichment file from its name like enrich2.json"""
+    match = re.search(r"enrich(?P<order>-?\d+)\.json", enrich_filepath)
+    if match:
+        return int(match.groupdict()["order"])
+    else:
+        if default is None:
+            raise ValueError(f"Cannot infer enrichment order from {enrich_filepath}")
+        else:
+            return default
+
+
+def read_character_enrichment(enrich_file: str) -> CharacterEnrichment:
+    """Read the definition or definitions of an input file"""
+    with metrics.measure("read", path=enrich_file):
+        with open(enrich_file, "r", encoding="utf-8") as file_reader:
+            return json.load(file_reader)
+
+
+def sort_enrich_files(enrich_files: Iterable[str]) -> list[str]:
+    """Sort input files in the order their definitions are applied"""
+    return sorted(enrich_files, key=partial(get_enrich_order, default=0))
+
+
+def get_character_enrichments(enrich_files: Iterable[str]) -> Iterable[CharacterEnrichment]:
+    """Read input files in the order their definitions are applied"""
+    return map(read_character_enrichment, sort_enrich_files(enrich_files))
+
+
+def get_character_definitions(
+    character_enrichment: CharacterEnrichment,
+) -> CharacterDefinitions:
+    """Get the definitions of an enrichment, which is one definition or a list of them"""
+    if isinstance(character_enrichment, list):
+        return character_enrichment
+    return [character_enrichment]
+
+
+def get_input_files(enrich_dirpath: str, raw_characters_dirpath: str) -> list[str]:
+    """Get raw and enrichment files in the order their definitions are applied"""
+    return sort_enrich_files(
+        chain(get_enrich_files(enrich_dirpath), get_raw_character_files(raw_characters_dirpath))
+    )
+
+
+def merge_definitions(
+    character_enrichments: Iterable[CharacterEnrichment],
+    character_ids: Optional[set[str]] = None,
+) -> Iterable[CharacterDefinition]:
+    """Merge definitions by character id in order, only of `character_ids` when given"""
+    definitions: dict[str, CharacterDefinition] = defaultdict(dict)
+
+    for character_enrichment in character_enrichments:
+        for character_definition in get_character_definitions(character_enrichment):
+            character_id = character_definition["id"]
+            if character_ids is None or character_id in character_ids:
+                definitions[character_id].update(character_definition)
+
+    return definitions.values()
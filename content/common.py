@@ -0,0 +1,192 @@
+import hashlib
+import json
+import logging
+import os
+from contextlib import contextmanager
+from functools import cache, wraps
+from glob import iglob
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Optional, ParamSpec, TypeVar
+
+from .output_writer import OnWritten, OutputWriter, serialize_json, write_if_changed
+
+if TYPE_CHECKING:
+    from rich.console import Console
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+DEFAULT_LOG_LEVEL = "WARNING"
+
+T = TypeVar("T")
+P = ParamSpec("P")
+
+# writer of `write_json` within `batched_writes`, None writes synchronously
+_output_writer: Optional[OutputWriter] = None
+
+
+def configure_logging(level: str = DEFAULT_LOG_LEVEL) -> None:
+    """Log records of the level and above through rich onto the shared console"""
+    from rich.logging import RichHandler  # pylint: disable=import-outside-toplevel
+
+    logging.basicConfig(
+        level=level,
+        format="%(message)s",
+        datefmt="[%X]",
+        handlers=[RichHandler(console=get_console(), rich_tracebacks=True)],
+    )
+
+
+@cache
+def get_console() -> "Console":
+    """Get the console shared by content scripts, importing rich on first use"""
+    from rich.console import Console  # pylint: disable=import-outside-toplevel
+
+    return Console()
+
+
+def guarded_execute(action: Callable[P, T]) -> Callable[P, Optional[T]]:
+    """Execute a function while catch and log any exception"""
+
+    @wraps(action)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> Optional[T]:
+        try:
+            return action(*args, **kwargs)
+        except Exception:
+            logging.exception("Error")
+            return None
+
+    return wrapper
+
+
+def create_dir(action: Callable[P, str]) -> Callable[P, str]:
+    """Create a directory at specified path"""
+
+    @wraps(action)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> str:
+        dirpath = action(*args, **kwargs)
+        if not os.path.isdir(dirpath):
+            os.makedirs(dirpath, exist_ok=True)
+        return dirpath
+
+    return wrapper
+
+
+def get_root_dir() -> str:
+    """Get root dir -- where last segment is BloodOnTheClocktower"""
+    dirpath = os.getcwd()
+    while os.path.basename(dirpath) != "BloodOnTheClocktower":
+        dirpath = os.path.dirname(dirpath)
+    return dirpath
+
+
+@create_dir
+def get_content_dir() -> str:
+    """Get content directory path"""
+    return os.path.join(get_root_dir(), "content")
+
+
+@create_dir
+def get_edition_dir() -> str:
+    """Get editions directory path"""
+    return os.path.join(get_content_dir(), "editions")
+
+
+@create_dir
+def get_characters_dir() -> str:
+    """Get characters directory path"""
+    return os.path.join(get_content_dir(), "characters")
+
+
+@create_dir
+def get_raw_characters_dir() -> str:
+    """Get wiki-scraped characters directory path"""
+    return os.path.join(get_characters_dir(), "raw")
+
+
+@create_dir
+def get_enrich_characters_dir() -> str:
+    """Get characters directory path"""
+    return os.path.join(get_characters_dir(), "enrich")
+
+
+@create_dir
+def get_output_characters_dir() -> str:
+    """Get characters directory path"""
+    return os.path.join(get_characters_dir(), "output")
+
+
+@create_dir
+def get_game_information_dir() -> str:
+    """Get game information directory path"""
+    return os.path.join(get_content_dir(), "game-information")
+
+
+@create_dir
+def get_cache_dir() -> str:
+    """Get directory path of files kept between runs but not committed"""
+    return os.path.join(get_content_dir(), ".cache")
+
+
+def convert_to_character_id(character_name: str) -> str:
+    """Convert a character name to its id, e.g. Fortune Teller to fortuneteller"""
+    return "".join(c.lower() for c in character_name if c.isalpha())
+
+
+def hash_file(filepath: str) -> str:
+    """Get the SHA-256 hex digest of the file content"""
+    with open(filepath, "rb") as file_reader:
+        return hashlib.sha256(file_reader.read()).hexdigest()
+
+
+def _wait_for_writes() -> None:
+    """Let reads see files written through `batched_writes` so far"""
+    if _output_writer is not None:
+        _output_writer.flush()
+
+
+def read_json(filepath: str) -> Any:
+    """Read JSON data from specified filepath"""
+    _wait_for_writes()
+    with open(filepath, "r", encoding="utf-8") as file_reader:
+        return json.load(file_reader)
+
+
+def get_json_files(dirpath: str) -> list[str]:
+    """Get sorted paths of JSON files in specified directory"""
+    _wait_for_writes()
+    return sorted(
+        os.path.join(dirpath, filename) for filename in iglob("*.json", root_dir=dirpath)
+    )
+
+
+def write_json(filepath: str, data: Any, on_written: Optional[OnWritten] = None) -> None:
+    """Write data as JSON format to specified filepath, then call `on_written`
+
+    The file is replaced atomically, and left untouched when it already holds the same JSON.
+    Within `batched_writes`, the data is written later on a background thread.
+    """
+    if data is None:
+        return
+
+    if _output_writer is not None:
+        _output_writer.write(filepath, data, on_written)
+        return
+
+    write_if_changed(filepath, serialize_json(data))
+    if on_written is not None:
+        on_written()
+
+
+@contextmanager
+def batched_writes(compact: bool = False) -> Iterator[OutputWriter]:
+    """Write JSON files through a background output writer within the context
+
+    Files are written compactly when asked to. Every file has been written when the context exits.
+    """
+    global _output_writer  # pylint: disable=global-statement
+
+    previous_output_writer = _output_writer
+    with OutputWriter(compact) as output_writer:
+        _output_writer = output_writer
+        try:
+            yield output_writer
+        finally:
+            _output_writer = previous_output_writer
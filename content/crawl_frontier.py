@@ -0,0 +1,82 @@
+import heapq
+from itertools import count
+from typing import Iterable
+from urllib.parse import parse_qsl, quote, unquote, urlsplit, urlunsplit
+
+# characters MediaWiki leaves unescaped in page paths, besides letters, digits and "_.-~"
+WIKI_PATH_SAFE_CHARACTERS = "/:@!$()*+,;="
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonicalize_url(url: str) -> str:
+    """Canonicalize a wiki page URL so links to the same page compare equal
+
+    Scheme and host are lowercased, default ports and fragments dropped, `index.php?title=`
+    links rewritten to the short page path, spaces replaced by underscores, and the path
+    re-escaped the way MediaWiki escapes it.
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or "").lower()
+    if parts.port is not None and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{parts.port}"
+
+    path = parts.path
+    query = parts.query
+    if path.endswith("/index.php") and (
+        title := dict(parse_qsl(query, keep_blank_values=True)).get("title")
+    ):
+        # redirect=no and other parameters only change how the same page is shown
+        path = f"{path.removesuffix('index.php')}{title}"
+        query = ""
+
+    path = quote(unquote(path).replace(" ", "_"), safe=WIKI_PATH_SAFE_CHARACTERS)
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+class CrawlFrontier:
+    """Canonical page URLs waiting to be fetched, each added at most once
+
+    URLs are popped by ascending priority, and in the order they were added among equal
+    priorities. A URL added again, however it is spelled, is a duplicate whose fetch is saved.
+    """
+
+    def __init__(self) -> None:
+        self._seen_urls: set[str] = set()
+        self._queue: list[tuple[int, int, str]] = []
+        self._sequence = count()
+        self.num_duplicates = 0
+
+    def add(self, url: str, priority: int = 0) -> bool:
+        """Add the URL unless it was added before, returning whether it was added"""
+        if (url := canonicalize_url(url)) in self._seen_urls:
+            self.num_duplicates += 1
+            return False
+
+        self._seen_urls.add(url)
+        heapq.heappush(self._queue, (priority, next(self._sequence), url))
+        return True
+
+    def add_all(self, urls: Iterable[str], priority: int = 0) -> None:
+        """Add the URLs with the same priority"""
+        for url in urls:
+            self.add(url, priority)
+
+    def pop(self) -> str:
+        """Pop the URL with the lowest priority, raising IndexError when the frontier is empty"""
+        return heapq.heappop(self._queue)[2]
+
+    def pop_all(self) -> list[str]:
+        """Pop all URLs in priority order"""
+        urls = []
+        while self._queue:
+            urls.append(self.pop())
+        return urls
+
+    @property
+    def num_discovered(self) -> int:
+        """Number of distinct URLs added"""
+        return len(self._seen_urls)
+
+    def __len__(self) -> int:
+        return len(self._queue)
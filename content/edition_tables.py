@@ -0,0 +1,150 @@
+import argparse
+import logging
+import os
+import time
+from contextlib import suppress
+from typing import Any, Iterable, Iterator, NamedTuple, Optional
+
+from .common import (
+    configure_logging,
+    convert_to_character_id,
+    create_dir,
+    get_console,
+    get_content_dir,
+    get_edition_dir,
+    get_json_files,
+    get_output_characters_dir,
+    read_json,
+    write_json,
+)
+
+CHARACTER_EDITIONS_FILENAME = "character-editions.json"
+
+EditionTable = dict[str, Any]
+
+
+class EditionTables(NamedTuple):
+    """Editions joined with the characters they list"""
+
+    # edition name to the edition whose characters map each team to full character records
+    edition_to_table: dict[str, EditionTable]
+    # character id to names of editions listing the character, in edition order
+    character_id_to_editions: dict[str, list[str]]
+    # edition name to character names it lists without a matching character
+    edition_to_dangling_names: dict[str, list[str]]
+
+
+@create_dir
+def get_edition_tables_dir() -> str:
+    """Get directory path of editions joined with their characters"""
+    return os.path.join(get_content_dir(), "edition-tables")
+
+
+def get_character_editions_filepath() -> str:
+    """Get path of the editions each character appears in"""
+    return os.path.join(get_content_dir(), CHARACTER_EDITIONS_FILENAME)
+
+
+def join_editions(
+    characters: Iterable[dict[str, Any]], edition_name_to_edition: dict[str, dict[str, Any]]
+) -> EditionTables:
+    """Resolve character names listed by every edition to character records
+
+    Names are resolved through their character id the same way scraped character pages are
+    named, and teams and characters keep the order the edition lists them in.
+    """
+    character_id_to_character = {character["id"]: character for character in characters}
+    tables = EditionTables({}, {}, {})
+    for edition_name, edition in edition_name_to_edition.items():
+        team_to_characters: dict[str, list[dict[str, Any]]] = {}
+        for team, character_names in edition.get("characters", {}).items():
+            team_to_characters[team] = []
+            for character_name in character_names:
+                character_id = convert_to_character_id(character_name)
+                if (character := character_id_to_character.get(character_id)) is None:
+                    tables.edition_to_dangling_names.setdefault(edition_name, []).append(
+                        character_name
+                    )
+                    continue
+                team_to_characters[team].append(character)
+                editions = tables.character_id_to_editions.setdefault(character_id, [])
+                if edition_name not in editions:
+                    editions.append(edition_name)
+        tables.edition_to_table[edition_name] = {**edition, "characters": team_to_characters}
+    return tables
+
+
+def _read_listed_characters(
+    edition_name_to_edition: dict[str, dict[str, Any]]
+) -> Iterator[dict[str, Any]]:
+    """Read only the enriched characters editions list, as they are written by character id"""
+    output_characters_dirpath = get_output_characters_dir()
+    character_ids = {
+        convert_to_character_id(character_name)
+        for edition in edition_name_to_edition.values()
+        for character_names in edition.get("characters", {}).values()
+        for character_name in character_names
+    }
+    for character_id in sorted(character_ids):
+        with suppress(FileNotFoundError):
+            yield read_json(os.path.join(output_characters_dirpath, f"{character_id}.json"))
+
+
+def _remove_stale_tables(edition_tables_dirpath: str, edition_names: Iterable[str]) -> None:
+    filepaths = {
+        os.path.join(edition_tables_dirpath, f"{edition_name}.json")
+        for edition_name in edition_names
+    }
+    for filepath in get_json_files(edition_tables_dirpath):
+        if filepath not in filepaths:
+            os.remove(filepath)
+
+
+def build_edition_tables(characters: Optional[Iterable[dict[str, Any]]] = None) -> EditionTables:
+    """Join editions with enriched characters and write a table per edition
+
+    Characters editions list are read from enrichment output unless given.
+    """
+    start = time.perf_counter()
+    edition_name_to_edition = {
+        os.path.splitext(os.path.basename(filepath))[0]: read_json(filepath)
+        for filepath in get_json_files(get_edition_dir())
+    }
+    if characters is None:
+        characters = _read_listed_characters(edition_name_to_edition)
+    tables = join_editions(characters, edition_name_to_edition)
+
+    edition_tables_dirpath = get_edition_tables_dir()
+    _remove_stale_tables(edition_tables_dirpath, tables.edition_to_table)
+    for edition_name, table in tables.edition_to_table.items():
+        write_json(os.path.join(edition_tables_dirpath, f"{edition_name}.json"), table)
+    write_json(get_character_editions_filepath(), tables.character_id_to_editions)
+
+    for edition_name, character_names in tables.edition_to_dangling_names.items():
+        logging.warning(
+            "%s lists characters without definitions: %s",
+            edition_name,
+            ", ".join(character_names),
+        )
+    num_dangling_names = sum(map(len, tables.edition_to_dangling_names.values()))
+    get_console().print(
+        f"Joined {len(tables.edition_to_table)} editions with "
+        f"{len(tables.character_id_to_editions)} characters, {num_dangling_names} dangling "
+        f"names, in {(time.perf_counter() - start) * 1000:.1f} ms"
+    )
+    return tables
+
+
+def main() -> None:
+    """Parse the command line arguments and join editions with characters accordingly"""
+    parser = argparse.ArgumentParser(
+        description="Join editions with the enriched characters they list"
+    )
+    parser.parse_args()
+    configure_logging()
+
+    build_edition_tables()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,118 +1,378 @@
-import json
+import argparse
 import logging
 import os
-import re
+import time
 from collections import defaultdict
-from functools import partial
-from glob import iglob
+from contextlib import suppress
 from itertools import chain
-from typing import Any, Iterable, Optional
+from typing import Iterable, Optional, Sequence
 
-from rich.logging import RichHandler
-from tqdm import tqdm
-
-from .scrape_wiki import (
-    create_dir,
+from .character_definitions import (
+    CharacterDefinition,
+    CharacterDefinitions,
+    CharacterEnrichment,
+    Manifest,
+    get_character_definitions,
+    get_input_files,
+    get_manifest_filepath,
+    hash_character_definitions,
+    load_manifest,
+    merge_definitions,
+    read_character_enrichment,
+    save_manifest,
+)
+from .common import (
+    DEFAULT_LOG_LEVEL,
+    LOG_LEVELS,
+    batched_writes,
+    configure_logging,
     get_characters_dir,
+    get_console,
+    get_enrich_characters_dir,
+    get_output_characters_dir,
     get_raw_characters_dir,
+    hash_file,
     write_json,
 )
+from .external_merge import DEFAULT_RUN_SIZE, enrich_externally
+from .metrics import metrics, profile
+from .sprite_sheets import build_sprite_sheets, load_sprite_manifest, record_sprite
 
-logging.basicConfig(
-    level="NOTSET",
-    format="%(message)s",
-    datefmt="[%X]",
-    handlers=[RichHandler(rich_tracebacks=True)],
-)
 
-CharacterDefinition = dict[str, Any]
-CharacterDefinitions = list[CharacterDefinition]
-CharacterEnrichment = CharacterDefinition | CharacterDefinitions
+def _write_enrichment(definitions: Iterable[CharacterDefinition], output_dirpath: str) -> None:
+    from tqdm import tqdm  # pylint: disable=import-outside-toplevel
 
+    # rebuilt characters keep the sprites of the last sprite sheet build
+    sprite_manifest = load_sprite_manifest()
+    for definition in tqdm(definitions):
+        record_sprite(definition, sprite_manifest)
+        character_id = definition["id"]
+        filepath = os.path.join(output_dirpath, f"{character_id}.json")
+        write_json(filepath, definition)
 
-@create_dir
-def get_enrich_characters_dir() -> str:
-    """Get characters directory path"""
-    return os.path.join(get_characters_dir(), "enrich")
 
+def _get_manifest_key(filepath: str) -> str:
+    return os.path.relpath(filepath, get_characters_dir())
 
-@create_dir
-def get_output_characters_dir() -> str:
-    """Get characters directory path"""
-    return os.path.join(get_characters_dir(), "output")
 
+def _get_affected_character_ids(
+    files: Sequence[str],
+    file_hashes: dict[str, str],
+    manifest: Manifest,
+    output_dirpath: str,
+    character_enrichments: dict[str, CharacterEnrichment],
+) -> tuple[set[str], Manifest]:
+    """Find ids whose contributions changed, and the manifest describing current files
 
-def _get_enrich_files(enrich_dirpath: str) -> Iterable[str]:
-    return (
-        os.path.join(enrich_dirpath, filename)
-        for filename in iglob("enrich*.json", root_dir=enrich_dirpath)
-    )
+    Changed files read along the way are kept in `character_enrichments`.
+    """
+    affected_character_ids: set[str] = set()
+    new_manifest: Manifest = {}
 
+    for filepath in files:
+        key = _get_manifest_key(filepath)
+        entry = manifest.get(key)
+        if entry is not None and entry["sha256"] == file_hashes[filepath]:
+            new_manifest[key] = entry
+            continue
 
-def _get_raw_character_files(raw_characters_dirpath: str) -> Iterable[str]:
-    return (
-        os.path.join(raw_characters_dirpath, filename)
-        for filename in iglob("*.json", root_dir=raw_characters_dirpath)
-    )
+        character_enrichments[filepath] = read_character_enrichment(filepath)
+        character_id_hashes = hash_character_definitions(character_enrichments[filepath])
+        new_manifest[key] = {"sha256": file_hashes[filepath], "ids": character_id_hashes}
+        previous_character_id_hashes: dict[str, str] = {} if entry is None else entry["ids"]
+        affected_character_ids.update(
+            character_id
+            for character_id in character_id_hashes.keys() | previous_character_id_hashes.keys()
+            if character_id_hashes.get(character_id)
+            != previous_character_id_hashes.get(character_id)
+        )
 
+    for key in manifest.keys() - new_manifest.keys():
+        affected_character_ids.update(manifest[key]["ids"])
 
-def _get_enrich_order(enrich_filepath: str, default: Optional[int] = None) -> int:
-    match = re.search(r"enrich(?P<order>-?\d+)\.json", enrich_filepath)
-    if match:
-        return int(match.groupdict()["order"])
-    else:
-        if default is None:
-            raise ValueError(f"Cannot infer enrichment order from {enrich_filepath}")
-        else:
-            return default
+    for entry in new_manifest.values():
+        affected_character_ids.update(
+            character_id
+            for character_id in entry["ids"]
+            if not os.path.isfile(os.path.join(output_dirpath, f"{character_id}.json"))
+        )
 
+    return affected_character_ids, new_manifest
 
-def _get_character_enrichment(enrich_file: str) -> CharacterEnrichment:
-    with open(enrich_file, "r", encoding="utf-8") as file_reader:
-        return json.load(file_reader)
 
+def _get_contributions(filepath: str) -> dict[str, CharacterDefinitions]:
+    """Definitions the file contributes to each character, raising ValueError when malformed"""
+    contributions: dict[str, CharacterDefinitions] = defaultdict(list)
+    character_enrichment = read_character_enrichment(filepath)
+    for position, character_definition in enumerate(
+        get_character_definitions(character_enrichment)
+    ):
+        if not isinstance(character_definition, dict) or not isinstance(
+            character_definition.get("id"), str
+        ):
+            raise ValueError(f"Definition {position} is not an object with a string id")
+        contributions[character_definition["id"]].append(character_definition)
+    return contributions
 
-def _get_character_enrichments(enrich_files: Iterable[str]) -> Iterable[CharacterEnrichment]:
-    sorted_enrich_files = sorted(enrich_files, key=partial(_get_enrich_order, default=0))
-    return map(_get_character_enrichment, sorted_enrich_files)
 
+class CharacterDefinitionIndex:
+    """Definitions each input file contributes to each character, and the merged definitions
 
-def _enrich(character_enrichments: Iterable[CharacterEnrichment]) -> Iterable[CharacterDefinition]:
-    definitions: dict[str, CharacterDefinition] = defaultdict(dict)
+    Updating some files re-merges only the characters those files contribute to, applying
+    every contribution to such a character in the order of the input files.
+    """
 
-    for character_enrichment in character_enrichments:
-        if isinstance(character_enrichment, list):
-            character_definitions: list[CharacterDefinition] = character_enrichment
-        else:
-            character_definitions = [character_enrichment]
+    def __init__(self, files: list[str]) -> None:
+        self.definitions: dict[str, CharacterDefinition] = {}
+        self._file_to_contributions: dict[str, dict[str, CharacterDefinitions]] = {}
+        self._character_id_to_files: dict[str, set[str]] = defaultdict(set)
+        self.update(files, files)
 
-        for character_definition in character_definitions:
-            character_id = character_definition["id"]
-            definitions[character_id].update(character_definition)
+    def _remove(self, filepath: str) -> set[str]:
+        contributions = self._file_to_contributions.pop(filepath, {})
+        for character_id in contributions:
+            self._character_id_to_files[character_id].discard(filepath)
+        return set(contributions)
 
-    return definitions.values()
+    def _load(self, filepath: str) -> set[str]:
+        try:
+            contributions = _get_contributions(filepath)
+        except FileNotFoundError:
+            return self._remove(filepath)
+        except ValueError as error:
+            # likely saved halfway, keep what it contributed until it is saved again
+            logging.error("Cannot parse %s: %s", filepath, error)
+            return set()
 
+        character_ids = self._remove(filepath) | contributions.keys()
+        self._file_to_contributions[filepath] = contributions
+        for character_id in contributions:
+            self._character_id_to_files[character_id].add(filepath)
+        return character_ids
+
+    def update(
+        self, files: list[str], changed_files: Iterable[str]
+    ) -> dict[str, CharacterDefinition]:
+        """Reload changed files given all input files in order, returning changed definitions"""
+        current_files = set(files)
+        affected_character_ids: set[str] = set()
+        for filepath in self._file_to_contributions.keys() - current_files:
+            affected_character_ids |= self._remove(filepath)
+        for filepath in current_files.intersection(changed_files):
+            affected_character_ids |= self._load(filepath)
+
+        file_to_position = {filepath: position for position, filepath in enumerate(files)}
+        changed_definitions: dict[str, CharacterDefinition] = {}
+        for character_id in affected_character_ids:
+            definition: CharacterDefinition = {}
+            for filepath in sorted(
+                self._character_id_to_files[character_id], key=file_to_position.__getitem__
+            ):
+                for character_definition in self._file_to_contributions[filepath][character_id]:
+                    definition.update(character_definition)
+
+            if not definition:
+                self.definitions.pop(character_id, None)
+            elif definition != self.definitions.get(character_id):
+                self.definitions[character_id] = changed_definitions[character_id] = definition
+        return changed_definitions
 
-def _write_enrichment(definitions: Iterable[CharacterDefinition], output_dirpath: str) -> None:
-    for definition in tqdm(definitions):
-        character_id = definition["id"]
-        filepath = os.path.join(output_dirpath, f"{character_id}.json")
-        write_json(filepath, definition)
 
+def enrich(full: bool = False, sprites: bool = False, run_size: Optional[int] = None) -> None:
+    """Enrich character definitions, then join editions with them
 
-def enrich() -> None:
-    """Enrich character definitions"""
+    Unless `full` is specified, only characters whose definitions in any enrichment file changed
+    since last enrichment, or whose output is missing, are rebuilt. With `run_size`, every
+    character is rebuilt through an external merge holding at most that many definitions in
+    memory. With `sprites`, icons are packed into sprite sheets recorded in the definitions
+    before the join.
+    """
+    if run_size is None:
+        _enrich_incrementally(full)
+    else:
+        enrich_externally(run_size)
+    _build_edition_tables(_build_sprite_sheets() if sprites else None)
+
+
+def _enrich_incrementally(full: bool) -> None:
     enrich_dirpath = get_enrich_characters_dir()
     output_dirpath = get_output_characters_dir()
     raw_characters_dirpath = get_raw_characters_dir()
+    manifest_filepath = get_manifest_filepath()
 
-    enrich_files = _get_enrich_files(enrich_dirpath)
-    raw_character_files = _get_raw_character_files(raw_characters_dirpath)
-    character_enrichments = _get_character_enrichments(chain(enrich_files, raw_character_files))
-    character_definitions = _enrich(character_enrichments)
+    files = get_input_files(enrich_dirpath, raw_characters_dirpath)
+    with metrics.measure("hash"):
+        file_hashes = {filepath: hash_file(filepath) for filepath in files}
+
+    manifest = {} if full else load_manifest(manifest_filepath)
+    changed_character_enrichments: dict[str, CharacterEnrichment] = {}
+    affected_character_ids, manifest = _get_affected_character_ids(
+        files, file_hashes, manifest, output_dirpath, changed_character_enrichments
+    )
+
+    contributing_files = [
+        filepath
+        for filepath in files
+        if not affected_character_ids.isdisjoint(manifest[_get_manifest_key(filepath)]["ids"])
+    ]
+    character_enrichments = [
+        changed_character_enrichments.get(filepath) or read_character_enrichment(filepath)
+        for filepath in contributing_files
+    ]
+    with metrics.measure("merge"):
+        character_definitions = list(
+            merge_definitions(character_enrichments, affected_character_ids)
+        )
 
     _write_enrichment(character_definitions, output_dirpath)
+    # characters no input file contributes to anymore
+    removed_character_ids = affected_character_ids.difference(
+        definition["id"] for definition in character_definitions
+    )
+    for character_id in removed_character_ids:
+        with suppress(FileNotFoundError):
+            os.remove(os.path.join(output_dirpath, f"{character_id}.json"))
+    save_manifest(manifest_filepath, manifest)
+
+    num_characters = len(set(chain.from_iterable(entry["ids"] for entry in manifest.values())))
+    get_console().print(
+        f"Rebuilt {len(affected_character_ids)} of {num_characters} characters "
+        f"from {len(contributing_files)} of {len(files)} files"
+    )
+
+
+def _build_sprite_sheets() -> list[CharacterDefinition]:
+    with metrics.measure("sprites"):
+        return build_sprite_sheets()
+
+
+def _build_edition_tables(characters: Optional[Iterable[CharacterDefinition]] = None) -> None:
+    from .edition_tables import (  # pylint: disable=import-outside-toplevel
+        build_edition_tables,
+    )
+
+    with metrics.measure("join"):
+        build_edition_tables(characters)
+
+
+def watch(polling: bool = False, sprites: bool = False) -> None:
+    """Rewrite characters whose definitions change as raw or enrichment files are saved
+
+    Runs until interrupted, keeping every definition in memory. With `sprites`, sprite sheets
+    are also kept up to date.
+    """
+    from .file_watcher import (  # pylint: disable=import-outside-toplevel
+        create_file_watcher,
+    )
+
+    enrich_dirpath = get_enrich_characters_dir()
+    output_dirpath = get_output_characters_dir()
+    raw_characters_dirpath = get_raw_characters_dir()
+    console = get_console()
+
+    index = CharacterDefinitionIndex(get_input_files(enrich_dirpath, raw_characters_dirpath))
+    with create_file_watcher([enrich_dirpath, raw_characters_dirpath], polling) as file_watcher:
+        console.print(f"Watching {enrich_dirpath} and {raw_characters_dirpath}")
+        with suppress(KeyboardInterrupt):
+            while True:
+                changed_files = file_watcher.wait()
+                start = time.perf_counter()
+                definitions = index.update(
+                    get_input_files(enrich_dirpath, raw_characters_dirpath), changed_files
+                )
+                sprite_manifest = load_sprite_manifest()
+                for character_id, definition in definitions.items():
+                    record_sprite(definition, sprite_manifest)
+                    write_json(os.path.join(output_dirpath, f"{character_id}.json"), definition)
+                if definitions:
+                    console.print(
+                        f"Rewrote {len(definitions)} characters in "
+                        f"{(time.perf_counter() - start) * 1000:.1f} ms"
+                    )
+                    _build_edition_tables(
+                        _build_sprite_sheets() if sprites else index.definitions.values()
+                    )
+
+
+def main() -> None:
+    """Parse the command line arguments and enrich characters accordingly"""
+    parser = argparse.ArgumentParser(description="Enrich character definitions")
+    parser.add_argument(
+        "-f",
+        "--full",
+        action="store_true",
+        help="Rebuild every character instead of only those whose inputs changed",
+    )
+    parser.add_argument(
+        "-b",
+        "--bundle",
+        action="store_true",
+        help="Bundle content into one file for the site after enrichment",
+    )
+    parser.add_argument(
+        "-s",
+        "--sprites",
+        action="store_true",
+        help="Pack character icons into a sprite sheet per edition after enrichment",
+    )
+    parser.add_argument(
+        "-x",
+        "--external-merge",
+        metavar="RUN_SIZE",
+        type=int,
+        nargs="?",
+        const=DEFAULT_RUN_SIZE,
+        help="Rebuild every character by merging id-sorted runs of at most RUN_SIZE definitions "
+        "spilled to disk, %(const)s by default, bounding memory for very large "
+        "enrichment sets",
+    )
+    parser.add_argument(
+        "-w",
+        "--watch",
+        action="store_true",
+        help="Keep rewriting characters as raw or enrichment files change until interrupted",
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="Watch by polling modification times instead of through inotify",
+    )
+
+    parser.add_argument(
+        "--compact", action="store_true", help="Write JSON without indentation or spaces"
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="METRICS_JSON",
+        help="Record read, merge and write metrics into the JSON file",
+    )
+    parser.add_argument(
+        "--cprofile", metavar="PROFILE", help="Dump cProfile statistics of the run into the file"
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=LOG_LEVELS,
+        default=DEFAULT_LOG_LEVEL,
+        help="Lowest level of log records shown",
+    )
+
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+
+    with batched_writes(compact=args.compact) as output_writer:
+        with profile(get_console(), args.profile, args.cprofile):
+            enrich(full=args.full, sprites=args.sprites, run_size=args.external_merge)
+            if args.bundle:
+                from .bundle_content import (  # pylint: disable=import-outside-toplevel
+                    bundle_content,
+                )
+
+                bundle_content()
+
+        if args.watch:
+            watch(polling=args.poll, sprites=args.sprites)
+    get_console().print(output_writer.stats)
 
 
 if __name__ == "__main__":
-    enrich()
+    main()
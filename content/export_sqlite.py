@@ -0,0 +1,266 @@
+import argparse
+import json
+import os
+import pathlib
+import sqlite3
+import time
+from typing import Any, Iterable, Optional
+
+from rich.markup import escape
+
+from .common import (
+    configure_logging,
+    get_cache_dir,
+    get_console,
+    get_edition_dir,
+    get_game_information_dir,
+    get_json_files,
+    get_output_characters_dir,
+    read_json,
+)
+
+console = get_console()
+
+DATABASE_FILENAME = "content.sqlite3"
+GLOSSARY_TITLE = "glossary"
+SEARCH_KINDS = ("characters", "glossary", "game-information")
+# beginnings of the messages of errors in FTS5 queries rather than in the database
+QUERY_ERROR_PREFIXES = ("fts5: syntax error", "unterminated string", "no such column")
+
+SCHEMA = """
+CREATE TABLE characters (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    edition TEXT,
+    team TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX characters_edition ON characters (edition);
+CREATE INDEX characters_team ON characters (team);
+
+CREATE TABLE editions (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE edition_characters (
+    edition TEXT NOT NULL REFERENCES editions (name),
+    team TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    character_name TEXT NOT NULL,
+    PRIMARY KEY (edition, team, position)
+);
+CREATE INDEX edition_characters_character_name ON edition_characters (character_name);
+
+CREATE TABLE glossary (
+    term TEXT PRIMARY KEY,
+    definition TEXT NOT NULL
+);
+CREATE TABLE game_information (
+    title TEXT NOT NULL,
+    section TEXT NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (title, section)
+);
+
+CREATE VIRTUAL TABLE characters_fts USING fts5 (
+    id UNINDEXED, name, ability, about, tips, gameplay, tokenize = 'porter unicode61'
+);
+CREATE VIRTUAL TABLE glossary_fts USING fts5 (
+    term, definition, tokenize = 'porter unicode61'
+);
+CREATE VIRTUAL TABLE game_information_fts USING fts5 (
+    title, section, text, tokenize = 'porter unicode61'
+);
+"""
+
+
+def get_database_filepath() -> str:
+    """Get default path of the SQLite database"""
+    return os.path.join(get_cache_dir(), DATABASE_FILENAME)
+
+
+def _join_tips(tips: Any) -> str:
+    if isinstance(tips, dict):
+        return "\n".join(f"{section}\n{text}" for section, text in tips.items())
+    return "" if tips is None else str(tips)
+
+
+def _insert_characters(connection: sqlite3.Connection, characters: Iterable[Any]) -> None:
+    for character in characters:
+        connection.execute(
+            "INSERT INTO characters VALUES (?, ?, ?, ?, ?)",
+            (
+                character["id"],
+                character.get("name"),
+                character.get("edition"),
+                character.get("team"),
+                json.dumps(character, sort_keys=True),
+            ),
+        )
+        connection.execute(
+            "INSERT INTO characters_fts VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                character["id"],
+                character.get("name", ""),
+                character.get("ability", ""),
+                character.get("about", ""),
+                _join_tips(character.get("tips")),
+                "\n".join(character.get("gameplay", [])),
+            ),
+        )
+
+
+def _insert_editions(connection: sqlite3.Connection, editions: Iterable[Any]) -> None:
+    for edition in editions:
+        connection.execute(
+            "INSERT INTO editions VALUES (?, ?)",
+            (edition["name"], json.dumps(edition, sort_keys=True)),
+        )
+        connection.executemany(
+            "INSERT INTO edition_characters VALUES (?, ?, ?, ?)",
+            (
+                (edition["name"], team, position, character_name)
+                for team, character_names in edition.get("characters", {}).items()
+                for position, character_name in enumerate(character_names)
+            ),
+        )
+
+
+def _insert_game_information(
+    connection: sqlite3.Connection, game_information_files: Iterable[str]
+) -> None:
+    for filepath in game_information_files:
+        title = os.path.splitext(os.path.basename(filepath))[0]
+        section_to_text: dict[str, str] = read_json(filepath)
+        if title == GLOSSARY_TITLE:
+            connection.executemany("INSERT INTO glossary VALUES (?, ?)", section_to_text.items())
+            connection.executemany(
+                "INSERT INTO glossary_fts VALUES (?, ?)", section_to_text.items()
+            )
+            continue
+
+        rows = [(title, section, text) for section, text in section_to_text.items()]
+        connection.executemany("INSERT INTO game_information VALUES (?, ?, ?)", rows)
+        connection.executemany("INSERT INTO game_information_fts VALUES (?, ?, ?)", rows)
+
+
+def export_sqlite(database_filepath: str) -> None:
+    """Load characters, editions and game information into an indexed SQLite database"""
+    temp_database_filepath = f"{database_filepath}.tmp"
+    if os.path.exists(temp_database_filepath):
+        os.remove(temp_database_filepath)
+
+    connection = sqlite3.connect(temp_database_filepath)
+    try:
+        with connection:
+            connection.executescript(SCHEMA)
+            _insert_characters(
+                connection, map(read_json, get_json_files(get_output_characters_dir()))
+            )
+            _insert_editions(connection, map(read_json, get_json_files(get_edition_dir())))
+            _insert_game_information(connection, get_json_files(get_game_information_dir()))
+    finally:
+        connection.close()
+
+    os.replace(temp_database_filepath, database_filepath)
+
+
+def get_character(connection: sqlite3.Connection, character_id: str) -> Optional[Any]:
+    """Look up a character by id"""
+    row = connection.execute(
+        "SELECT data FROM characters WHERE id = ?", (character_id,)
+    ).fetchone()
+    return None if row is None else json.loads(row[0])
+
+
+def search(
+    connection: sqlite3.Connection,
+    query: str,
+    kinds: Iterable[str] = SEARCH_KINDS,
+    limit: int = 10,
+) -> list[tuple[str, str, str, float]]:
+    """Full-text search returning (kind, key, snippet, rank) ordered by relevance
+
+    ValueError is raised when the query is not a valid FTS5 query.
+    """
+    statements = {
+        "characters": (
+            "SELECT 'characters', id, snippet(characters_fts, -1, '[', ']', '...', 12), rank "
+            "FROM characters_fts WHERE characters_fts MATCH ?"
+        ),
+        "glossary": (
+            "SELECT 'glossary', term, snippet(glossary_fts, -1, '[', ']', '...', 12), rank "
+            "FROM glossary_fts WHERE glossary_fts MATCH ?"
+        ),
+        "game-information": (
+            "SELECT 'game-information', title || ' / ' || section, "
+            "snippet(game_information_fts, -1, '[', ']', '...', 12), rank "
+            "FROM game_information_fts WHERE game_information_fts MATCH ?"
+        ),
+    }
+    selected_statements = [statements[kind] for kind in kinds]
+    sql = f"{' UNION ALL '.join(selected_statements)} ORDER BY rank LIMIT ?"
+    try:
+        return connection.execute(sql, (*(query for _ in selected_statements), limit)).fetchall()
+    except sqlite3.OperationalError as error:
+        if not str(error).startswith(QUERY_ERROR_PREFIXES):
+            raise
+        raise ValueError(f"Invalid search query {query!r}: {error}") from error
+
+
+def main() -> None:
+    """Parse the command line arguments and export or query the SQLite database accordingly"""
+    parser = argparse.ArgumentParser(
+        description="Export content into a SQLite database with full-text search and query it"
+    )
+    parser.add_argument("-d", "--database", default=None, help="Path of the SQLite database file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("build", help="Build the database from content")
+
+    character_parser = subparsers.add_parser("character", help="Look up a character by id")
+    character_parser.add_argument("id", help="Character id, for example fortuneteller")
+
+    search_parser = subparsers.add_parser("search", help="Search content by FTS5 query")
+    search_parser.add_argument("query", help="FTS5 query, for example 'poisoned OR drunk'")
+    search_parser.add_argument(
+        "-k", "--kind", choices=SEARCH_KINDS, action="append", help="Kind of content to search"
+    )
+    search_parser.add_argument("-l", "--limit", type=int, default=10, help="Number of results")
+
+    args = parser.parse_args()
+    configure_logging()
+    database_filepath = args.database or get_database_filepath()
+
+    if args.command == "build":
+        export_sqlite(database_filepath)
+        console.print(f"Exported content to {database_filepath}")
+        return
+
+    if not os.path.exists(database_filepath):
+        parser.error(f"{database_filepath} does not exist, run build to export content into it")
+    # opened read-only, so querying never creates or changes the database
+    connection = sqlite3.connect(
+        f"{pathlib.Path(database_filepath).resolve().as_uri()}?mode=ro", uri=True
+    )
+    try:
+        start = time.perf_counter()
+        if args.command == "character":
+            result = get_character(connection, args.id)
+            elapsed = time.perf_counter() - start
+            console.print_json(data=result)
+        else:
+            try:
+                results = search(connection, args.query, args.kind or SEARCH_KINDS, args.limit)
+            except ValueError as error:
+                search_parser.error(str(error))
+            elapsed = time.perf_counter() - start
+            for kind, key, snippet, _ in results:
+                console.print(f"[bold]{kind}[/bold] {escape(key)}: {escape(snippet)}")
+        console.print(f"Queried in {elapsed * 1000:.3f} ms")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+import heapq
+import json
+import os
+import re
+import tempfile
+import time
+from contextlib import suppress
+from itertools import groupby
+from operator import itemgetter
+from typing import IO, Any, Iterable, Iterator
+
+from .character_definitions import (
+    CharacterDefinition,
+    get_input_files,
+    get_manifest_filepath,
+)
+from .common import (
+    get_cache_dir,
+    get_console,
+    get_enrich_characters_dir,
+    get_output_characters_dir,
+    get_raw_characters_dir,
+    write_json,
+)
+from .memory_budget import get_peak_rss_bytes
+from .metrics import metrics
+from .sprite_sheets import load_sprite_manifest, record_sprite
+
+# definitions an external merge holds in memory before sorting and spilling them into a run
+DEFAULT_RUN_SIZE = 50000
+# runs merged at once, more runs are first merged into fewer longer runs
+MERGE_FAN_IN = 64
+READ_CHUNK_SIZE = 1 << 16
+
+NOT_WHITESPACE = re.compile(r"[^ \t\n\r]")
+NUMBER_CHARACTERS = re.compile(r"[0-9.eE+-]*")
+
+# character id, position of the input file, position within the file, definition
+SpilledDefinition = tuple[str, int, int, CharacterDefinition]
+MERGE_KEY = itemgetter(0, 1, 2)
+
+
+class _JsonReader:
+    """Decode JSON values one at a time from a file read a chunk at a time"""
+
+    def __init__(self, file_reader: IO[str], chunk_size: int) -> None:
+        self._file_reader = file_reader
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._position = 0
+        # characters dropped from the front of the buffer, to report positions in the file
+        self._offset = 0
+        self._at_end = False
+
+    def _read_more(self) -> bool:
+        if self._at_end:
+            return False
+        chunk = self._file_reader.read(self._chunk_size)
+        self._offset += self._position
+        self._buffer = self._buffer[self._position :] + chunk
+        self._position = 0
+        self._at_end = not chunk
+        return not self._at_end
+
+    def peek(self) -> str:
+        """Skip whitespace and get the next character, or an empty string at the end"""
+        while True:
+            if match := NOT_WHITESPACE.search(self._buffer, self._position):
+                self._position = match.start()
+                return self._buffer[self._position]
+            self._position = len(self._buffer)
+            if not self._read_more():
+                return ""
+
+    def consume(self, expected_character: str) -> None:
+        """Consume the next character, which must be the expected"""
+        if (character := self.peek()) != expected_character:
+            raise ValueError(
+                f"Expecting {expected_character!r} at character {self._offset + self._position}, "
+                f"got {character or 'the end'!r}"
+            )
+        self._position += 1
+
+    def expect_end(self) -> None:
+        """Check that nothing but whitespace is left"""
+        if self.peek():
+            raise ValueError(f"Extra data at character {self._offset + self._position}")
+
+    def decode(self) -> Any:
+        """Decode the next value, reading more chunks until the value is complete"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError:
+                if self._read_more():
+                    continue
+                raise
+            # a number cut off by the end of the buffer goes on in the next chunk
+            if not (
+                isinstance(value, (int, float))
+                and NUMBER_CHARACTERS.fullmatch(self._buffer, end)
+                and self._read_more()
+            ):
+                self._position = end
+                return value
+
+
+def iter_json_array(file_reader: IO[str], chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Any]:
+    """Parse a JSON array one element at a time, or a lone JSON value as the only element
+
+    Only a chunk of the file and the element being parsed are held in memory at a time.
+    """
+    reader = _JsonReader(file_reader, chunk_size)
+    if reader.peek() != "[":
+        yield reader.decode()
+    else:
+        reader.consume("[")
+        if reader.peek() != "]":
+            yield reader.decode()
+            while reader.peek() == ",":
+                reader.consume(",")
+                yield reader.decode()
+        reader.consume("]")
+    reader.expect_end()
+
+
+def _read_run(run_file: str) -> Iterator[SpilledDefinition]:
+    with open(run_file, "r", encoding="utf-8") as file_reader:
+        for line in file_reader:
+            yield json.loads(line)
+
+
+def _merge_run_files(run_files: list[str]) -> Iterator[SpilledDefinition]:
+    return heapq.merge(*map(_read_run, run_files), key=MERGE_KEY)
+
+
+class ExternalMerge:
+    """Merge definitions of input files by character id through sorted runs spilled to disk
+
+    Definitions are applied in the order of files, and in the order of each file, the same as
+    enriching in memory. At most `run_size` definitions are held while files are read, and a
+    definition per run while at most `fan_in` runs are merged at a time.
+    """
+
+    def __init__(
+        self, runs_dirpath: str, run_size: int = DEFAULT_RUN_SIZE, fan_in: int = MERGE_FAN_IN
+    ) -> None:
+        self.runs_dirpath = runs_dirpath
+        self.run_size = max(run_size, 1)
+        self.fan_in = max(fan_in, 2)
+        self.num_definitions = 0
+        # runs written to disk, including those merged from other runs
+        self.num_runs = 0
+        self._run_files: list[str] = []
+        self._pending: list[SpilledDefinition] = []
+
+    def _write_run(self, spilled_definitions: Iterable[SpilledDefinition]) -> str:
+        file_descriptor, run_file = tempfile.mkstemp(suffix=".jsonl", dir=self.runs_dirpath)
+        with open(file_descriptor, "w", encoding="utf-8") as file_writer:
+            for spilled_definition in spilled_definitions:
+                file_writer.write(json.dumps(spilled_definition, separators=(",", ":")))
+                file_writer.write("\n")
+        self.num_runs += 1
+        return run_file
+
+    def _spill(self) -> None:
+        self._pending.sort(key=MERGE_KEY)
+        self._run_files.append(self._write_run(self._pending))
+        self._pending = []
+
+    def _add_file(self, file_position: int, filepath: str) -> None:
+        with metrics.measure("read", path=filepath) as fields:
+            with open(filepath, "r", encoding="utf-8") as file_reader:
+                for position, character_definition in enumerate(iter_json_array(file_reader)):
+                    character_id = character_definition["id"]
+                    self._pending.append(
+                        (character_id, file_position, position, character_definition)
+                    )
+                    self.num_definitions += 1
+                    if len(self._pending) >= self.run_size:
+                        self._spill()
+            fields["runs"] = len(self._run_files)
+
+    def _merge_runs(self) -> Iterator[SpilledDefinition]:
+        if not self._run_files:
+            # everything fits in memory, nothing needs to be spilled
+            self._pending.sort(key=MERGE_KEY)
+            return iter(self._pending)
+
+        if self._pending:
+            self._spill()
+        while len(self._run_files) > self.fan_in:
+            run_files, self._run_files = self._run_files, []
+            for start in range(0, len(run_files), self.fan_in):
+                merged_run_files = run_files[start : start + self.fan_in]
+                self._run_files.append(self._write_run(_merge_run_files(merged_run_files)))
+                for run_file in merged_run_files:
+                    os.remove(run_file)
+        return _merge_run_files(self._run_files)
+
+    def merge(self, files: Iterable[str]) -> Iterator[CharacterDefinition]:
+        """Yield the definition of every character merged from the files, in the order of ids"""
+        with metrics.measure("spill"):
+            for file_position, filepath in enumerate(files):
+                self._add_file(file_position, filepath)
+
+        for _, spilled_definitions in groupby(self._merge_runs(), key=itemgetter(0)):
+            definition: CharacterDefinition = {}
+            for *_, character_definition in spilled_definitions:
+                definition.update(character_definition)
+            yield definition
+
+
+def enrich_externally(run_size: int = DEFAULT_RUN_SIZE, fan_in: int = MERGE_FAN_IN) -> None:
+    """Rebuild every character through an external merge, writing each as soon as it is merged
+
+    Memory is bounded by `run_size` definitions rather than by every definition. The enrichment
+    manifest is removed, so the next incremental enrichment rebuilds every character.
+    """
+    start = time.perf_counter()
+    files = get_input_files(get_enrich_characters_dir(), get_raw_characters_dir())
+    output_dirpath = get_output_characters_dir()
+
+    num_characters = 0
+    # runs are kept beside the cache rather than in a temporary directory that may be in memory
+    with tempfile.TemporaryDirectory(prefix="enrich-runs-", dir=get_cache_dir()) as runs_dirpath:
+        external_merge = ExternalMerge(runs_dirpath, run_size, fan_in)
+        sprite_manifest = load_sprite_manifest()
+        for definition in external_merge.merge(files):
+            record_sprite(definition, sprite_manifest)
+            write_json(os.path.join(output_dirpath, f'{definition["id"]}.json'), definition)
+            num_characters += 1
+
+    with suppress(FileNotFoundError):
+        os.remove(get_manifest_filepath())
+
+    console = get_console()
+    console.print(
+        f"Merged {external_merge.num_definitions} definitions from {len(files)} files into "
+        f"{num_characters} characters through {external_merge.num_runs} runs in "
+        f"{time.perf_counter() - start:.2f}s"
+    )
+    if (peak_rss_bytes := get_peak_rss_bytes()) is not None:
+        console.print(f"Peak RSS: {peak_rss_bytes / 2**20:,.1f} MiB")
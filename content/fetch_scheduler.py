@@ -0,0 +1,199 @@
+import random
+import time
+from collections import defaultdict
+from contextlib import suppress
+from threading import Condition, Lock
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+
+DEFAULT_RATE = 5.0
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_RETRIES = 4
+# responses slower than this many seconds count as a sign of an overloaded wiki
+LATENCY_TARGET = 5.0
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+DECREASE_FACTOR = 0.5
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+THROTTLE_STATUS_CODES = frozenset({429, 503})
+
+
+class TokenBucket:
+    """Allow `rate` acquisitions per second on average, in bursts of up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = Lock()
+
+    def acquire(self) -> float:
+        """Take a token, sleeping until it is available, and return the seconds slept"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # tokens go negative to reserve future tokens in the order callers arrive
+            self._tokens -= 1
+            wait_seconds = max(-self._tokens / self.rate, 0.0)
+
+        if wait_seconds > 0:
+            time.sleep(wait_seconds)
+        return wait_seconds
+
+
+class AimdLimiter:
+    """Concurrency limit that grows additively on success and shrinks multiplicatively on trouble
+
+    The limit decreases at most once per window of `limit` completed requests, so one burst of
+    failures halves it once.
+    """
+
+    def __init__(self, max_limit: int) -> None:
+        self.max_limit = max(max_limit, 1)
+        self.limit = float(self.max_limit)
+        self._num_in_flight = 0
+        self._num_since_decrease = self.max_limit
+        self._condition = Condition()
+
+    def acquire(self) -> None:
+        """Wait until fewer requests than the limit are in flight"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._num_in_flight < int(self.limit))
+            self._num_in_flight += 1
+
+    def release(self, congested: bool) -> bool:
+        """Finish a request and adapt the limit to how it went, returning whether it decreased"""
+        with self._condition:
+            self._num_in_flight -= 1
+            self._num_since_decrease += 1
+            previous_limit = self.limit
+            if not congested:
+                self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+            elif self._num_since_decrease >= self.limit:
+                self.limit = max(self.limit * DECREASE_FACTOR, 1.0)
+                self._num_since_decrease = 0
+            self._condition.notify_all()
+            return self.limit < previous_limit
+
+
+def _get_retry_after(response: Optional[requests.Response]) -> float:
+    if response is None:
+        return 0.0
+    try:
+        return float(response.headers.get("Retry-After", 0))
+    except ValueError:
+        return 0.0
+
+
+class FetchScheduler:
+    """Per-host rate-limited, adaptively concurrent HTTP GETs with timeouts and retries
+
+    Transient failures are connection errors, timeouts and `RETRY_STATUS_CODES`, retried after a
+    fully jittered exponential backoff, or the `Retry-After` the wiki asked for when longer.
+    """
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE,
+        max_concurrency: int = 1,
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+    ) -> None:
+        self.rate = rate
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self._lock = Lock()
+        self._host_to_controls: dict[str, tuple[Optional[TokenBucket], AimdLimiter]] = {}
+        self._counters: dict[str, float] = defaultdict(float)
+
+    def _get_host_controls(self, url: str) -> tuple[Optional[TokenBucket], AimdLimiter]:
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_to_controls:
+                bucket = (
+                    TokenBucket(self.rate, capacity=max(self.max_concurrency, 1))
+                    if self.rate > 0
+                    else None
+                )
+                self._host_to_controls[host] = (bucket, AimdLimiter(self.max_concurrency))
+            return self._host_to_controls[host]
+
+    def _count(self, counter: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._counters[counter] += amount
+
+    def _get_backoff_seconds(self, attempt: int, response: Optional[requests.Response]) -> float:
+        backoff_seconds = random.uniform(0, min(BACKOFF_BASE * 2 ** (attempt - 1), BACKOFF_MAX))
+        return min(max(backoff_seconds, _get_retry_after(response)), BACKOFF_MAX)
+
+    def _attempt(
+        self,
+        url: str,
+        headers: Optional[dict[str, str]],
+        bucket: Optional[TokenBucket],
+        limiter: AimdLimiter,
+    ) -> requests.Response:
+        if bucket is not None and (wait_seconds := bucket.acquire()) > 0:
+            self._count("throttled")
+            self._count("throttled seconds", wait_seconds)
+
+        limiter.acquire()
+        self._count("requests")
+        start = time.monotonic()
+        congested = True
+        try:
+            response = requests.get(url, headers=headers, timeout=self.timeout)
+        except requests.Timeout:
+            self._count("timeouts")
+            raise
+        except requests.ConnectionError:
+            self._count("connection errors")
+            raise
+        else:
+            congested = (
+                response.status_code in THROTTLE_STATUS_CODES
+                or time.monotonic() - start > LATENCY_TARGET
+            )
+        finally:
+            if limiter.release(congested):
+                self._count("concurrency decreases")
+
+        if response.status_code in THROTTLE_STATUS_CODES:
+            self._count("rate limited")
+        return response
+
+    def get(self, url: str, headers: Optional[dict[str, str]] = None) -> requests.Response:
+        """GET the URL, retrying transient failures
+
+        The response of the last attempt is returned even when its status is an error, so callers
+        still check it with `raise_for_status`.
+        """
+        bucket, limiter = self._get_host_controls(url)
+        for attempt in range(1, self.retries + 1):
+            response = None
+            with suppress(requests.ConnectionError, requests.Timeout):
+                response = self._attempt(url, headers, bucket, limiter)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return response
+
+            self._count("retries")
+            time.sleep(self._get_backoff_seconds(attempt, response))
+
+        return self._attempt(url, headers, bucket, limiter)
+
+    @property
+    def counters(self) -> dict[str, float]:
+        """Counts of requests, retries, throttled waits, rate limited responses and failures"""
+        with self._lock:
+            return dict(self._counters)
+
+    @property
+    def concurrency_limits(self) -> dict[str, float]:
+        """Current concurrency limit of each host"""
+        with self._lock:
+            return {host: limiter.limit for host, (_, limiter) in self._host_to_controls.items()}
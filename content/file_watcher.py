@@ -0,0 +1,149 @@
+import abc
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+from types import TracebackType
+from typing import Iterable, Optional
+
+# inotify event masks, see inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+INOTIFY_EVENT = struct.Struct("iIII")
+INOTIFY_BUFFER_SIZE = 64 * 1024
+
+# how long to keep collecting events after the first one, since one save can take several writes
+DEBOUNCE_SECONDS = 0.02
+POLL_INTERVAL = 0.5
+
+FileSnapshot = dict[str, tuple[int, int]]
+
+
+class FileWatcher(abc.ABC):
+    """Watch files directly inside some directories for changes"""
+
+    def __init__(self, dirpaths: Iterable[str]) -> None:
+        self.dirpaths = list(dirpaths)
+
+    @abc.abstractmethod
+    def wait(self, timeout: Optional[float] = None) -> set[str]:
+        """Wait for files to be written, moved or deleted, returning their paths
+
+        An empty set is returned when nothing changed within `timeout` seconds.
+        """
+
+    def close(self) -> None:
+        """Stop watching"""
+
+    def __enter__(self) -> "FileWatcher":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+
+class InotifyFileWatcher(FileWatcher):
+    """Watch files through Linux inotify, raising OSError where inotify is unavailable"""
+
+    def __init__(self, dirpaths: Iterable[str]) -> None:
+        super().__init__(dirpaths)
+        if not sys.platform.startswith("linux"):
+            raise OSError(f"inotify is not supported on {sys.platform}")
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "Cannot initialize inotify")
+
+        self._watch_descriptor_to_dirpath: dict[int, str] = {}
+        for dirpath in self.dirpaths:
+            watch_descriptor = libc.inotify_add_watch(self._fd, os.fsencode(dirpath), WATCH_MASK)
+            if watch_descriptor < 0:
+                os.close(self._fd)
+                raise OSError(ctypes.get_errno(), f"Cannot watch {dirpath}")
+            self._watch_descriptor_to_dirpath[watch_descriptor] = dirpath
+
+    def _read_events(self, filepaths: set[str]) -> None:
+        buffer = os.read(self._fd, INOTIFY_BUFFER_SIZE)
+        offset = 0
+        while offset < len(buffer):
+            watch_descriptor, mask, _cookie, length = INOTIFY_EVENT.unpack_from(buffer, offset)
+            offset += INOTIFY_EVENT.size
+            filename = os.fsdecode(buffer[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # events were dropped, so report every file that exists now
+                logging.warning("inotify queue overflowed, rescanning watched directories")
+                filepaths.update(_take_snapshot(self.dirpaths))
+            elif dirpath := self._watch_descriptor_to_dirpath.get(watch_descriptor):
+                filepaths.add(os.path.join(dirpath, filename))
+
+    def wait(self, timeout: Optional[float] = None) -> set[str]:
+        filepaths: set[str] = set()
+        wait_seconds = timeout
+        while select.select([self._fd], [], [], wait_seconds)[0]:
+            self._read_events(filepaths)
+            wait_seconds = DEBOUNCE_SECONDS
+        return filepaths
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def _take_snapshot(dirpaths: Iterable[str]) -> FileSnapshot:
+    snapshot: FileSnapshot = {}
+    for dirpath in dirpaths:
+        with os.scandir(dirpath) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+
+class PollingFileWatcher(FileWatcher):
+    """Watch files by comparing their modification times and sizes every `poll_interval` seconds"""
+
+    def __init__(self, dirpaths: Iterable[str], poll_interval: float = POLL_INTERVAL) -> None:
+        super().__init__(dirpaths)
+        self.poll_interval = poll_interval
+        self._snapshot = _take_snapshot(self.dirpaths)
+
+    def wait(self, timeout: Optional[float] = None) -> set[str]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = _take_snapshot(self.dirpaths)
+            filepaths = {
+                filepath
+                for filepath in snapshot.keys() | self._snapshot.keys()
+                if snapshot.get(filepath) != self._snapshot.get(filepath)
+            }
+            self._snapshot = snapshot
+            if filepaths or (deadline is not None and time.monotonic() >= deadline):
+                return filepaths
+            time.sleep(self.poll_interval)
+
+
+def create_file_watcher(dirpaths: Iterable[str], polling: bool = False) -> FileWatcher:
+    """Watch the directories through inotify, or by polling when asked to or inotify fails"""
+    dirpaths = list(dirpaths)
+    if not polling:
+        try:
+            return InotifyFileWatcher(dirpaths)
+        except OSError as error:
+            logging.warning("Falling back to polling: %s", error)
+    return PollingFileWatcher(dirpaths)
@@ -0,0 +1,267 @@
+import argparse
+import os
+import re
+import time
+from collections import deque
+from typing import Any, Iterable, Iterator, NamedTuple, Optional
+
+from .common import (
+    configure_logging,
+    get_console,
+    get_content_dir,
+    get_edition_dir,
+    get_game_information_dir,
+    get_json_files,
+    get_output_characters_dir,
+    read_json,
+    write_json,
+)
+
+GLOSSARY_FILENAME = "glossary.json"
+GLOSSARY_LINKS_FILENAME = "glossary-links.json"
+# keys of prose in characters and editions, the only values linked
+LINKED_KEYS = frozenset(
+    {
+        # characters
+        "ability",
+        "about",
+        "firstNightReminder",
+        "gameplay",
+        "otherNightReminder",
+        "soliloquy",
+        "tips",
+        # editions
+        "description",
+        "guide",
+        "synopsis",
+    }
+)
+
+TextLinks = dict[str, list["TermOccurrence"]]
+
+
+class TermOccurrence(NamedTuple):
+    """A glossary term found in `text[start:end]`"""
+
+    term: str
+    start: int
+    end: int
+
+
+def _is_word_character(character: str) -> bool:
+    return character.isalnum() or character == "_"
+
+
+def _is_whole_word(text: str, start: int, end: int) -> bool:
+    return (start == 0 or not _is_word_character(text[start - 1])) and (
+        end == len(text) or not _is_word_character(text[end])
+    )
+
+
+def _select_leftmost_longest(occurrences: Iterable[TermOccurrence]) -> list[TermOccurrence]:
+    """Keep non-overlapping occurrences, preferring the earliest and then the longest"""
+    selected: list[TermOccurrence] = []
+    end = 0
+    for occurrence in sorted(
+        occurrences, key=lambda occurrence: (occurrence.start, -occurrence.end)
+    ):
+        if occurrence.start >= end:
+            selected.append(occurrence)
+            end = occurrence.end
+    return selected
+
+
+class GlossaryAutomaton:
+    """Aho-Corasick automaton finding every glossary term in a text in one pass over it
+
+    Terms match case-insensitively as whole words. Overlapping occurrences are resolved to the
+    leftmost, then longest, one.
+    """
+
+    def __init__(self, terms: Iterable[str]) -> None:
+        self._transitions: list[dict[str, int]] = [{}]
+        self._state_to_term: list[Optional[str]] = [None]
+        self._depths = [0]
+        for term in terms:
+            self._add_term(term)
+
+        num_states = len(self._transitions)
+        self._failures = [0] * num_states
+        # nearest proper suffix state where a term ends, or -1
+        self._output_links = [-1] * num_states
+        self._link_states()
+
+    def _add_term(self, term: str) -> None:
+        state = 0
+        for character in term.lower():
+            if character not in self._transitions[state]:
+                self._transitions.append({})
+                self._state_to_term.append(None)
+                self._depths.append(self._depths[state] + 1)
+                self._transitions[state][character] = len(self._transitions) - 1
+            state = self._transitions[state][character]
+        if self._state_to_term[state] is None:
+            self._state_to_term[state] = term
+
+    def _link_states(self) -> None:
+        states = deque(self._transitions[0].values())
+        while states:
+            state = states.popleft()
+            for character, next_state in self._transitions[state].items():
+                failure = self._failures[state]
+                while failure and character not in self._transitions[failure]:
+                    failure = self._failures[failure]
+                failure = self._transitions[failure].get(character, 0)
+                self._failures[next_state] = failure
+                self._output_links[next_state] = (
+                    failure
+                    if self._state_to_term[failure] is not None
+                    else self._output_links[failure]
+                )
+                states.append(next_state)
+
+    @property
+    def num_states(self) -> int:
+        """Number of states of the automaton, one more than the characters of distinct prefixes"""
+        return len(self._transitions)
+
+    def _iter_occurrences(self, text: str) -> Iterator[TermOccurrence]:
+        lowered_text = text.lower()
+        if len(lowered_text) != len(text):
+            # rare characters lowercase to several, lowercase one by one to keep offsets
+            lowered_text = "".join(
+                lowered if len(lowered := character.lower()) == 1 else character
+                for character in text
+            )
+
+        transitions = self._transitions
+        failures = self._failures
+        state = 0
+        for end, character in enumerate(lowered_text, start=1):
+            while state and character not in transitions[state]:
+                state = failures[state]
+            state = transitions[state].get(character, 0)
+
+            output_state = (
+                state if self._state_to_term[state] is not None else self._output_links[state]
+            )
+            while output_state != -1:
+                start = end - self._depths[output_state]
+                if _is_whole_word(text, start, end):
+                    term = self._state_to_term[output_state]
+                    assert term is not None
+                    yield TermOccurrence(term, start, end)
+                output_state = self._output_links[output_state]
+
+    def find(self, text: str) -> list[TermOccurrence]:
+        """Find non-overlapping occurrences of terms in the text"""
+        return _select_leftmost_longest(self._iter_occurrences(text))
+
+
+def find_terms_naively(terms: Iterable[str], text: str) -> list[TermOccurrence]:
+    """Find the same occurrences as `GlossaryAutomaton.find` by searching for one term at a time"""
+    occurrences: list[TermOccurrence] = []
+    seen_terms: set[str] = set()
+    for term in terms:
+        if (lowered_term := term.lower()) in seen_terms:
+            continue
+        seen_terms.add(lowered_term)
+        occurrences.extend(
+            TermOccurrence(term, match.start(), match.end())
+            for match in re.finditer(rf"(?<!\w){re.escape(term)}(?!\w)", text, re.IGNORECASE)
+        )
+    return _select_leftmost_longest(occurrences)
+
+
+def _escape_pointer_token(token: str) -> str:
+    return token.replace("~", "~0").replace("/", "~1")
+
+
+def _iter_texts(data: Any, pointer: str = "") -> Iterator[tuple[str, str]]:
+    """Iterate over strings nested in the data along with their JSON pointers"""
+    if isinstance(data, str):
+        yield pointer, data
+    elif isinstance(data, dict):
+        for key, value in data.items():
+            yield from _iter_texts(value, f"{pointer}/{_escape_pointer_token(str(key))}")
+    elif isinstance(data, list):
+        for index, value in enumerate(data):
+            yield from _iter_texts(value, f"{pointer}/{index}")
+
+
+def link_texts(automaton: GlossaryAutomaton, data: dict[str, Any]) -> TextLinks:
+    """Find glossary terms in every prose text of a character or an edition, by JSON pointer"""
+    text_links: TextLinks = {}
+    for key, value in data.items():
+        if key not in LINKED_KEYS:
+            continue
+        for pointer, text in _iter_texts(value, f"/{_escape_pointer_token(key)}"):
+            if occurrences := automaton.find(text):
+                text_links[pointer] = occurrences
+    return text_links
+
+
+def link_glossary(
+    terms: Iterable[str],
+    characters: Iterable[dict[str, Any]],
+    edition_name_to_edition: dict[str, dict[str, Any]],
+) -> dict[str, dict[str, TextLinks]]:
+    """Find glossary terms in the texts of every character and edition"""
+    automaton = GlossaryAutomaton(terms)
+    return {
+        "characters": {
+            character["id"]: link_texts(automaton, character) for character in characters
+        },
+        "editions": {
+            edition_name: link_texts(automaton, edition)
+            for edition_name, edition in edition_name_to_edition.items()
+        },
+    }
+
+
+def get_glossary_links_filepath() -> str:
+    """Get path of the glossary terms found in characters and editions"""
+    return os.path.join(get_content_dir(), GLOSSARY_LINKS_FILENAME)
+
+
+def _count_occurrences(text_links: TextLinks) -> int:
+    return sum(map(len, text_links.values()))
+
+
+def link_content() -> None:
+    """Link glossary terms in enriched characters and editions and write them out"""
+    start = time.perf_counter()
+    terms = read_json(os.path.join(get_game_information_dir(), GLOSSARY_FILENAME)).keys()
+    characters = map(read_json, get_json_files(get_output_characters_dir()))
+    edition_name_to_edition = {
+        os.path.splitext(os.path.basename(filepath))[0]: read_json(filepath)
+        for filepath in get_json_files(get_edition_dir())
+    }
+    glossary_links = link_glossary(terms, characters, edition_name_to_edition)
+    write_json(get_glossary_links_filepath(), glossary_links)
+
+    num_occurrences = sum(
+        _count_occurrences(text_links)
+        for name_to_text_links in glossary_links.values()
+        for text_links in name_to_text_links.values()
+    )
+    get_console().print(
+        f"Linked {len(terms)} glossary terms {num_occurrences} times in "
+        f"{len(glossary_links['characters'])} characters and "
+        f"{len(glossary_links['editions'])} editions in {time.perf_counter() - start:.2f}s"
+    )
+
+
+def main() -> None:
+    """Parse the command line arguments and link glossary terms accordingly"""
+    parser = argparse.ArgumentParser(
+        description="Find glossary terms in the text of characters and editions"
+    )
+    parser.parse_args()
+    configure_logging()
+
+    link_content()
+
+
+if __name__ == "__main__":
+    main()
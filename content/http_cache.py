@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+from collections import defaultdict
+from threading import Lock, get_ident
+from typing import Any, Iterator, Optional
+
+import requests
+
+from .fetch_scheduler import FetchScheduler
+
+CacheEntry = dict[str, Any]
+
+
+def _hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class HttpCache:
+    """On-disk response cache keyed by URL that revalidates entries with conditional requests"""
+
+    def __init__(
+        self,
+        cache_dirpath: str,
+        offline: bool = False,
+        fetch_scheduler: Optional[FetchScheduler] = None,
+    ) -> None:
+        self.cache_dirpath = cache_dirpath
+        self.offline = offline
+        self.fetch_scheduler = fetch_scheduler or FetchScheduler()
+        self._lock = Lock()
+        self._url_locks: dict[str, Lock] = defaultdict(Lock)
+        self._fetched: set[str] = set()
+        self._unchanged: set[str] = set()
+
+    def _get_entry_filepath(self, url: str) -> str:
+        return os.path.join(self.cache_dirpath, f"{_hash_text(url)}.json")
+
+    def _load(self, url: str) -> Optional[CacheEntry]:
+        return self._load_file(self._get_entry_filepath(url))
+
+    @staticmethod
+    def _load_file(filepath: str) -> Optional[CacheEntry]:
+        try:
+            with open(filepath, "r", encoding="utf-8") as file_reader:
+                entry: CacheEntry = json.load(file_reader)
+                return entry
+        except FileNotFoundError:
+            return None
+
+    def _save(self, entry: CacheEntry) -> None:
+        filepath = self._get_entry_filepath(entry["url"])
+        temp_filepath = f"{filepath}.{os.getpid()}.{get_ident()}.tmp"
+        with open(temp_filepath, "w", encoding="utf-8") as file_writer:
+            json.dump(entry, file_writer)
+        os.replace(temp_filepath, filepath)
+
+    def _revalidate(self, url: str, entry: Optional[CacheEntry]) -> CacheEntry:
+        headers: dict[str, str] = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("lastModified"):
+                headers["If-Modified-Since"] = entry["lastModified"]
+
+        response = self.fetch_scheduler.get(url, headers=headers)
+        if entry is not None and response.status_code == requests.codes.not_modified:
+            self._unchanged.add(url)
+            return entry
+
+        response.raise_for_status()
+        body = response.text
+        body_hash = _hash_text(body)
+        if entry is not None and entry["sha256"] == body_hash:
+            self._unchanged.add(url)
+
+        new_entry = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "lastModified": response.headers.get("Last-Modified"),
+            "sha256": body_hash,
+            "body": body,
+            "output": None if entry is None else entry.get("output"),
+        }
+        self._save(new_entry)
+        return new_entry
+
+    def get(self, url: str) -> str:
+        """Get page body, revalidating the cached copy at most once per run"""
+        with self._lock:
+            url_lock = self._url_locks[url]
+
+        with url_lock:
+            entry = self._load(url)
+            if self.offline:
+                if entry is None:
+                    raise LookupError(f"{url} is not in the cache")
+                return str(entry["body"])
+
+            if url in self._fetched and entry is not None:
+                return str(entry["body"])
+
+            entry = self._revalidate(url, entry)
+            self._fetched.add(url)
+            return str(entry["body"])
+
+    def is_revalidated(self, url: str) -> bool:
+        """Whether the page was revalidated earlier in the run, so getting it reads the disk"""
+        return url in self._fetched
+
+    def is_unchanged(self, url: str) -> bool:
+        """Whether the page answered 304 or has the same body as when it was cached"""
+        return url in self._unchanged
+
+    def get_output(self, url: str) -> Optional[str]:
+        """Get the filepath last written from the page"""
+        entry = self._load(url)
+        return None if entry is None else entry.get("output")
+
+    def set_output(self, url: str, filepath: str) -> None:
+        """Record the filepath written from the page"""
+        with self._lock:
+            if (entry := self._load(url)) is not None and entry.get("output") != filepath:
+                entry["output"] = filepath
+                self._save(entry)
+
+    def iter_entries(self) -> Iterator[CacheEntry]:
+        """Iterate over cached entries in a stable order"""
+        for filename in sorted(os.listdir(self.cache_dirpath)):
+            if filename.endswith(".json"):
+                entry = self._load_file(os.path.join(self.cache_dirpath, filename))
+                if entry is not None:
+                    yield entry
+
+    @property
+    def num_unchanged(self) -> int:
+        """Number of pages unchanged since the last run"""
+        return len(self._unchanged)
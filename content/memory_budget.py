@@ -0,0 +1,69 @@
+import sys
+from contextlib import contextmanager
+from threading import Condition
+from typing import Iterator, Optional
+
+# bytes a parsed and indexed page takes per character of its HTML, measured with html.parser
+PARSE_BYTES_PER_CHARACTER = 60
+
+
+def estimate_parse_bytes(page_text: str) -> int:
+    """Estimate how many bytes parsing and indexing the page takes"""
+    return len(page_text) * PARSE_BYTES_PER_CHARACTER
+
+
+class MemoryBudget:
+    """Bytes that pages being parsed and extracted may take at once
+
+    A page waits until enough of the budget is released, except that a page is always let
+    through when no other page holds the budget, so a page larger than the budget still runs.
+    """
+
+    def __init__(self, budget_bytes: int) -> None:
+        self.budget_bytes = budget_bytes
+        self.peak_reserved_bytes = 0
+        self.num_waits = 0
+        self._reserved_bytes = 0
+        self._condition = Condition()
+
+    def _fits(self, num_bytes: int) -> bool:
+        return self._reserved_bytes == 0 or self._reserved_bytes + num_bytes <= self.budget_bytes
+
+    def acquire(self, num_bytes: int) -> None:
+        """Reserve bytes of the budget, waiting until they fit"""
+        with self._condition:
+            if not self._fits(num_bytes):
+                self.num_waits += 1
+                self._condition.wait_for(lambda: self._fits(num_bytes))
+            self._reserved_bytes += num_bytes
+            self.peak_reserved_bytes = max(self.peak_reserved_bytes, self._reserved_bytes)
+
+    def release(self, num_bytes: int) -> None:
+        """Return bytes reserved earlier to the budget"""
+        with self._condition:
+            self._reserved_bytes -= num_bytes
+            self._condition.notify_all()
+
+    @contextmanager
+    def reserve(self, num_bytes: int) -> Iterator[None]:
+        """Hold bytes of the budget within the context"""
+        self.acquire(num_bytes)
+        try:
+            yield
+        finally:
+            self.release(num_bytes)
+
+
+def get_peak_rss_bytes(children: bool = False) -> Optional[int]:
+    """Get the peak resident set size of this process, or of its largest finished child process
+
+    None is returned where the platform does not report it.
+    """
+    if sys.platform == "win32":
+        return None
+
+    import resource  # pylint: disable=import-outside-toplevel
+
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # kilobytes everywhere but macOS
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
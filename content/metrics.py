@@ -0,0 +1,129 @@
+import cProfile
+import json
+import math
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Optional
+
+if TYPE_CHECKING:
+    from rich.console import Console
+
+MetricRecord = dict[str, Any]
+
+
+def _percentile(sorted_values: list[float], percent: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    rank = max(math.ceil(percent / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class Metrics:
+    """Thread-safe recorder of stage durations and sizes"""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self._lock = Lock()
+        self._records: list[MetricRecord] = []
+
+    def record(self, stage: str, seconds: float, **fields: Any) -> None:
+        """Record one occurrence of a stage"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._records.append({"stage": stage, "seconds": seconds, **fields})
+
+    def extend(self, records: Iterable[MetricRecord]) -> None:
+        """Add records collected elsewhere, for example in another process"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._records.extend(records)
+
+    @contextmanager
+    def measure(self, stage: str, **fields: Any) -> Iterator[dict[str, Any]]:
+        """Measure the wall time of the block, which may add fields to the yielded dict"""
+        start = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            self.record(stage, time.perf_counter() - start, **fields)
+
+    @property
+    def records(self) -> list[MetricRecord]:
+        """Records so far"""
+        with self._lock:
+            return list(self._records)
+
+    def summarize(self) -> dict[str, dict[str, float]]:
+        """Count, total, p50, p95 and max of seconds (and bytes when present) per stage"""
+        stage_to_seconds: dict[str, list[float]] = defaultdict(list)
+        stage_to_bytes: dict[str, int] = defaultdict(int)
+        for record in self.records:
+            stage_to_seconds[record["stage"]].append(record["seconds"])
+            stage_to_bytes[record["stage"]] += record.get("bytes", 0)
+
+        summary: dict[str, dict[str, float]] = {}
+        for stage, seconds in stage_to_seconds.items():
+            sorted_seconds = sorted(seconds)
+            summary[stage] = {
+                "count": len(sorted_seconds),
+                "total": sum(sorted_seconds),
+                "p50": _percentile(sorted_seconds, 50),
+                "p95": _percentile(sorted_seconds, 95),
+                "max": sorted_seconds[-1],
+                "bytes": stage_to_bytes[stage],
+            }
+        return summary
+
+    def print_summary(self, console: "Console") -> None:
+        """Print the summary as a table"""
+        from rich.table import Table  # pylint: disable=import-outside-toplevel
+
+        table = Table("Stage", "Count", "Total (s)", "p50 (ms)", "p95 (ms)", "Max (ms)", "Bytes")
+        for stage, stage_summary in sorted(self.summarize().items()):
+            table.add_row(
+                stage,
+                str(stage_summary["count"]),
+                f'{stage_summary["total"]:.3f}',
+                f'{stage_summary["p50"] * 1000:.2f}',
+                f'{stage_summary["p95"] * 1000:.2f}',
+                f'{stage_summary["max"] * 1000:.2f}',
+                f'{stage_summary["bytes"]:,}',
+            )
+        console.print(table)
+
+    def write(self, filepath: str) -> None:
+        """Write the summary and every record as JSON"""
+        with open(filepath, "w", encoding="utf-8") as file_writer:
+            json.dump(
+                {"summary": self.summarize(), "records": self.records},
+                file_writer,
+                indent=4,
+                sort_keys=True,
+            )
+
+
+metrics = Metrics()
+
+
+@contextmanager
+def profile(
+    console: "Console", metrics_filepath: Optional[str], cprofile_filepath: Optional[str]
+) -> Iterator[None]:
+    """Collect metrics into `metrics_filepath` and a cProfile dump into `cprofile_filepath`"""
+    metrics.enabled = metrics_filepath is not None
+    profiler = None if cprofile_filepath is None else cProfile.Profile()
+
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None and cprofile_filepath is not None:
+            profiler.disable()
+            profiler.dump_stats(cprofile_filepath)
+        if metrics_filepath is not None:
+            metrics.write(metrics_filepath)
+            metrics.print_summary(console)
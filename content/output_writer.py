@@ -0,0 +1,147 @@
+import json
+import os
+import queue
+import threading
+from contextlib import suppress
+from types import TracebackType
+from typing import Any, Callable, Optional
+
+from .metrics import metrics
+
+# writes waiting for the background thread beyond which `OutputWriter.write` blocks
+DEFAULT_MAX_PENDING = 64
+
+OnWritten = Callable[[], None]
+PendingWrite = tuple[str, Any, Optional[OnWritten]]
+
+
+def serialize_json(data: Any, compact: bool = False) -> bytes:
+    """Serialize data as JSON with sorted keys, indented by 4 spaces unless compact"""
+    if compact:
+        return json.dumps(data, separators=(",", ":"), sort_keys=True).encode("utf-8")
+    return json.dumps(data, indent=4, sort_keys=True).encode("utf-8")
+
+
+def _holds_content(filepath: str, content: bytes) -> bool:
+    try:
+        if os.path.getsize(filepath) != len(content):
+            return False
+        with open(filepath, "rb") as file_reader:
+            return file_reader.read() == content
+    except FileNotFoundError:
+        return False
+
+
+def write_atomically(filepath: str, content: bytes) -> None:
+    """Write into a temporary file renamed over the file, so it is never left half-written"""
+    temporary_filepath = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporary_filepath, "wb") as file_writer:
+            file_writer.write(content)
+        os.replace(temporary_filepath, filepath)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.remove(temporary_filepath)
+        raise
+
+
+class WriteStats:
+    """Files written or skipped because they already held the same content"""
+
+    def __init__(self) -> None:
+        self.num_written = 0
+        self.num_skipped = 0
+        self.bytes_written = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+
+    def add(self, num_bytes: int, written: bool) -> None:
+        """Count a file of `num_bytes` bytes as written or skipped"""
+        with self._lock:
+            if written:
+                self.num_written += 1
+                self.bytes_written += num_bytes
+            else:
+                self.num_skipped += 1
+                self.bytes_saved += num_bytes
+
+    def __str__(self) -> str:
+        return (
+            f"Wrote {self.num_written} files ({self.bytes_written:,} bytes), "
+            f"skipped {self.num_skipped} unchanged files ({self.bytes_saved:,} bytes saved)"
+        )
+
+
+def write_if_changed(filepath: str, content: bytes, stats: Optional[WriteStats] = None) -> bool:
+    """Atomically write the content unless the file already holds it, returning whether written"""
+    with metrics.measure("write", path=filepath) as fields:
+        written = not _holds_content(filepath, content)
+        if written:
+            write_atomically(filepath, content)
+            fields["bytes"] = len(content)
+    if stats is not None:
+        stats.add(len(content), written)
+    return written
+
+
+class OutputWriter:
+    """Serialize and write JSON files on a background thread
+
+    At most `max_pending` writes wait for the thread, beyond which `write` blocks. Data must not
+    be mutated after being handed to `write`. An error raised by a write is raised again by every
+    later call of `write`, `flush` or `close`, and writes queued after it are dropped.
+    """
+
+    def __init__(self, compact: bool = False, max_pending: int = DEFAULT_MAX_PENDING) -> None:
+        self.compact = compact
+        self.stats = WriteStats()
+        self._pending_writes: queue.Queue[Optional[PendingWrite]] = queue.Queue(max_pending)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="output-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while (pending_write := self._pending_writes.get()) is not None:
+            filepath, data, on_written = pending_write
+            try:
+                if self._error is None:
+                    write_if_changed(filepath, serialize_json(data, self.compact), self.stats)
+                    if on_written is not None:
+                        on_written()
+            except Exception as error:
+                self._error = error
+            finally:
+                self._pending_writes.task_done()
+        self._pending_writes.task_done()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def write(self, filepath: str, data: Any, on_written: Optional[OnWritten] = None) -> None:
+        """Queue data to be written as JSON, calling `on_written` once the file holds it"""
+        self._raise_error()
+        self._pending_writes.put((filepath, data, on_written))
+
+    def flush(self) -> None:
+        """Wait until every queued write is done"""
+        self._pending_writes.join()
+        self._raise_error()
+
+    def close(self) -> None:
+        """Finish queued writes and stop the background thread"""
+        if self._thread.is_alive():
+            self._pending_writes.put(None)
+            self._thread.join()
+        self._raise_error()
+
+    def __enter__(self) -> "OutputWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
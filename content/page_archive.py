@@ -0,0 +1,76 @@
+import os
+import zipfile
+from threading import Lock
+from types import TracebackType
+from typing import Optional
+from urllib.parse import quote, unquote
+
+# fixed timestamp so recording the same pages produces the same archive
+ARCHIVE_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+ARCHIVE_COMPRESS_LEVEL = 9
+
+
+def _get_member_name(url: str) -> str:
+    return quote(url, safe="")
+
+
+class PageArchive:
+    """Pages keyed by URL in one zip file, compressed per page and indexed by its central directory
+
+    An archive is either recorded or replayed. A recorded archive replaces the file at
+    `archive_filepath` once closed.
+    """
+
+    def __init__(self, archive_filepath: str, record: bool = False) -> None:
+        self.archive_filepath = archive_filepath
+        self.recording = record
+        self._lock = Lock()
+        self._recorded_urls: set[str] = set()
+        self._temp_filepath = f"{archive_filepath}.tmp"
+        if record:
+            self._zip_file = zipfile.ZipFile(self._temp_filepath, "w")
+        else:
+            self._zip_file = zipfile.ZipFile(archive_filepath, "r")
+
+    def get(self, url: str) -> str:
+        """Get the recorded page, raising LookupError when it was not recorded"""
+        try:
+            with self._lock:
+                page_data = self._zip_file.read(_get_member_name(url))
+        except KeyError as error:
+            raise LookupError(f"{url} is not in {self.archive_filepath}") from error
+        return page_data.decode("utf-8")
+
+    def put(self, url: str, page_text: str) -> None:
+        """Record the page unless it is recorded already"""
+        member = zipfile.ZipInfo(_get_member_name(url), date_time=ARCHIVE_DATE_TIME)
+        member.compress_type = zipfile.ZIP_DEFLATED
+        with self._lock:
+            if url in self._recorded_urls:
+                return
+            self._recorded_urls.add(url)
+            self._zip_file.writestr(
+                member, page_text.encode("utf-8"), compresslevel=ARCHIVE_COMPRESS_LEVEL
+            )
+
+    def get_urls(self) -> list[str]:
+        """Get URLs of recorded pages in the order they were recorded"""
+        with self._lock:
+            return [unquote(member_name) for member_name in self._zip_file.namelist()]
+
+    def close(self) -> None:
+        """Close the archive, moving a recorded archive into place"""
+        self._zip_file.close()
+        if self.recording:
+            os.replace(self._temp_filepath, self.archive_filepath)
+
+    def __enter__(self) -> "PageArchive":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
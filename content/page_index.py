@@ -0,0 +1,119 @@
+from typing import Iterator, Optional
+
+from bs4 import BeautifulSoup, PageElement, Tag
+
+
+class PageIndex:
+    """Elements of a parsed page by id and by h2 section, collected in one walk over the tree
+
+    A section is an h2 header together with its following siblings up to the next h2.
+    """
+
+    def __init__(self, soup: BeautifulSoup) -> None:
+        self.soup = soup
+        self.h1: Optional[Tag] = None
+        self._id_to_element: dict[str, Tag] = {}
+        self._header_str_to_header: dict[str, Tag] = {}
+        # keyed by id() since tags hash by their markup
+        self._header_to_elements: dict[int, list[PageElement]] = {}
+        self._header_to_next_header: dict[int, Tag] = {}
+
+        headers: list[Tag] = []
+        for element in soup.descendants:
+            if isinstance(element, Tag):
+                self._index_tag(element)
+                if element.name == "h2":
+                    headers.append(element)
+
+        for header in headers:
+            self._index_section(header)
+
+    def _index_tag(self, tag: Tag) -> None:
+        if isinstance(tag_id := tag.attrs.get("id"), str):
+            self._id_to_element.setdefault(tag_id, tag)
+
+        if tag.name == "h1" and self.h1 is None:
+            self.h1 = tag
+        elif tag.name == "h2" and tag.string is not None:
+            self._header_str_to_header.setdefault(str(tag.string), tag)
+
+    def _index_section(self, header: Tag) -> None:
+        elements: list[PageElement] = []
+        sibling = header.next_sibling
+        while sibling is not None:
+            if isinstance(sibling, Tag) and sibling.name == "h2":
+                self._header_to_next_header[id(header)] = sibling
+                break
+            elements.append(sibling)
+            sibling = sibling.next_sibling
+        self._header_to_elements[id(header)] = elements
+
+    def get_element(self, element_id: str) -> Tag:
+        """Get the first element with the id, raising KeyError when there is none"""
+        return self._id_to_element[element_id]
+
+    def get_parent(self, element_id: str) -> Tag:
+        """Get the parent of the first element with the id, like the h2 around a headline"""
+        if (parent := self.get_element(element_id).parent) is None:
+            raise KeyError(element_id)
+        return parent
+
+    def has_element(self, element_id: str) -> bool:
+        """Whether some element has the id"""
+        return element_id in self._id_to_element
+
+    def get_header(self, header_str: str) -> Tag:
+        """Get the first h2 whose string is `header_str`, raising KeyError when there is none"""
+        return self._header_str_to_header[header_str]
+
+    def get_next_header(self, header: Tag) -> Optional[Tag]:
+        """Get the h2 starting the section after the section of `header`"""
+        return self._header_to_next_header.get(id(header))
+
+    def get_section(self, header: Tag) -> list[PageElement]:
+        """Get the siblings following the h2 up to the next h2"""
+        return self._header_to_elements[id(header)]
+
+    def get_sections(self, header: Optional[Tag]) -> Iterator[tuple[Tag, list[PageElement]]]:
+        """Iterate over non-empty sections from the section of `header` to the last one"""
+        while header is not None:
+            if elements := self.get_section(header):
+                yield header, elements
+            header = self.get_next_header(header)
+
+
+class SearchingPageIndex(PageIndex):
+    """The lookups of PageIndex made by searching the tree on every call
+
+    Pages were extracted this way before they were indexed, with `find` for every id and
+    `next_sibling` walks for every section, so it is kept as a baseline for benchmarks.
+    """
+
+    def __init__(self, soup: BeautifulSoup) -> None:  # pylint: disable=super-init-not-called
+        self.soup = soup
+        self.h1 = soup.h1
+
+    def get_element(self, element_id: str) -> Tag:
+        if (element := self.soup.find(id=element_id)) is None:
+            raise KeyError(element_id)
+        return element
+
+    def has_element(self, element_id: str) -> bool:
+        return self.soup.find(id=element_id) is not None
+
+    def get_header(self, header_str: str) -> Tag:
+        if (header := self.soup.find("h2", string=header_str)) is None:
+            raise KeyError(header_str)
+        return header
+
+    def get_next_header(self, header: Tag) -> Optional[Tag]:
+        next_header: Optional[Tag] = header.find_next_sibling("h2")
+        return next_header
+
+    def get_section(self, header: Tag) -> list[PageElement]:
+        elements: list[PageElement] = []
+        sibling = header.next_sibling
+        while sibling is not None and not (isinstance(sibling, Tag) and sibling.name == "h2"):
+            elements.append(sibling)
+            sibling = sibling.next_sibling
+        return elements
@@ -0,0 +1,102 @@
+import json
+import os
+from threading import Lock
+from types import TracebackType
+from typing import Any, Optional
+
+JOURNAL_SYNC_INTERVAL = 32
+
+JournalRecord = dict[str, Any]
+
+
+class ScrapeJournal:
+    """Append-only journal of the links discovered by a scrape run and the pages it completed
+
+    Records are JSON lines fsynced in batches of `sync_interval`, so a crash loses at most the
+    last batch, and a truncated last line is ignored on load.
+    """
+
+    def __init__(
+        self,
+        journal_filepath: str,
+        resume: bool = False,
+        sync_interval: int = JOURNAL_SYNC_INTERVAL,
+    ) -> None:
+        self.journal_filepath = journal_filepath
+        self.sync_interval = sync_interval
+        self._lock = Lock()
+        self._num_unsynced = 0
+        self._kind_to_links: dict[str, list[str]] = {}
+        self._url_to_output: dict[str, str] = {}
+
+        if resume:
+            self._load()
+        # pylint: disable-next=consider-using-with
+        self._file_writer = open(journal_filepath, "a" if resume else "w", encoding="utf-8")
+
+    def _load(self) -> None:
+        try:
+            with open(self.journal_filepath, "r", encoding="utf-8") as file_reader:
+                for line in file_reader:
+                    try:
+                        record: JournalRecord = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if "links" in record:
+                        self._kind_to_links[record["kind"]] = record["links"]
+                    else:
+                        self._url_to_output[record["url"]] = record["output"]
+        except FileNotFoundError:
+            pass
+
+    def _append(self, record: JournalRecord) -> None:
+        with self._lock:
+            self._file_writer.write(json.dumps(record) + "\n")
+            self._num_unsynced += 1
+            if self._num_unsynced >= self.sync_interval:
+                self._sync()
+
+    def _sync(self) -> None:
+        self._file_writer.flush()
+        os.fsync(self._file_writer.fileno())
+        self._num_unsynced = 0
+
+    def get_links(self, kind: str) -> Optional[list[str]]:
+        """Get links of the kind discovered earlier, or None when they were not discovered"""
+        return self._kind_to_links.get(kind)
+
+    def add_links(self, kind: str, links: list[str]) -> None:
+        """Record that all links of the kind were discovered"""
+        self._kind_to_links[kind] = links
+        self._append({"kind": kind, "links": links})
+
+    def is_completed(self, url: str) -> bool:
+        """Whether the page was completed and the file written from it still exists"""
+        return (filepath := self._url_to_output.get(url)) is not None and os.path.isfile(filepath)
+
+    def complete(self, url: str, filepath: str) -> None:
+        """Record that the page was completed by writing the file"""
+        self._url_to_output[url] = filepath
+        self._append({"url": url, "output": filepath})
+
+    @property
+    def num_completed(self) -> int:
+        """Number of pages completed so far, including by the run resumed from"""
+        return len(self._url_to_output)
+
+    def close(self) -> None:
+        """Sync and close the journal"""
+        with self._lock:
+            self._sync()
+            self._file_writer.close()
+
+    def __enter__(self) -> "ScrapeJournal":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
@@ -0,0 +1,235 @@
+import argparse
+import json
+import logging
+import queue
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from typing import IO, Any, Iterable, Iterator, NamedTuple, Optional
+
+from .common import configure_logging, get_console, guarded_execute
+from .metrics import metrics, profile
+from .page_index import PageIndex
+from .scrape_wiki import (
+    CHARACTER_PAGE,
+    CHARACTER_REGIONS,
+    EDITION_PAGE,
+    GAME_INFORMATION_PAGE,
+    GLOSSARY_PAGE,
+    add_fetch_arguments,
+    add_run_arguments,
+    index_page,
+    resolve_wiki_page_from_relative_url,
+    scrape_page,
+    scraping,
+)
+
+PAGE_KIND_TO_EXTRACTOR = {
+    "character": CHARACTER_PAGE,
+    "edition": EDITION_PAGE,
+    "glossary": GLOSSARY_PAGE,
+    "game-information": GAME_INFORMATION_PAGE,
+}
+# scraped pages that may wait to be yielded per fetching thread, beyond which reading URLs waits
+PAGES_IN_FLIGHT_PER_THREAD = 2
+
+
+class ScrapedPage(NamedTuple):
+    """What was scraped from the page at the URL, None when it cannot be scraped"""
+
+    url: str
+    kind: Optional[str]
+    data: Any
+
+
+def classify_page(index: PageIndex) -> Optional[str]:
+    """Tell which extractor a page is scraped with from its landmarks"""
+    if index.has_element("Appears_in"):
+        return "character"
+    if index.has_element("Synopsis"):
+        return "edition"
+    if index.h1 is not None and index.h1.get_text().strip() == "Glossary":
+        return "glossary"
+    if index.has_element("toc"):
+        return "game-information"
+    return None
+
+
+def read_urls(lines: Iterable[str]) -> Iterator[str]:
+    """Read URLs, or paths relative to the wiki, one per line, skipping blanks and # comments"""
+    for line in lines:
+        if (line := line.strip()) and not line.startswith("#"):
+            yield resolve_wiki_page_from_relative_url(line)
+
+
+@guarded_execute
+def _scrape_url(url: str, page_kind: Optional[str] = None) -> ScrapedPage:
+    if page_kind is not None:
+        return ScrapedPage(url, page_kind, scrape_page(PAGE_KIND_TO_EXTRACTOR[page_kind], url))
+
+    # character regions include every region other kinds of pages are extracted from
+    index = index_page(url, CHARACTER_REGIONS)
+    if (page_kind := classify_page(index)) is None:
+        logging.error("Cannot tell which kind of page %s is", url)
+        return ScrapedPage(url, None, None)
+    with metrics.measure("extract", url=url):
+        return ScrapedPage(url, page_kind, PAGE_KIND_TO_EXTRACTOR[page_kind].extract(index, url))
+
+
+def _scrape_url_or_none(url: str, page_kind: Optional[str]) -> ScrapedPage:
+    return _scrape_url(url, page_kind) or ScrapedPage(url, page_kind, None)
+
+
+class _PageStream:
+    """Scrape pages on threads as URLs are read, collecting them as each is scraped"""
+
+    def __init__(self, concurrency: int, page_kind: Optional[str]) -> None:
+        self.page_kind = page_kind
+        self.num_submitted: Optional[int] = None
+        self.error: Optional[BaseException] = None
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._slots = threading.Semaphore(concurrency * PAGES_IN_FLIGHT_PER_THREAD)
+        self.scraped_pages: queue.Queue[Optional[tuple[int, ScrapedPage]]] = queue.Queue()
+
+    def _put_scraped_page(self, index: int, future: Future[ScrapedPage]) -> None:
+        if not future.cancelled():
+            self.scraped_pages.put((index, future.result()))
+
+    def submit(self, urls: Iterable[str]) -> None:
+        """Submit every URL to be scraped, waiting while too many pages are in flight"""
+        num_submitted = 0
+        try:
+            for url in urls:
+                self._slots.acquire()  # pylint: disable=consider-using-with
+                future = self._executor.submit(_scrape_url_or_none, url, self.page_kind)
+                future.add_done_callback(partial(self._put_scraped_page, num_submitted))
+                num_submitted += 1
+        except BaseException as error:  # pylint: disable=broad-exception-caught
+            self.error = error
+        finally:
+            self.num_submitted = num_submitted
+            self.scraped_pages.put(None)
+
+    def release(self) -> None:
+        """Let another page be scraped once a scraped page is yielded"""
+        self._slots.release()
+
+    def close(self) -> None:
+        """Stop scraping pages not started yet"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def stream_pages(
+    urls: Iterable[str],
+    concurrency: int = 1,
+    ordered: bool = False,
+    page_kind: Optional[str] = None,
+) -> Iterator[ScrapedPage]:
+    """Scrape pages while URLs are read, yielding each page as soon as it is scraped
+
+    Pages are yielded in the order they finish unless `ordered`, in which case they are yielded
+    in the order of URLs. Pages are scraped as `page_kind` when given, otherwise as the kind their
+    landmarks tell.
+    """
+    page_stream = _PageStream(max(concurrency, 1), page_kind)
+    threading.Thread(target=page_stream.submit, args=(urls,), daemon=True).start()
+
+    index_to_scraped_page: dict[int, ScrapedPage] = {}
+    num_yielded = 0
+    try:
+        while page_stream.num_submitted is None or num_yielded < page_stream.num_submitted:
+            if (item := page_stream.scraped_pages.get()) is None:
+                continue
+            index, scraped_page = item
+            if not ordered:
+                yield scraped_page
+                page_stream.release()
+                num_yielded += 1
+                continue
+
+            index_to_scraped_page[index] = scraped_page
+            while num_yielded in index_to_scraped_page:
+                yield index_to_scraped_page.pop(num_yielded)
+                page_stream.release()
+                num_yielded += 1
+    finally:
+        page_stream.close()
+
+    if page_stream.error is not None:
+        raise page_stream.error
+
+
+def write_json_lines(
+    scraped_pages: Iterable[ScrapedPage], output: Optional[IO[str]] = None
+) -> int:
+    """Write a JSON line per scraped page as soon as it is scraped, returning how many
+
+    Lines are written into stdout unless another output is given.
+    """
+    output = output or sys.stdout
+    num_lines = 0
+    for scraped_page in scraped_pages:
+        output.write(json.dumps(scraped_page._asdict(), ensure_ascii=False, sort_keys=True))
+        output.write("\n")
+        output.flush()
+        num_lines += 1
+    return num_lines
+
+
+def stream_content(
+    urls_filepath: str,
+    concurrency: int = 1,
+    ordered: bool = False,
+    page_kind: Optional[str] = None,
+) -> None:
+    """Scrape pages at URLs listed in the file, or stdin when it is -, into JSON lines on stdout
+
+    Other output of the run goes to stderr, so stdout can be piped elsewhere.
+    """
+    console = get_console()
+    console.stderr = True
+    with (
+        nullcontext(sys.stdin)
+        if urls_filepath == "-"
+        else open(urls_filepath, "r", encoding="utf-8")
+    ) as url_lines:
+        num_pages = write_json_lines(
+            stream_pages(read_urls(url_lines), concurrency, ordered, page_kind)
+        )
+    console.print(f"Streamed {num_pages} pages")
+
+
+def main() -> None:
+    """Parse the command line arguments and stream pages at the listed URLs accordingly"""
+    parser = argparse.ArgumentParser(
+        description="Stream a JSON line per Blood On The Clocktower wiki page at the listed URLs"
+    )
+
+    parser.add_argument(
+        "urls", metavar="FILE", help="File listing URLs or paths relative to the wiki, - for stdin"
+    )
+    parser.add_argument(
+        "--ordered",
+        action="store_true",
+        help="Stream pages in the order of URLs instead of as soon as each is scraped",
+    )
+    parser.add_argument(
+        "--kind",
+        choices=PAGE_KIND_TO_EXTRACTOR,
+        help="Scrape every streamed page as the kind instead of telling from its landmarks",
+    )
+    add_fetch_arguments(parser)
+    add_run_arguments(parser)
+
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+
+    with profile(get_console(), args.profile, args.cprofile):
+        with scraping(args):
+            stream_content(args.urls, args.concurrency, args.ordered, args.kind)
+
+
+if __name__ == "__main__":
+    main()
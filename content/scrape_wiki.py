@@ -1,171 +1,437 @@
 import argparse
-import json
 import logging
 import os
-from collections import defaultdict
-from contextlib import suppress
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager, suppress
 from functools import partial, wraps
-from itertools import chain
+from itertools import chain, islice
 from operator import eq
-from typing import Any, Callable, Iterable, Iterator, Optional, ParamSpec, TypeVar
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    Optional,
+    TypeVar,
+)
 from urllib.parse import urljoin
 
-import requests
-from bs4 import BeautifulSoup, PageElement
-from rich.console import Console
-from rich.logging import RichHandler
+from bs4 import BeautifulSoup, PageElement, SoupStrainer, Tag
 from tqdm import tqdm
 
-logging.basicConfig(
-    level="NOTSET",
-    format="%(message)s",
-    datefmt="[%X]",
-    handlers=[RichHandler(rich_tracebacks=True)],
+from .common import (
+    DEFAULT_LOG_LEVEL,
+    LOG_LEVELS,
+    batched_writes,
+    configure_logging,
+    convert_to_character_id,
+    create_dir,
+    get_cache_dir,
+    get_console,
+    get_edition_dir,
+    get_game_information_dir,
+    get_raw_characters_dir,
+    guarded_execute,
+    write_json,
 )
+from .crawl_frontier import CrawlFrontier
+from .fetch_scheduler import (
+    DEFAULT_RATE,
+    DEFAULT_RETRIES,
+    DEFAULT_TIMEOUT,
+    FetchScheduler,
+)
+from .http_cache import HttpCache
+from .memory_budget import MemoryBudget, estimate_parse_bytes, get_peak_rss_bytes
+from .metrics import MetricRecord, Metrics, metrics, profile
+from .page_archive import PageArchive
+from .page_index import PageIndex
+from .scrape_journal import ScrapeJournal
 
-
-console = Console()
+console = get_console()
 
 T = TypeVar("T")
-P = ParamSpec("P")
 
 
-def guarded_execute(action: Callable[P, T]) -> Callable[P, Optional[T]]:
-    """Execute a function while catch and log any exception"""
+@create_dir
+def get_http_cache_dir() -> str:
+    """Get directory path of the cached wiki pages"""
+    return os.path.join(get_cache_dir(), "http")
 
-    @wraps(action)
-    def wrapper(*args: P.args, **kwargs: P.kwargs) -> Optional[T]:
-        try:
-            return action(*args, **kwargs)
-        except Exception:
-            logging.exception("Error")
-            return None
 
-    return wrapper
+def resolve_wiki_page_from_relative_url(url: str) -> str:
+    """Resolve a path relative to the wiki, like Fortune_Teller, into the URL of the page"""
+    return urljoin(MAIN_PAGE_URL, url)
+
+
+def _resolve_wiki_page_from_href(href: PageElement) -> str:
+    return resolve_wiki_page_from_relative_url(href["href"])
+
+
+MAIN_PAGE_URL = "https://wiki.bloodontheclocktower.com/Main_Page"
+PARSE_QUEUE_SIZE = 16
+PARSERS = ("html.parser", "lxml")
+CONTENT_REGIONS = ("content",)
+CHARACTER_REGIONS = ("content", "categories")
+
+
+_http_cache: Optional[HttpCache] = None
+
+
+def use_http_cache(http_cache: Optional[HttpCache]) -> None:
+    """Serve pages through the specified HTTP cache, or directly from the wiki when None"""
+    global _http_cache  # pylint: disable=global-statement
+    _http_cache = http_cache
+
+
+_fetch_scheduler = FetchScheduler()
+
+
+def use_fetch_scheduler(fetch_scheduler: FetchScheduler) -> None:
+    """Download pages through the specified fetch scheduler"""
+    global _fetch_scheduler  # pylint: disable=global-statement
+    _fetch_scheduler = fetch_scheduler
+
+
+_page_archive: Optional[PageArchive] = None
+
+
+def use_page_archive(page_archive: Optional[PageArchive]) -> None:
+    """Record fetched pages into, or replay pages from, the specified archive"""
+    global _page_archive  # pylint: disable=global-statement
+    _page_archive = page_archive
+
+
+_memory_budget: Optional[MemoryBudget] = None
+
+
+def use_memory_budget(memory_budget: Optional[MemoryBudget]) -> None:
+    """Extract pages in a streaming mode within the specified memory budget, or not when None
+
+    In the streaming mode, the tree of every extracted page is decomposed right after extraction,
+    and pages wait to be parsed while the trees of pages in flight would exceed the budget.
+    """
+    global _memory_budget  # pylint: disable=global-statement
+    _memory_budget = memory_budget
+
+
+def _get_page_text(url: str) -> str:
+    stage = "read" if _http_cache is not None and _http_cache.is_revalidated(url) else "fetch"
+    with metrics.measure(stage, url=url) as fields:
+        if _page_archive is not None and not _page_archive.recording:
+            page_text = _page_archive.get(url)
+        elif _http_cache is None:
+            response = _fetch_scheduler.get(url)
+            response.raise_for_status()
+            page_text = response.text
+        else:
+            page_text = _http_cache.get(url)
+
+        if _page_archive is not None and _page_archive.recording:
+            _page_archive.put(url, page_text)
+
+        if metrics.enabled:
+            fields["bytes"] = len(page_text.encode("utf-8"))
+        return page_text
+
+
+_parser = "html.parser"
+
+
+def use_parser(parser: str) -> None:
+    """Parse pages with the specified BeautifulSoup parser backend"""
+    global _parser  # pylint: disable=global-statement
+    _parser = parser
+    _url_to_discovery_page_index.clear()
+    _discovery_page_counts.clear()
+
+
+def parse_page(
+    page_text: str, regions: Optional[tuple[str, ...]] = None, parser: Optional[str] = None
+) -> BeautifulSoup:
+    """Parse the page, keeping only elements with the specified ids when regions is given"""
+    parse_only = None if regions is None else SoupStrainer(id=list(regions))
+    return BeautifulSoup(page_text, features=parser or _parser, parse_only=parse_only)
+
+
+def index_page(url: str, regions: Optional[tuple[str, ...]] = None) -> PageIndex:
+    """Fetch and parse the page, keeping only the specified regions when given"""
+    page_text = _get_page_text(url)
+    with metrics.measure("parse", url=url):
+        return PageIndex(parse_page(page_text, regions))
+
+
+# pages links are discovered from, like the main page and category pages, kept for the run
+_url_to_discovery_page_index: dict[str, PageIndex] = {}
+_discovery_page_counts: Counter[str] = Counter()
 
 
-def create_dir(action: Callable[P, str]) -> Callable[P, str]:
-    """Create a directory at specified path"""
+def _get_discovery_page_index(url: str, regions: Optional[tuple[str, ...]] = None) -> PageIndex:
+    if (index := _url_to_discovery_page_index.get(url)) is not None:
+        _discovery_page_counts["reused"] += 1
+        return index
+    _url_to_discovery_page_index[url] = index = index_page(url, regions)
+    return index
 
-    @wraps(action)
-    def wrapper(*args: P.args, **kwargs: P.kwargs) -> str:
-        dirpath = action(*args, **kwargs)
-        if not os.path.isdir(dirpath):
-            os.makedirs(dirpath, exist_ok=True)
-        return dirpath
+
+def _get_main_page_index() -> PageIndex:
+    return _get_discovery_page_index(MAIN_PAGE_URL)
+
+
+def _scrape_pages(
+    scrape: Callable[[str], T], links: Iterable[str], concurrency: int = 1
+) -> Iterator[T]:
+    """Scrape pages in the order of links, overlapping up to `concurrency` page fetches"""
+    if concurrency <= 1:
+        yield from map(scrape, links)
+        return
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        yield from executor.map(scrape, links)
+
+
+def _has_unchanged_output(url: str) -> bool:
+    if _http_cache is None or _http_cache.offline:
+        return False
+
+    _get_page_text(url)
+    filepath = _http_cache.get_output(url)
+    if not (_http_cache.is_unchanged(url) and filepath and os.path.isfile(filepath)):
+        return False
+    # the skipped page is completed by the output written in an earlier run
+    if _scrape_journal is not None:
+        _scrape_journal.complete(url, filepath)
+    return True
+
+
+def _skip_unchanged(scrape: Callable[[str], Optional[T]]) -> Callable[[str], Optional[T]]:
+    """Skip scraping a page whose output is still there and which is unchanged since written"""
+
+    @wraps(scrape)
+    def wrapper(url: str) -> Optional[T]:
+        if _has_unchanged_output(url):
+            return None
+        return scrape(url)
 
     return wrapper
 
 
-def get_root_dir() -> str:
-    """Get root dir -- where last segment is BloodOnTheClocktower"""
-    dirpath = os.getcwd()
-    while os.path.basename(dirpath) != "BloodOnTheClocktower":
-        dirpath = os.path.dirname(dirpath)
-    return dirpath
+_scrape_journal: Optional[ScrapeJournal] = None
 
 
-@create_dir
-def _get_content_dir() -> str:
-    return os.path.join(get_root_dir(), "content")
+def use_scrape_journal(scrape_journal: Optional[ScrapeJournal]) -> None:
+    """Journal discovered links and completed pages into the specified journal"""
+    global _scrape_journal  # pylint: disable=global-statement
+    _scrape_journal = scrape_journal
 
 
-@create_dir
-def _get_edition_dir() -> str:
-    return os.path.join(_get_content_dir(), "editions")
+def _get_scrape_journal_filepath() -> str:
+    return os.path.join(get_cache_dir(), "scrape-journal.jsonl")
 
 
-@create_dir
-def get_characters_dir() -> str:
-    """Get characters directory path"""
-    return os.path.join(_get_content_dir(), "characters")
+_kind_to_crawl_frontier: dict[str, CrawlFrontier] = {}
 
 
-@create_dir
-def get_raw_characters_dir() -> str:
-    """Get wiki-scraped characters directory path"""
-    return os.path.join(get_characters_dir(), "raw")
+def _discover_links(kind: str, discover: Callable[[CrawlFrontier], None]) -> list[str]:
+    """Discover links of the kind into a crawl frontier, unless the journal resumed from has them
 
+    The links are canonical, deduplicated and in priority order.
+    """
+    if _scrape_journal is not None and (links := _scrape_journal.get_links(kind)) is not None:
+        return links
 
-@create_dir
-def _get_game_information_dir() -> str:
-    return os.path.join(_get_content_dir(), "game-information")
+    _kind_to_crawl_frontier[kind] = crawl_frontier = CrawlFrontier()
+    discover(crawl_frontier)
+    links = crawl_frontier.pop_all()
+    if _scrape_journal is not None:
+        _scrape_journal.add_links(kind, links)
+    return links
 
 
-def _resolve_wiki_page_from_relative_url(url: str) -> str:
-    return urljoin(MAIN_PAGE_URL, url)
+def _get_pending_links(links: Iterable[str]) -> list[str]:
+    """Links except those of pages completed in the journal resumed from"""
+    if _scrape_journal is None:
+        return list(links)
+    return [link for link in links if not _scrape_journal.is_completed(link)]
 
 
-def _resolve_wiki_page_from_href(href: PageElement) -> str:
-    return _resolve_wiki_page_from_relative_url(href["href"])
+def _record_output(url: str, filepath: str) -> None:
+    if _http_cache is not None:
+        _http_cache.set_output(url, filepath)
+    if _scrape_journal is not None:
+        _scrape_journal.complete(url, filepath)
 
 
-MAIN_PAGE_URL = "https://wiki.bloodontheclocktower.com/Main_Page"
+class PageExtractor(NamedTuple):
+    """Extract data from the index of a page parsed with only the specified regions"""
 
+    extract: Callable[[PageIndex, str], Any]
+    regions: Optional[tuple[str, ...]] = None
 
-def _get_page_soup(url: str) -> BeautifulSoup:
-    main_page = requests.get(url).text
-    return BeautifulSoup(main_page, features="html.parser")
 
+def _stream_page(extractor: PageExtractor, url: str, memory_budget: MemoryBudget) -> Any:
+    page_text = _get_page_text(url)
+    with memory_budget.reserve(estimate_parse_bytes(page_text)):
+        with metrics.measure("parse", url=url):
+            soup = parse_page(page_text, extractor.regions)
+        try:
+            with metrics.measure("extract", url=url):
+                return extractor.extract(PageIndex(soup), url)
+        finally:
+            # break the reference cycles of the tree now instead of at the next collection
+            soup.decompose()
 
-def _get_main_page_soup() -> BeautifulSoup:
-    return _get_page_soup(url=MAIN_PAGE_URL)
 
+@guarded_execute
+def scrape_page(extractor: PageExtractor, url: str) -> Any:
+    """Fetch, parse and extract the page, None when it cannot be scraped"""
+    if _memory_budget is not None:
+        return _stream_page(extractor, url, _memory_budget)
 
-def _get_page_section_elements(
-    soup: BeautifulSoup,
-    get_section_start: Callable[[BeautifulSoup], PageElement],
-    is_section_element: Callable[[PageElement], bool],
-    is_another_section: Callable[[PageElement], bool],
-) -> Iterable[PageElement]:
-    current_element = get_section_start(soup)
+    index = index_page(url, extractor.regions)
+    with metrics.measure("extract", url=url):
+        return extractor.extract(index, url)
 
-    while True:
-        current_element = current_element.next_sibling
 
-        if current_element is None or is_another_section(current_element):
-            break
+@guarded_execute
+def _get_changed_page_text(url: str) -> Optional[str]:
+    if _has_unchanged_output(url):
+        return None
+    return _get_page_text(url)
+
+
+def _extract_page_text(
+    extractor: PageExtractor, parser: str, url: str, page_text: str, measure: bool
+) -> tuple[Any, list[MetricRecord]]:
+    """Parse and extract a page in a worker process, returning metrics recorded there too"""
+    worker_metrics = Metrics()
+    worker_metrics.enabled = measure
+
+    with worker_metrics.measure("parse", url=url):
+        soup = guarded_execute(parse_page)(page_text, extractor.regions, parser)
+        index = None if soup is None else PageIndex(soup)
+    if index is None:
+        return None, worker_metrics.records
+
+    with worker_metrics.measure("extract", url=url):
+        data = guarded_execute(extractor.extract)(index, url)
+    index.soup.decompose()
+    return data, worker_metrics.records
+
+
+def _release_memory_budget(
+    memory_budget: MemoryBudget, num_bytes: int, _extraction: Future[Any]
+) -> None:
+    memory_budget.release(num_bytes)
+
+
+def _submit_extraction(
+    parse_executor: ProcessPoolExecutor, extractor: PageExtractor, url: str, page_text: str
+) -> Future[Any]:
+    """Submit the page to be parsed and extracted, once it fits in the memory budget if any"""
+    if _memory_budget is None:
+        return parse_executor.submit(
+            _extract_page_text, extractor, _parser, url, page_text, metrics.enabled
+        )
 
-        if is_section_element(current_element):
-            yield current_element
+    # released once extracted rather than once yielded, so waiting here never waits on pages
+    # that only wait to be yielded
+    parse_bytes = estimate_parse_bytes(page_text)
+    _memory_budget.acquire(parse_bytes)
+    try:
+        extraction = parse_executor.submit(
+            _extract_page_text, extractor, _parser, url, page_text, metrics.enabled
+        )
+    except BaseException:
+        _memory_budget.release(parse_bytes)
+        raise
+    extraction.add_done_callback(partial(_release_memory_budget, _memory_budget, parse_bytes))
+    return extraction
+
+
+def _extract_pages_in_processes(
+    extractor: PageExtractor,
+    links: Iterable[str],
+    concurrency: int,
+    processes: int,
+    queue_size: int = PARSE_QUEUE_SIZE,
+) -> Iterator[Any]:
+    """Fetch pages in threads and parse fetched pages in processes, yielding in link order
+
+    At most `queue_size` fetched pages wait to be parsed at any time, and fewer when their trees
+    would exceed the memory budget.
+    """
+    link_iterator = iter(links)
+    with ThreadPoolExecutor(
+        max_workers=max(concurrency, 1)
+    ) as fetch_executor, ProcessPoolExecutor(max_workers=processes) as parse_executor:
+        page_texts: deque[tuple[str, Future[Optional[str]]]] = deque()
+        extractions: deque[Optional[Future[Any]]] = deque()
+
+        def fetch_next_page() -> None:
+            for link in islice(link_iterator, 1):
+                page_texts.append((link, fetch_executor.submit(_get_changed_page_text, link)))
+
+        for _ in range(max(concurrency, 1)):
+            fetch_next_page()
+
+        while page_texts or extractions:
+            while page_texts and len(extractions) < queue_size:
+                link, page_text_future = page_texts.popleft()
+                fetch_next_page()
+                if (page_text := page_text_future.result()) is None:
+                    extractions.append(None)
+                    continue
+                extractions.append(_submit_extraction(parse_executor, extractor, link, page_text))
+
+            if (extraction := extractions.popleft()) is None:
+                yield None
+                continue
+
+            data, records = extraction.result()
+            metrics.extend(records)
+            yield data
+
+
+def _extract_pages(
+    extractor: PageExtractor, links: Iterable[str], concurrency: int = 1, processes: int = 0
+) -> Iterator[Any]:
+    """Scrape pages in link order, parsing in a process pool when `processes` is positive"""
+    if processes > 0:
+        return _extract_pages_in_processes(extractor, links, concurrency, processes)
+
+    return _scrape_pages(_skip_unchanged(partial(scrape_page, extractor)), links, concurrency)
 
 
-def _get_page_sections(
-    soup: BeautifulSoup,
-    get_section_start: Callable[[BeautifulSoup], PageElement],
+def _get_page_section_elements(
+    section_start: PageElement,
     is_section_element: Callable[[PageElement], bool],
     is_another_section: Callable[[PageElement], bool],
-) -> dict[PageElement, list[PageElement]]:
-    section_to_elements: dict[PageElement, list[PageElement]] = defaultdict(list)
-
-    current_section = current_element = get_section_start(soup)
+) -> Iterable[PageElement]:
+    current_element = section_start
 
     while True:
         current_element = current_element.next_sibling
 
-        if current_element is None:
+        if current_element is None or is_another_section(current_element):
             break
 
-        if is_another_section(current_element):
-            current_section = current_element
-
         if is_section_element(current_element):
-            section_to_elements[current_section].append(current_element)
-
-    return section_to_elements
+            yield current_element
 
 
-def _get_page_section_rows(soup: BeautifulSoup, header_str: str) -> Iterable[PageElement]:
-    return _get_page_section_elements(
-        soup,
-        get_section_start=lambda soup: soup.find("h2", string=header_str),
-        is_section_element=lambda element: element.name == "div" and "row" in element["class"],
-        is_another_section=lambda element: element.name == "h2",
+def _get_page_section_rows(index: PageIndex, header_str: str) -> Iterable[PageElement]:
+    return (
+        element
+        for element in index.get_section(index.get_header(header_str))
+        if element.name == "div" and "row" in element["class"]
     )
 
 
 def _get_main_page_section_rows(header_str: str) -> Iterable[PageElement]:
-    return _get_page_section_rows(_get_main_page_soup(), header_str)
+    return _get_page_section_rows(_get_main_page_index(), header_str)
 
 
 def _get_text(
@@ -181,7 +447,8 @@ def _get_text(
     return text
 
 
-def _join_text(elements: Iterable[PageElement], separator: str = "\n", **kwargs: Any) -> str:
+def join_text(elements: Iterable[PageElement], separator: str = "\n", **kwargs: Any) -> str:
+    """Join the non-empty texts of the elements"""
     return separator.join(
         filter(None, (_get_text(element, **kwargs) for element in elements))
     ).strip()
@@ -209,13 +476,12 @@ def _get_character_type_links() -> Iterable[str]:
 
 
 def _get_game_information_page_links() -> Iterator[str]:
-    soup = _get_main_page_soup()
-    game_information_sidebar_list_item = soup.find(id="p-Game_Information").parent
-    characters_sidebar_list_item = soup.find(id="p-Characters").parent
+    index = _get_main_page_index()
+    game_information_sidebar_list_item = index.get_parent("p-Game_Information")
+    characters_sidebar_list_item = index.get_parent("p-Characters")
 
     game_information_list_items = _get_page_section_elements(
-        soup,
-        get_section_start=lambda soup: game_information_sidebar_list_item,
+        game_information_sidebar_list_item,
         is_section_element=lambda element: element.name == "li",
         is_another_section=partial(eq, characters_sidebar_list_item),
     )
@@ -223,28 +489,25 @@ def _get_game_information_page_links() -> Iterator[str]:
         yield _resolve_wiki_page_from_href(game_information_list_item.find("a"))
 
 
-@guarded_execute
-def _scrape_edition_page(url: str) -> dict[str, Any]:
-    soup = _get_page_soup(url)
-
-    name = _get_h1_text(soup)
+def _extract_edition_page(index: PageIndex, url: str) -> dict[str, Any]:
+    name = _get_h1_text(index)
 
-    synopsis_title = soup.find(id="Synopsis")
+    synopsis_title = index.get_element("Synopsis")
     synopsis_div = next(parent for parent in synopsis_title.parents if parent.name == "div")
-    synopsis = _join_text(synopsis_div.find_all("p"))
+    synopsis = join_text(synopsis_div.find_all("p"))
 
     main_content_div = synopsis_div.find_next_sibling("div")
     characters: dict[str, list[str]] = dict()
     for characters_group_header in main_content_div.find_all("h3"):
         character_groupname = _get_text(characters_group_header)
         character_groupname_lower = character_groupname.lower()
-        character_group_ul = soup.find(id=character_groupname).parent.find_next_sibling("ul")
+        character_group_ul = index.get_parent(character_groupname).find_next_sibling("ul")
         character_names = [_get_text(character) for character in character_group_ul.find_all("h4")]
         characters[character_groupname_lower] = character_names
 
-    table_of_content = soup.find(id="toc")
+    table_of_content = index.get_element("toc")
     description_paragraphs = list(reversed(table_of_content.find_previous_siblings("p")))
-    description = _join_text(description_paragraphs).strip()
+    description = join_text(description_paragraphs).strip()
 
     try:
         difficulty = description_paragraphs[1].get_text().split(".", maxsplit=1)[0].strip()
@@ -276,30 +539,37 @@ def _scrape_edition_page(url: str) -> dict[str, Any]:
     return data
 
 
+EDITION_PAGE = PageExtractor(_extract_edition_page, CONTENT_REGIONS)
+
+
 def _get_character_links(character_type_page_link: str) -> Iterable[str]:
-    soup = _get_page_soup(character_type_page_link)
-    character_hrefs = soup.select(".mw-category-group a")
+    index = _get_discovery_page_index(character_type_page_link, CONTENT_REGIONS)
+    character_hrefs = index.soup.select(".mw-category-group a")
     return map(_resolve_wiki_page_from_href, character_hrefs)
 
 
-def _get_h1_text(soup: BeautifulSoup) -> str:
-    return _get_text(soup.h1)
-
+def _discover_character_links(frontier: CrawlFrontier, concurrency: int = 1) -> None:
+    """Add characters of each type to the frontier, prioritized in the order of their types"""
+    character_type_links = _discover_links(
+        "character type", lambda frontier: frontier.add_all(_get_character_type_links())
+    )
+    for priority, character_links in enumerate(
+        _scrape_pages(_get_character_links, character_type_links, concurrency)
+    ):
+        frontier.add_all(character_links, priority)
 
-def _convert_to_character_id(character_name: str) -> str:
-    return "".join(c.lower() for c in character_name if c.isalpha())
 
+def _get_h1_text(index: PageIndex) -> str:
+    return _get_text(index.h1)
 
-@guarded_execute
-def _scrape_character_page(character_page_link: str) -> dict[str, Any]:
-    soup = _get_page_soup(character_page_link)
 
-    name = _get_h1_text(soup)
-    character_id = _convert_to_character_id(name)
+def _extract_character_page(index: PageIndex, _character_page_link: str) -> dict[str, Any]:
+    name = _get_h1_text(index)
+    character_id = convert_to_character_id(name)
 
-    appears_in_element = soup.find(id="Appears_in").parent
+    appears_in_element = index.get_parent("Appears_in")
 
-    categories_div = soup.find(id="categories")
+    categories_div = index.get_element("categories")
     categories_hrefs = categories_div.find_all(
         "a", title=lambda title: title.startswith("Category")
     )
@@ -314,39 +584,37 @@ def _scrape_character_page(character_page_link: str) -> dict[str, Any]:
         character_type = _get_text(character_type_href, lower=True)
     else:
         # infer where it appears
-        character_type = appears_in_element.find_next_sibling("div").find("a")["title"]
+        appears_in_div = next(
+            element
+            for element in index.get_section(appears_in_element)
+            if isinstance(element, Tag) and element.name == "div"
+        )
+        character_type = appears_in_div.find("a")["title"]
 
-    character_text_elements = _get_page_section_elements(
-        soup,
-        get_section_start=lambda soup: soup.find(id="Character_Text").parent,
-        is_section_element=lambda element: element.name == "p",
-        is_another_section=lambda element: element.name == "h2",
+    character_text_elements = (
+        element
+        for element in index.get_section(index.get_parent("Character_Text"))
+        if element.name == "p"
     )
-    character_text = _join_text(character_text_elements, strip_quote=True)
+    character_text = join_text(character_text_elements, strip_quote=True)
 
-    example_gameplay_divs = _get_page_section_rows(soup, "Example Gameplay")
+    example_gameplay_divs = _get_page_section_rows(index, "Example Gameplay")
     example_gameplay = [
         _get_text(example_gameplay_div, strip=True)
         for example_gameplay_div in example_gameplay_divs
     ]
 
-    tip_section_start = soup.find(id="Example_Gameplay").parent.find_next_sibling("h2")
-
-    tip_section_to_elements = _get_page_sections(
-        soup,
-        get_section_start=lambda soup: tip_section_start,
-        is_section_element=lambda element: element.name != "h2",
-        is_another_section=lambda element: element.name == "h2",
-    )
+    tip_section_start = index.get_next_header(index.get_parent("Example_Gameplay"))
+    tip_sections = index.get_sections(tip_section_start)
     tips = {
-        _get_text(tip_section): _join_text(tip_section_elements)
-        for tip_section, tip_section_elements in tip_section_to_elements.items()
+        _get_text(tip_section): join_text(tip_section_elements)
+        for tip_section, tip_section_elements in tip_sections
     }
 
     soliloquy_element = appears_in_element.find_previous_sibling("div")
     soliloquy = _get_text(soliloquy_element, strip_quote=True)
 
-    toc_element = soup.find(id="toc")
+    toc_element = index.get_element("toc")
     about_element = toc_element.find_previous_sibling("p")
     if about_element is None:
         about = ""
@@ -368,11 +636,11 @@ def _scrape_character_page(character_page_link: str) -> dict[str, Any]:
     return data
 
 
-@guarded_execute
-def _scrape_glossary(glossary_page_link: str) -> dict[str, str]:
-    soup = _get_page_soup(glossary_page_link)
+CHARACTER_PAGE = PageExtractor(_extract_character_page, CHARACTER_REGIONS)
 
-    glossary_paragraphs = soup.select("#content p")
+
+def _extract_glossary(index: PageIndex, _glossary_page_link: str) -> dict[str, str]:
+    glossary_paragraphs = index.get_element("content").find_all("p")
     glossary: dict[str, str] = dict()
 
     for glossary_paragraph in glossary_paragraphs:
@@ -386,74 +654,286 @@ def _scrape_glossary(glossary_page_link: str) -> dict[str, str]:
     return glossary
 
 
-@guarded_execute
-def _scrape_game_information(game_information_page_link: str) -> tuple[str, dict[str, str]]:
-    soup = _get_page_soup(game_information_page_link)
-    title = _get_h1_text(soup)
-    section_to_elements = _get_page_sections(
-        soup,
-        get_section_start=lambda soup: soup.select_one("#toc + h2"),
-        is_section_element=lambda element: element.name != "h2",
-        is_another_section=lambda element: element.name == "h2",
-    )
+GLOSSARY_PAGE = PageExtractor(_extract_glossary, CONTENT_REGIONS)
+
+
+def _scrape_glossary(glossary_page_link: str) -> Optional[dict[str, str]]:
+    glossary: Optional[dict[str, str]] = scrape_page(GLOSSARY_PAGE, glossary_page_link)
+    return glossary
+
+
+def _extract_game_information(
+    index: PageIndex, _game_information_page_link: str
+) -> tuple[str, dict[str, str]]:
+    title = _get_h1_text(index)
+    sections = index.get_sections(index.get_element("toc").find_next_sibling("h2"))
     section_to_text = {
-        _get_text(tip_section): _join_text(tip_section_elements)
-        for tip_section, tip_section_elements in section_to_elements.items()
+        _get_text(tip_section): join_text(tip_section_elements)
+        for tip_section, tip_section_elements in sections
     }
     return title, section_to_text
 
 
-def write_json(filepath: str, data: Any) -> None:
-    """Write data as JSON format to specified filepath"""
-    if data is None:
-        return
+GAME_INFORMATION_PAGE = PageExtractor(_extract_game_information, CONTENT_REGIONS)
 
-    with open(filepath, "w", encoding="utf-8") as file_writer:
-        json.dump(data, file_writer, indent=4, sort_keys=True)
 
-
-def write_editions(edition_folder: str) -> None:
+def write_editions(edition_folder: str, concurrency: int = 1, processes: int = 0) -> None:
     """Write scraped information about editions into the content folder."""
-    edition_links = _get_edition_links()
+    edition_links = _get_pending_links(
+        _discover_links("edition", lambda frontier: frontier.add_all(_get_edition_links()))
+    )
 
-    for edition_link in tqdm(edition_links):
-        data = _scrape_edition_page(edition_link)
+    for edition_link, data in zip(
+        edition_links,
+        tqdm(
+            _extract_pages(EDITION_PAGE, edition_links, concurrency, processes),
+            total=len(edition_links),
+        ),
+    ):
         if data is None:
             continue
         filepath = os.path.join(edition_folder, f'{data["name"]}.json')
-        write_json(filepath, data)
+        write_json(filepath, data, partial(_record_output, edition_link, filepath))
 
 
-def write_characters(characters_folder: str) -> None:
+def write_characters(characters_folder: str, concurrency: int = 1, processes: int = 0) -> None:
     """Write scraped information about characters into the content folder."""
-    character_links = chain.from_iterable(
-        _get_character_links(character_type_link)
-        for character_type_link in _get_character_type_links()
+    character_links = _get_pending_links(
+        _discover_links("character", partial(_discover_character_links, concurrency=concurrency))
     )
 
-    for character_link in tqdm(character_links):
-        data = _scrape_character_page(character_link)
+    for character_link, data in zip(
+        character_links,
+        tqdm(
+            _extract_pages(CHARACTER_PAGE, character_links, concurrency, processes),
+            total=len(character_links),
+        ),
+    ):
         if data is None:
             continue
         filepath = os.path.join(characters_folder, f'{data["id"]}.json')
-        write_json(filepath, data)
+        write_json(filepath, data, partial(_record_output, character_link, filepath))
 
 
-def write_game_information(game_information_folder: str) -> None:
+def write_game_information(
+    game_information_folder: str, concurrency: int = 1, processes: int = 0
+) -> None:
     """Write scraped information about game information into the content folder."""
-    game_information_page_link_iterator = _get_game_information_page_links()
-    glossary_page_link = next(game_information_page_link_iterator)
-
-    glossary_data = _scrape_glossary(glossary_page_link)
-    glossary_filepath = os.path.join(game_information_folder, "glossary.json")
-    write_json(glossary_filepath, glossary_data)
+    glossary_page_link, *game_information_page_links = _discover_links(
+        "game information",
+        lambda frontier: frontier.add_all(_get_game_information_page_links()),
+    )
 
-    for game_information_page_link in game_information_page_link_iterator:
-        if (scraped := _scrape_game_information(game_information_page_link)) is None:
+    if _get_pending_links([glossary_page_link]):
+        glossary_data = _skip_unchanged(_scrape_glossary)(glossary_page_link)
+        if glossary_data is not None:
+            glossary_filepath = os.path.join(game_information_folder, "glossary.json")
+            write_json(
+                glossary_filepath,
+                glossary_data,
+                partial(_record_output, glossary_page_link, glossary_filepath),
+            )
+
+    game_information_page_links = _get_pending_links(game_information_page_links)
+
+    for game_information_page_link, scraped in zip(
+        game_information_page_links,
+        _extract_pages(GAME_INFORMATION_PAGE, game_information_page_links, concurrency, processes),
+    ):
+        if scraped is None:
             continue
         title, section_to_text = scraped
         filepath = os.path.join(game_information_folder, f"{title}.json")
-        write_json(filepath, section_to_text)
+        write_json(
+            filepath,
+            section_to_text,
+            partial(_record_output, game_information_page_link, filepath),
+        )
+
+
+def _print_run_summary(processes: int = 0) -> None:
+    console.print(
+        f"Discovery pages: {len(_url_to_discovery_page_index)} parsed, "
+        f"{_discovery_page_counts['reused']} reuses"
+    )
+    if _http_cache is not None and not _http_cache.offline:
+        console.print(f"{_http_cache.num_unchanged} pages unchanged since last run")
+    if _scrape_journal is not None:
+        console.print(f"{_scrape_journal.num_completed} pages completed in the journal")
+    for kind, crawl_frontier in _kind_to_crawl_frontier.items():
+        console.print(
+            f"Frontier: {crawl_frontier.num_discovered} {kind} links, "
+            f"{crawl_frontier.num_duplicates} duplicate fetches saved"
+        )
+    if _memory_budget is not None:
+        console.print(
+            f"Memory budget: {_memory_budget.peak_reserved_bytes / 2**20:,.1f} of "
+            f"{_memory_budget.budget_bytes / 2**20:,.1f} MiB reserved at peak, "
+            f"{_memory_budget.num_waits} pages waited"
+        )
+    if (peak_rss_bytes := get_peak_rss_bytes()) is not None:
+        peak_rss = f"Peak RSS: {peak_rss_bytes / 2**20:,.1f} MiB"
+        if processes > 0 and (peak_child_rss_bytes := get_peak_rss_bytes(children=True)):
+            peak_rss += f", {peak_child_rss_bytes / 2**20:,.1f} MiB in parse processes"
+        console.print(peak_rss)
+    if fetch_counters := _fetch_scheduler.counters:
+        console.print(
+            "Fetches: "
+            + ", ".join(
+                f"{counter} {round(value, 1):g}"
+                for counter, value in sorted(fetch_counters.items())
+            )
+        )
+
+
+def _write_content(args: argparse.Namespace) -> None:
+    if args.all or args.edition:
+        write_editions(
+            edition_folder=get_edition_dir(),
+            concurrency=args.concurrency,
+            processes=args.processes,
+        )
+    if args.all or args.character:
+        write_characters(
+            characters_folder=get_raw_characters_dir(),
+            concurrency=args.concurrency,
+            processes=args.processes,
+        )
+    if args.all or args.general:
+        write_game_information(
+            game_information_folder=get_game_information_dir(),
+            concurrency=args.concurrency,
+            processes=args.processes,
+        )
+
+
+@contextmanager
+def scraping(args: argparse.Namespace, processes: int = 0) -> Iterator[None]:
+    """Fetch and parse pages as the arguments of `add_fetch_arguments` tell, summarizing the run"""
+    use_parser(args.parser)
+    fetch_scheduler = FetchScheduler(
+        rate=args.rate,
+        max_concurrency=args.concurrency,
+        timeout=args.timeout,
+        retries=args.retries,
+    )
+    use_fetch_scheduler(fetch_scheduler)
+    if args.replay is None and not args.no_cache:
+        http_cache = HttpCache(get_http_cache_dir(), args.from_cache, fetch_scheduler)
+        use_http_cache(http_cache)
+
+    page_archive = None
+    if args.record is not None:
+        page_archive = PageArchive(args.record, record=True)
+    elif args.replay is not None:
+        page_archive = PageArchive(args.replay)
+    use_page_archive(page_archive)
+    use_memory_budget(
+        None if args.memory_budget is None else MemoryBudget(int(args.memory_budget * 2**20))
+    )
+
+    try:
+        yield
+    finally:
+        if page_archive is not None:
+            page_archive.close()
+
+    _print_run_summary(processes)
+
+
+def _scrape(args: argparse.Namespace) -> None:
+    with scraping(args, args.processes):
+        _write_journaled_content(args)
+
+
+def _write_journaled_content(args: argparse.Namespace) -> None:
+    scrape_journal = ScrapeJournal(_get_scrape_journal_filepath(), resume=args.resume)
+    use_scrape_journal(scrape_journal)
+
+    try:
+        with batched_writes(compact=args.compact) as output_writer:
+            _write_content(args)
+    finally:
+        scrape_journal.close()
+
+    console.print(output_writer.stats)
+
+
+def add_fetch_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add arguments of how pages are fetched and parsed"""
+    parser.add_argument(
+        "-n", "--concurrency", type=int, default=1, help="Number of pages to fetch concurrently"
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=DEFAULT_RATE,
+        help="Maximum requests per second to each host on average, 0 for no limit",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help="Seconds to wait for the wiki to connect or send data before retrying",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=DEFAULT_RETRIES,
+        help="Number of retries of a failed or rate limited request",
+    )
+    parser.add_argument(
+        "--parser",
+        choices=PARSERS,
+        default="html.parser",
+        help="BeautifulSoup parser backend used to parse pages",
+    )
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always download pages instead of revalidating the local HTTP cache",
+    )
+    cache_group.add_argument(
+        "--from-cache",
+        action="store_true",
+        help="Serve pages from the local HTTP cache only without network access",
+    )
+    archive_group = parser.add_mutually_exclusive_group()
+    archive_group.add_argument(
+        "--record", metavar="ARCHIVE", help="Store every fetched page into the compressed archive"
+    )
+    archive_group.add_argument(
+        "--replay",
+        metavar="ARCHIVE",
+        help="Serve pages from the archive recorded earlier without network access",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        metavar="MIB",
+        type=float,
+        default=None,
+        help="Stream extraction, decomposing every parsed page at once and waiting to parse more "
+        "pages while their estimated trees would exceed the budget",
+    )
+
+
+def add_run_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add arguments of how the run is profiled and logged"""
+    parser.add_argument(
+        "--profile",
+        metavar="METRICS_JSON",
+        help="Record per-page fetch, parse, extract and write metrics into the JSON file",
+    )
+    parser.add_argument(
+        "--cprofile", metavar="PROFILE", help="Dump cProfile statistics of the run into the file"
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=LOG_LEVELS,
+        default=DEFAULT_LOG_LEVEL,
+        help="Lowest level of log records shown",
+    )
 
 
 def main() -> None:
@@ -479,15 +959,29 @@ def main() -> None:
         help="Whether to scrape information about game information in general",
     )
     parser.add_argument("-a", "--all", action="store_true", help="Scrape everything")
+    parser.add_argument(
+        "-p",
+        "--processes",
+        type=int,
+        default=0,
+        help="Number of processes to parse fetched pages in, 0 parses pages in fetching threads",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip discovery and pages completed by the previous run according to its journal",
+    )
+    parser.add_argument(
+        "--compact", action="store_true", help="Write JSON without indentation or spaces"
+    )
+    add_fetch_arguments(parser)
+    add_run_arguments(parser)
 
     args = parser.parse_args()
+    configure_logging(args.log_level)
 
-    if args.all or args.edition:
-        write_editions(edition_folder=_get_edition_dir())
-    if args.all or args.character:
-        write_characters(characters_folder=get_raw_characters_dir())
-    if args.all or args.general:
-        write_game_information(game_information_folder=_get_game_information_dir())
+    with profile(console, args.profile, args.cprofile):
+        _scrape(args)
 
 
 if __name__ == "__main__":
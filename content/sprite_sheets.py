@@ -0,0 +1,279 @@
+import argparse
+import logging
+import math
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterable, NamedTuple, Optional
+
+from .character_definitions import CharacterDefinition
+from .common import (
+    configure_logging,
+    create_dir,
+    get_cache_dir,
+    get_console,
+    get_json_files,
+    get_output_characters_dir,
+    get_root_dir,
+    hash_file,
+    read_json,
+    write_json,
+)
+
+ICON_SIZE = 128
+SPRITE_FORMATS = ("png", "webp")
+SPRITE_EXTENSIONS = tuple(f".{sprite_format}" for sprite_format in SPRITE_FORMATS)
+WEBP_QUALITY = 90
+SPRITE_MANIFEST_FILENAME = "manifest.json"
+
+SpriteManifest = dict[str, dict[str, Any]]
+
+
+class SpriteSheet(NamedTuple):
+    """Icons of characters packed row by row into a square-ish grid of `icon_size` pixel cells"""
+
+    name: str
+    character_ids: list[str]
+    icon_files: list[str]
+    icon_size: int
+
+    @property
+    def columns(self) -> int:
+        """Number of icons in each row"""
+        return max(math.ceil(math.sqrt(len(self.character_ids))), 1)
+
+    @property
+    def rows(self) -> int:
+        """Number of rows of icons"""
+        return max(math.ceil(len(self.character_ids) / self.columns), 1)
+
+    def get_offset(self, index: int) -> tuple[int, int]:
+        """Get pixel offset of the icon at the index in the sheet"""
+        row, column = divmod(index, self.columns)
+        return column * self.icon_size, row * self.icon_size
+
+    def get_filepaths(self, sprites_dirpath: str) -> list[str]:
+        """Get paths of the sheet in every sprite format"""
+        return [
+            os.path.join(sprites_dirpath, f"{self.name}.{sprite_format}")
+            for sprite_format in SPRITE_FORMATS
+        ]
+
+
+def _get_sprites_dirpath() -> str:
+    return os.path.join(get_root_dir(), "assets", "sprites")
+
+
+@create_dir
+def get_sprites_dir() -> str:
+    """Get directory path of icon sprite sheets"""
+    return _get_sprites_dirpath()
+
+
+def _get_sprite_state_filepath() -> str:
+    return os.path.join(get_cache_dir(), "sprite-manifest.json")
+
+
+def _get_sheet_name(edition: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", edition.lower()).strip("-") or "other"
+
+
+def _group_sprite_sheets(
+    characters: Iterable[CharacterDefinition], icon_size: int
+) -> list[SpriteSheet]:
+    """Group characters having an icon into a sheet per edition, ordered by id"""
+    root_dirpath = get_root_dir()
+    sheet_name_to_icons: dict[str, list[tuple[str, str]]] = {}
+    for character in sorted(characters, key=lambda character: character["id"]):
+        if "image" not in character:
+            continue
+        icon_file = os.path.join(root_dirpath, character["image"])
+        if not os.path.isfile(icon_file):
+            logging.warning("Icon of %s is missing: %s", character["id"], icon_file)
+            continue
+        sheet_name = _get_sheet_name(character.get("edition", ""))
+        sheet_name_to_icons.setdefault(sheet_name, []).append((character["id"], icon_file))
+
+    return [
+        SpriteSheet(
+            sheet_name,
+            [character_id for character_id, _ in icons],
+            [icon_file for _, icon_file in icons],
+            icon_size,
+        )
+        for sheet_name, icons in sorted(sheet_name_to_icons.items())
+    ]
+
+
+def _get_sheet_state(sheet: SpriteSheet) -> dict[str, Any]:
+    """What a sheet is drawn from, which changes whenever the sheet has to be redrawn"""
+    return {
+        "iconSize": sheet.icon_size,
+        "icons": {
+            character_id: hash_file(icon_file)
+            for character_id, icon_file in zip(sheet.character_ids, sheet.icon_files)
+        },
+    }
+
+
+def draw_sprite_sheet(sheet: SpriteSheet, sprites_dirpath: str) -> None:
+    """Resize icons into their cells and write the sheet in every sprite format"""
+    from PIL import Image  # pylint: disable=import-outside-toplevel
+
+    image = Image.new("RGBA", (sheet.columns * sheet.icon_size, sheet.rows * sheet.icon_size))
+    for index, icon_file in enumerate(sheet.icon_files):
+        with Image.open(icon_file) as icon:
+            cell = icon.convert("RGBA").resize(
+                (sheet.icon_size, sheet.icon_size), Image.Resampling.LANCZOS
+            )
+        image.paste(cell, sheet.get_offset(index))
+
+    png_filepath, webp_filepath = sheet.get_filepaths(sprites_dirpath)
+    image.save(png_filepath, optimize=True)
+    image.save(webp_filepath, quality=WEBP_QUALITY)
+
+
+def _draw_sprite_sheets(
+    sheets: list[SpriteSheet], sprites_dirpath: str, processes: Optional[int]
+) -> None:
+    if not sheets:
+        return
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for future in [
+            executor.submit(draw_sprite_sheet, sheet, sprites_dirpath) for sheet in sheets
+        ]:
+            future.result()
+
+
+def _remove_stale_sheets(sprites_dirpath: str, sheets: Iterable[SpriteSheet]) -> None:
+    filepaths = {filepath for sheet in sheets for filepath in sheet.get_filepaths(sprites_dirpath)}
+    for filename in os.listdir(sprites_dirpath):
+        filepath = os.path.join(sprites_dirpath, filename)
+        if filename.endswith(SPRITE_EXTENSIONS) and filepath not in filepaths:
+            os.remove(filepath)
+
+
+def _get_sprite_manifest(sheets: Iterable[SpriteSheet], sprites_dirpath: str) -> SpriteManifest:
+    """Map each character id to its sheet in every format and its offset within"""
+    root_dirpath = get_root_dir()
+    sprite_manifest: SpriteManifest = {}
+    for sheet in sheets:
+        sheet_filepaths = {
+            sprite_format: os.path.relpath(filepath, root_dirpath).replace(os.sep, "/")
+            for sprite_format, filepath in zip(
+                SPRITE_FORMATS, sheet.get_filepaths(sprites_dirpath)
+            )
+        }
+        for index, character_id in enumerate(sheet.character_ids):
+            x, y = sheet.get_offset(index)
+            sprite_manifest[character_id] = {
+                **sheet_filepaths,
+                "x": x,
+                "y": y,
+                "width": sheet.icon_size,
+                "height": sheet.icon_size,
+            }
+    return sprite_manifest
+
+
+def load_sprite_manifest() -> SpriteManifest:
+    """Load the sprite manifest of the last build, empty when sprite sheets were never built"""
+    sprite_manifest_filepath = os.path.join(_get_sprites_dirpath(), SPRITE_MANIFEST_FILENAME)
+    if not os.path.exists(sprite_manifest_filepath):
+        return {}
+    sprite_manifest: SpriteManifest = read_json(sprite_manifest_filepath)
+    return sprite_manifest
+
+
+def record_sprite(character: CharacterDefinition, sprite_manifest: SpriteManifest) -> bool:
+    """Record the sprite of the character into its definition, returning whether it changed"""
+    sprite = sprite_manifest.get(character["id"])
+    if character.get("sprite") == sprite:
+        return False
+    if sprite is None:
+        del character["sprite"]
+    else:
+        character["sprite"] = sprite
+    return True
+
+
+def _annotate_characters(
+    file_to_character: dict[str, CharacterDefinition], sprite_manifest: SpriteManifest
+) -> int:
+    """Record sprites into character definitions, rewriting those whose sprite changed"""
+    num_annotated = 0
+    for character_file, character in file_to_character.items():
+        if record_sprite(character, sprite_manifest):
+            write_json(character_file, character)
+            num_annotated += 1
+    return num_annotated
+
+
+def build_sprite_sheets(
+    icon_size: int = ICON_SIZE, processes: Optional[int] = None
+) -> list[CharacterDefinition]:
+    """Pack icons of enriched characters into a sprite sheet per edition
+
+    Only sheets whose icons changed since the last build, or whose files are missing, are
+    redrawn, in up to `processes` processes. Every character definition is returned with its
+    sprite recorded.
+    """
+    start = time.perf_counter()
+    file_to_character = {
+        character_file: read_json(character_file)
+        for character_file in get_json_files(get_output_characters_dir())
+    }
+    sheets = _group_sprite_sheets(file_to_character.values(), icon_size)
+    sprites_dirpath = get_sprites_dir()
+
+    sprite_state_filepath = _get_sprite_state_filepath()
+    sprite_state = (
+        read_json(sprite_state_filepath) if os.path.exists(sprite_state_filepath) else {}
+    )
+    sheet_states = {sheet.name: _get_sheet_state(sheet) for sheet in sheets}
+    changed_sheets = [
+        sheet
+        for sheet in sheets
+        if sprite_state.get(sheet.name) != sheet_states[sheet.name]
+        or not all(map(os.path.exists, sheet.get_filepaths(sprites_dirpath)))
+    ]
+
+    _draw_sprite_sheets(changed_sheets, sprites_dirpath, processes)
+    _remove_stale_sheets(sprites_dirpath, sheets)
+    sprite_manifest = _get_sprite_manifest(sheets, sprites_dirpath)
+    write_json(os.path.join(sprites_dirpath, SPRITE_MANIFEST_FILENAME), sprite_manifest)
+    write_json(sprite_state_filepath, sheet_states)
+    num_annotated = _annotate_characters(file_to_character, sprite_manifest)
+
+    get_console().print(
+        f"Redrew {len(changed_sheets)} of {len(sheets)} sprite sheets and recorded sprites of "
+        f"{num_annotated} characters in {time.perf_counter() - start:.2f}s"
+    )
+    return list(file_to_character.values())
+
+
+def main() -> None:
+    """Parse the command line arguments and build sprite sheets accordingly"""
+    parser = argparse.ArgumentParser(
+        description="Pack character icons into a sprite sheet per edition"
+    )
+    parser.add_argument(
+        "--icon-size", type=int, default=ICON_SIZE, help="Pixel size icons are resized to"
+    )
+    parser.add_argument(
+        "-p",
+        "--processes",
+        type=int,
+        default=None,
+        help="Number of processes to draw sheets in, all processors by default",
+    )
+
+    args = parser.parse_args()
+    configure_logging()
+
+    build_sprite_sheets(icon_size=args.icon_size, processes=args.processes)
+
+
+if __name__ == "__main__":
+    main()
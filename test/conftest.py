@@ -0,0 +1,244 @@
+import argparse
+import os
+import threading
+import time
+from contextlib import suppress
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator, NamedTuple, Optional
+
+import pytest
+from bs4 import BeautifulSoup
+
+from content import bundle_content, common, scrape_wiki, sprite_sheets
+
+WIKI_FIXTURES_DIRPATH = os.path.join(os.path.dirname(__file__), "fixtures", "wiki")
+LAST_MODIFIED = "Wed, 21 Oct 2015 07:28:00 GMT"
+
+
+class Fault(NamedTuple):
+    """How the fake wiki answers a request instead of serving the page"""
+
+    status: Optional[int] = None
+    headers: Optional[dict[str, str]] = None
+    # seconds to wait before answering, to make clients time out
+    delay: float = 0.0
+
+
+class FakeWiki:
+    """Pages served by a local HTTP server, after the faults scripted for each path
+
+    Pages with an `ETag` or `Last-Modified` answer matching conditional requests with 304.
+    """
+
+    def __init__(self, server: ThreadingHTTPServer) -> None:
+        self.server = server
+        self.path_to_page: dict[str, tuple[str, dict[str, str]]] = {}
+        self.path_to_faults: dict[str, list[Fault]] = {}
+        # path and headers of every request received
+        self.requests: list[tuple[str, dict[str, str]]] = []
+        self.lock = threading.Lock()
+
+    def url(self, path: str) -> str:
+        """Get the URL of the path on the server"""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{path}"
+
+    def add_page(self, path: str, text: str, **headers: str) -> None:
+        """Serve the text at the path with headers like `ETag`"""
+        self.path_to_page[path] = (text, headers)
+
+    def add_faults(self, path: str, *faults: Fault) -> None:
+        """Answer the next requests of the path with the faults, one per request"""
+        self.path_to_faults.setdefault(path, []).extend(faults)
+
+    def get_requests(self, path: str) -> list[dict[str, str]]:
+        """Get headers of requests received for the path"""
+        with self.lock:
+            return [headers for request_path, headers in self.requests if request_path == path]
+
+
+def _create_handler(wiki: FakeWiki) -> type[BaseHTTPRequestHandler]:
+    class FakeWikiHandler(BaseHTTPRequestHandler):
+        """Answer GETs of the fake wiki"""
+
+        def log_message(
+            self, format: str, *args: object
+        ) -> None:  # pylint: disable=redefined-builtin
+            pass
+
+        def _send(self, status: int, headers: dict[str, str], body: bytes = b"") -> None:
+            # clients that timed out have closed the connection already
+            with suppress(BrokenPipeError, ConnectionResetError):
+                self.send_response(status)
+                for header, value in headers.items():
+                    self.send_header(header, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        def do_GET(self) -> None:  # pylint: disable=invalid-name
+            """Answer with the next fault of the path, or with its page"""
+            with wiki.lock:
+                wiki.requests.append((self.path, dict(self.headers)))
+                faults = wiki.path_to_faults.get(self.path)
+                fault = faults.pop(0) if faults else None
+
+            if fault is not None:
+                time.sleep(fault.delay)
+                if fault.status is not None:
+                    self._send(fault.status, fault.headers or {})
+                    return
+
+            if self.path not in wiki.path_to_page:
+                self._send(404, {})
+                return
+            text, headers = wiki.path_to_page[self.path]
+            if ("ETag" in headers and self.headers.get("If-None-Match") == headers["ETag"]) or (
+                "Last-Modified" in headers
+                and self.headers.get("If-Modified-Since") == headers["Last-Modified"]
+            ):
+                self._send(304, headers)
+                return
+            self._send(200, {"Content-Type": "text/html; charset=utf-8", **headers}, text.encode())
+
+    return FakeWikiHandler
+
+
+@pytest.fixture
+def fake_wiki() -> Iterator[FakeWiki]:
+    """A fake wiki served on an ephemeral port for the test"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BaseHTTPRequestHandler)
+    wiki = FakeWiki(server)
+    server.RequestHandlerClass = _create_handler(wiki)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield wiki
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def read_wiki_fixture(page: str) -> str:
+    """Read the saved wiki page, like Main_Page or Category_Demons"""
+    with open(os.path.join(WIKI_FIXTURES_DIRPATH, f"{page}.html"), encoding="utf-8") as file:
+        return file.read()
+
+
+def get_wiki_fixture_path(page: str) -> str:
+    """Get the path the saved wiki page is served at, like /Category:Demons"""
+    return "/" + page.replace("Category_", "Category:", 1)
+
+
+@pytest.fixture(name="wiki")
+def fixture_wiki(fake_wiki: FakeWiki) -> FakeWiki:  # pylint: disable=redefined-outer-name
+    """The fake wiki serving every saved wiki page with validators"""
+    for filename in os.listdir(WIKI_FIXTURES_DIRPATH):
+        page, _ = os.path.splitext(filename)
+        fake_wiki.add_page(
+            get_wiki_fixture_path(page),
+            read_wiki_fixture(page),
+            ETag=f'"{page}-v1"',
+            **{"Last-Modified": LAST_MODIFIED},
+        )
+    return fake_wiki
+
+
+class Scraper:
+    """Scrape the fake wiki like the command line, counting parsed pages"""
+
+    def __init__(self, wiki: FakeWiki, tmp_path: Any, monkeypatch: pytest.MonkeyPatch) -> None:
+        self.edition_dirpath = os.path.join(tmp_path, "editions")
+        self.characters_dirpath = os.path.join(tmp_path, "characters")
+        self.output_dirpath = os.path.join(tmp_path, "game-information")
+        self.http_cache_dirpath = os.path.join(tmp_path, "http")
+        for dirpath in (
+            self.edition_dirpath,
+            self.characters_dirpath,
+            self.output_dirpath,
+            self.http_cache_dirpath,
+        ):
+            os.makedirs(dirpath)
+        self.num_parsed = 0
+
+        def parse_page(
+            page_text: str,
+            _regions: Optional[tuple[str, ...]] = None,
+            parser: Optional[str] = None,
+        ) -> BeautifulSoup:
+            self.num_parsed += 1
+            return BeautifulSoup(page_text, features=parser or "html.parser")
+
+        monkeypatch.setattr(scrape_wiki, "MAIN_PAGE_URL", wiki.url("/Main_Page"))
+        monkeypatch.setattr(scrape_wiki, "parse_page", parse_page)
+        monkeypatch.setattr(scrape_wiki, "get_edition_dir", lambda: self.edition_dirpath)
+        monkeypatch.setattr(scrape_wiki, "get_raw_characters_dir", lambda: self.characters_dirpath)
+        monkeypatch.setattr(scrape_wiki, "get_game_information_dir", lambda: self.output_dirpath)
+        monkeypatch.setattr(scrape_wiki, "get_http_cache_dir", lambda: self.http_cache_dirpath)
+        monkeypatch.setattr(
+            scrape_wiki,
+            "_get_scrape_journal_filepath",
+            lambda: os.path.join(tmp_path, "scrape-journal.jsonl"),
+        )
+        # restore the globals set by scraping
+        for name in ("_http_cache", "_fetch_scheduler", "_page_archive", "_memory_budget"):
+            monkeypatch.setattr(scrape_wiki, name, getattr(scrape_wiki, name))
+        monkeypatch.setattr(scrape_wiki, "_scrape_journal", None)
+        monkeypatch.setattr(scrape_wiki, "_kind_to_crawl_frontier", {})
+
+    def scrape(self, **options: Any) -> None:
+        """Scrape with the command line options, game information only by default"""
+        self.num_parsed = 0
+        args = {
+            "parser": "html.parser",
+            "rate": 0.0,
+            "concurrency": 1,
+            "processes": 0,
+            "timeout": 5.0,
+            "retries": 0,
+            "no_cache": False,
+            "from_cache": False,
+            "record": None,
+            "replay": None,
+            "memory_budget": None,
+            "resume": False,
+            "compact": False,
+            "all": False,
+            "edition": False,
+            "character": False,
+            "general": True,
+        }
+        args.update(options)
+        scrape_wiki._scrape(argparse.Namespace(**args))  # pylint: disable=protected-access
+
+    def get_modified_times(self) -> dict[str, int]:
+        """Modification time of every game information file"""
+        return {
+            filename: os.stat(os.path.join(self.output_dirpath, filename)).st_mtime_ns
+            for filename in os.listdir(self.output_dirpath)
+        }
+
+    def read_outputs(self) -> dict[str, bytes]:
+        """Content of every file written, by its path relative to the temporary directory"""
+        outputs = {}
+        for dirpath in (self.edition_dirpath, self.characters_dirpath, self.output_dirpath):
+            for filename in os.listdir(dirpath):
+                with open(os.path.join(dirpath, filename), "rb") as file:
+                    outputs[os.path.join(os.path.basename(dirpath), filename)] = file.read()
+        return outputs
+
+
+@pytest.fixture(name="scraper")
+def fixture_scraper(wiki: FakeWiki, tmp_path: Any, monkeypatch: pytest.MonkeyPatch) -> Scraper:
+    """Scrape the fake wiki serving every saved wiki page into the temporary directory"""
+    return Scraper(wiki, tmp_path, monkeypatch)
+
+
+@pytest.fixture(name="root_dir")
+def fixture_root_dir(tmp_path: Any, monkeypatch: pytest.MonkeyPatch) -> str:
+    """A temporary root directory content is read from and written into"""
+    root_dirpath = str(tmp_path)
+    for module in (common, sprite_sheets, bundle_content):
+        monkeypatch.setattr(module, "get_root_dir", lambda: root_dirpath)
+    return root_dirpath
@@ -0,0 +1,22 @@
+import gzip
+import json
+import os
+from typing import Any
+
+from content.bundle_content import write_bundle
+
+BUNDLE = {"characters": [{"id": "imp", "name": "Imp"}], "editions": {}}
+
+
+def test_write_bundle_skips_unchanged_files(tmp_path: Any) -> None:
+    bundle_filepath = os.path.join(tmp_path, "content.min.json")
+    bundle_filepaths = write_bundle(BUNDLE, bundle_filepath, use_gzip=True)
+
+    assert bundle_filepaths == [bundle_filepath, f"{bundle_filepath}.gz"]
+    with gzip.open(bundle_filepaths[1], "rt", encoding="utf-8") as file:
+        assert json.load(file) == BUNDLE
+
+    modified_times = [os.stat(filepath).st_mtime_ns for filepath in bundle_filepaths]
+    write_bundle(BUNDLE, bundle_filepath, use_gzip=True)
+    assert [os.stat(filepath).st_mtime_ns for filepath in bundle_filepaths] == modified_times
+    assert sorted(os.listdir(tmp_path)) == ["content.min.json", "content.min.json.gz"]
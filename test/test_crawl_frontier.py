@@ -0,0 +1,80 @@
+import pytest
+
+from content.crawl_frontier import CrawlFrontier, canonicalize_url
+
+PAGE_URL = "https://wiki.bloodontheclocktower.com/Fortune_Teller"
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        PAGE_URL,
+        "HTTPS://Wiki.BloodOnTheClocktower.com/Fortune_Teller",
+        "https://wiki.bloodontheclocktower.com:443/Fortune_Teller",
+        "https://wiki.bloodontheclocktower.com/Fortune_Teller#Tips_.26_Tricks",
+        "https://wiki.bloodontheclocktower.com/Fortune Teller",
+        "https://wiki.bloodontheclocktower.com/Fortune%20Teller",
+        "https://wiki.bloodontheclocktower.com/%46ortune_Teller",
+        "https://wiki.bloodontheclocktower.com/index.php?title=Fortune_Teller",
+        "https://wiki.bloodontheclocktower.com/index.php?title=Fortune_Teller&redirect=no",
+    ],
+)
+def test_canonicalize_url_spellings_of_a_page(url: str) -> None:
+    assert canonicalize_url(url) == PAGE_URL
+
+
+@pytest.mark.parametrize(
+    "url, canonical_url",
+    [
+        ("http://127.0.0.1:8765/Imp", "http://127.0.0.1:8765/Imp"),
+        (
+            "http://wiki.bloodontheclocktower.com:80/Imp",
+            "http://wiki.bloodontheclocktower.com/Imp",
+        ),
+        (
+            "https://wiki.bloodontheclocktower.com/Category:Demons",
+            "https://wiki.bloodontheclocktower.com/Category:Demons",
+        ),
+        (
+            "https://wiki.bloodontheclocktower.com/Al-Hadikhia",
+            "https://wiki.bloodontheclocktower.com/Al-Hadikhia",
+        ),
+        (
+            "https://wiki.bloodontheclocktower.com/Lil'_Monsta",
+            "https://wiki.bloodontheclocktower.com/Lil%27_Monsta",
+        ),
+        (
+            "https://wiki.bloodontheclocktower.com/index.php?title=Special:Search&search=imp",
+            "https://wiki.bloodontheclocktower.com/Special:Search",
+        ),
+        (
+            "https://wiki.bloodontheclocktower.com/index.php?action=raw",
+            "https://wiki.bloodontheclocktower.com/index.php?action=raw",
+        ),
+    ],
+)
+def test_canonicalize_url(url: str, canonical_url: str) -> None:
+    assert canonicalize_url(url) == canonical_url
+    assert canonicalize_url(canonical_url) == canonical_url
+
+
+def test_crawl_frontier_skips_duplicates() -> None:
+    frontier = CrawlFrontier()
+
+    assert frontier.add(PAGE_URL)
+    assert not frontier.add("https://wiki.bloodontheclocktower.com/Fortune Teller")
+    frontier.add_all([f"{PAGE_URL}#Examples", "https://wiki.bloodontheclocktower.com/Imp"])
+
+    assert len(frontier) == frontier.num_discovered == 2
+    assert frontier.num_duplicates == 2
+
+
+def test_crawl_frontier_pops_by_priority_then_insertion() -> None:
+    frontier = CrawlFrontier()
+    frontier.add_all(["http://wiki/C", "http://wiki/A"], priority=1)
+    frontier.add_all(["http://wiki/D", "http://wiki/B"])
+
+    assert frontier.pop() == "http://wiki/D"
+    assert frontier.pop_all() == ["http://wiki/B", "http://wiki/C", "http://wiki/A"]
+    with pytest.raises(IndexError):
+        frontier.pop()
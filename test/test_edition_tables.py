@@ -0,0 +1,119 @@
+import json
+import logging
+import os
+from typing import Any
+
+import pytest
+
+from content import enrich_characters
+from content.common import get_edition_dir, get_raw_characters_dir
+from content.edition_tables import (
+    build_edition_tables,
+    get_character_editions_filepath,
+    get_edition_tables_dir,
+    join_editions,
+)
+
+CHARACTERS = [
+    {"id": "imp", "name": "Imp"},
+    {"id": "fortuneteller", "name": "Fortune Teller"},
+    {"id": "poisoner", "name": "Poisoner"},
+    {"id": "zombuul", "name": "Zombuul"},
+]
+EDITIONS = {
+    "Trouble Brewing": {
+        "name": "Trouble Brewing",
+        "characters": {
+            "townsfolk": ["Fortune Teller"],
+            "minions": ["Poisoner", "Spy"],
+            "demons": ["Imp"],
+        },
+    },
+    "Bad Moon Rising": {
+        "name": "Bad Moon Rising",
+        "characters": {"demons": ["Zombuul", "Imp", "Pukka"]},
+    },
+}
+
+
+def _read_json(filepath: str) -> Any:
+    with open(filepath, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _write_json(filepath: str, data: Any) -> None:
+    with open(filepath, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+
+
+def test_join_keeps_the_order_editions_list_characters_in() -> None:
+    tables = join_editions(CHARACTERS, EDITIONS)
+
+    assert list(tables.edition_to_table) == ["Trouble Brewing", "Bad Moon Rising"]
+    trouble_brewing = tables.edition_to_table["Trouble Brewing"]
+    assert list(trouble_brewing["characters"]) == ["townsfolk", "minions", "demons"]
+    assert [
+        character["id"]
+        for character in tables.edition_to_table["Bad Moon Rising"]["characters"]["demons"]
+    ] == ["zombuul", "imp"]
+    assert trouble_brewing["characters"]["townsfolk"] == [CHARACTERS[1]]
+    assert trouble_brewing["name"] == "Trouble Brewing"
+    # in the order of editions
+    assert tables.character_id_to_editions["imp"] == ["Trouble Brewing", "Bad Moon Rising"]
+
+
+def test_dangling_names_are_skipped() -> None:
+    tables = join_editions(CHARACTERS, {**EDITIONS, "Empty": {"name": "Empty"}})
+
+    assert tables.edition_to_dangling_names == {
+        "Trouble Brewing": ["Spy"],
+        "Bad Moon Rising": ["Pukka"],
+    }
+    assert tables.edition_to_table["Trouble Brewing"]["characters"]["minions"] == [CHARACTERS[2]]
+    assert tables.edition_to_table["Empty"] == {"name": "Empty", "characters": {}}
+    assert "spy" not in tables.character_id_to_editions
+
+
+@pytest.fixture(name="editions")
+def fixture_editions(root_dir: str) -> dict[str, Any]:
+    """Editions and the raw characters they list under the root directory"""
+    for edition_name, edition in EDITIONS.items():
+        _write_json(os.path.join(get_edition_dir(), f"{edition_name}.json"), edition)
+    for character in CHARACTERS:
+        _write_json(os.path.join(get_raw_characters_dir(), f'{character["id"]}.json'), character)
+    return dict(EDITIONS)
+
+
+def test_build_writes_a_table_per_edition(
+    editions: dict[str, Any], caplog: pytest.LogCaptureFixture
+) -> None:
+    enrich_characters.enrich()
+    with caplog.at_level(logging.WARNING):
+        build_edition_tables()
+
+    assert sorted(os.listdir(get_edition_tables_dir())) == [
+        f"{edition_name}.json" for edition_name in sorted(editions)
+    ]
+    table = _read_json(os.path.join(get_edition_tables_dir(), "Bad Moon Rising.json"))
+    assert table["characters"] == {"demons": [CHARACTERS[3], CHARACTERS[0]]}
+    assert _read_json(get_character_editions_filepath())["imp"] == [
+        "Bad Moon Rising",
+        "Trouble Brewing",
+    ]
+    assert "Trouble Brewing lists characters without definitions: Spy" in caplog.text
+
+
+def test_enrich_rebuilds_tables_on_every_run(editions: dict[str, Any]) -> None:
+    enrich_characters.enrich()
+
+    # editions changed while no character did
+    trouble_brewing = editions.pop("Trouble Brewing")
+    trouble_brewing["characters"]["demons"] = []
+    _write_json(os.path.join(get_edition_dir(), "Trouble Brewing.json"), trouble_brewing)
+    os.remove(os.path.join(get_edition_dir(), "Bad Moon Rising.json"))
+    enrich_characters.enrich()
+
+    assert os.listdir(get_edition_tables_dir()) == ["Trouble Brewing.json"]
+    table = _read_json(os.path.join(get_edition_tables_dir(), "Trouble Brewing.json"))
+    assert table["characters"]["demons"] == []
+    assert "imp" not in _read_json(get_character_editions_filepath())
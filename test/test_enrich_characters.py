@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+from typing import Any, Callable
+
+import pytest
+
+from content import common, enrich_characters
+from content.common import (
+    get_enrich_characters_dir,
+    get_output_characters_dir,
+    get_raw_characters_dir,
+)
+from content.enrich_characters import CharacterDefinitionIndex
+
+
+def _write(filepath: str, text: str) -> str:
+    with open(filepath, "w", encoding="utf-8") as file:
+        file.write(text)
+    return filepath
+
+
+@pytest.fixture(name="files")
+def fixture_files(tmp_path: Any) -> list[str]:
+    return [
+        _write(os.path.join(tmp_path, "imp.json"), json.dumps({"id": "imp", "name": "Imp"})),
+        _write(
+            os.path.join(tmp_path, "enrich.json"),
+            json.dumps([{"id": "imp", "team": "demon"}, {"id": "spy", "name": "Spy"}]),
+        ),
+    ]
+
+
+def test_update_remerges_affected_characters(files: list[str]) -> None:
+    index = CharacterDefinitionIndex(files)
+    assert index.definitions == {
+        "imp": {"id": "imp", "name": "Imp", "team": "demon"},
+        "spy": {"id": "spy", "name": "Spy"},
+    }
+
+    _write(files[1], json.dumps([{"id": "imp", "team": "minion"}]))
+    assert index.update(files, [files[1]]) == {
+        "imp": {"id": "imp", "name": "Imp", "team": "minion"}
+    }
+    assert "spy" not in index.definitions
+
+    os.remove(files[0])
+    assert index.update(files[1:], []) == {"imp": {"id": "imp", "team": "minion"}}
+
+
+@pytest.mark.parametrize(
+    "text",
+    ['[{"id": "imp", "team": "minion"}', '[{"name": "x"}]', '["imp"]', '"imp"', '[{"id": 1}]'],
+)
+def test_malformed_file_keeps_previous_contributions(
+    files: list[str], text: str, caplog: pytest.LogCaptureFixture
+) -> None:
+    index = CharacterDefinitionIndex(files)
+    definitions = dict(index.definitions)
+
+    _write(files[1], text)
+    with caplog.at_level(logging.ERROR):
+        assert not index.update(files, [files[1]])
+    assert index.definitions == definitions
+    assert f"Cannot parse {files[1]}" in caplog.text
+
+    _write(files[1], json.dumps({"id": "imp", "team": "minion"}))
+    assert index.update(files, [files[1]])["imp"]["team"] == "minion"
+
+
+Enrich = Callable[[], set[str]]
+
+
+@pytest.fixture(name="enrich")
+def fixture_enrich(root_dir: str, monkeypatch: pytest.MonkeyPatch) -> Enrich:
+    """Enrich incrementally under the root directory, returning ids of the characters written"""
+    written_character_ids: set[str] = set()
+
+    def write_json(filepath: str, data: Any) -> None:
+        written_character_ids.add(data["id"])
+        common.write_json(filepath, data)
+
+    def enrich() -> set[str]:
+        written_character_ids.clear()
+        enrich_characters._enrich_incrementally(full=False)  # pylint: disable=protected-access
+        return set(written_character_ids)
+
+    monkeypatch.setattr(enrich_characters, "write_json", write_json)
+    return enrich
+
+
+@pytest.fixture(name="inputs")
+def fixture_inputs(enrich: Enrich) -> dict[str, str]:
+    """Raw characters and enrichment layers, enriched once"""
+    inputs = {
+        "imp": os.path.join(get_raw_characters_dir(), "imp.json"),
+        "spy": os.path.join(get_raw_characters_dir(), "spy.json"),
+        "enrich1": os.path.join(get_enrich_characters_dir(), "enrich1.json"),
+        "enrich2": os.path.join(get_enrich_characters_dir(), "enrich2.json"),
+    }
+    _write(inputs["imp"], json.dumps({"id": "imp", "name": "Imp"}))
+    _write(inputs["spy"], json.dumps({"id": "spy", "name": "Spy"}))
+    _write(
+        inputs["enrich1"],
+        json.dumps([{"id": "imp", "team": "demon"}, {"id": "spy", "team": "minion"}]),
+    )
+    _write(
+        inputs["enrich2"],
+        json.dumps([{"id": "imp", "ability": "Kill"}, {"id": "mime", "name": "Mime"}]),
+    )
+    assert enrich() == {"imp", "spy", "mime"}
+    return inputs
+
+
+def _read_output(character_id: str) -> Any:
+    with open(
+        os.path.join(get_output_characters_dir(), f"{character_id}.json"), encoding="utf-8"
+    ) as file:
+        return json.load(file)
+
+
+def test_unchanged_inputs_rebuild_nothing(enrich: Enrich, inputs: dict[str, str]) -> None:
+    # touched but with the same content
+    for filepath in inputs.values():
+        os.utime(filepath, ns=(0, 0))
+
+    assert not enrich()
+    assert _read_output("imp") == {"id": "imp", "name": "Imp", "team": "demon", "ability": "Kill"}
+
+
+def test_changed_raw_file_rebuilds_its_character(enrich: Enrich, inputs: dict[str, str]) -> None:
+    _write(inputs["spy"], json.dumps({"id": "spy", "name": "The Spy"}))
+
+    assert enrich() == {"spy"}
+    assert _read_output("spy") == {"id": "spy", "name": "The Spy", "team": "minion"}
+
+
+def test_changed_layer_rebuilds_only_changed_characters(
+    enrich: Enrich, inputs: dict[str, str]
+) -> None:
+    _write(
+        inputs["enrich1"],
+        json.dumps([{"id": "imp", "team": "demon"}, {"id": "spy", "team": "traveler"}]),
+    )
+
+    assert enrich() == {"spy"}
+    assert _read_output("spy")["team"] == "traveler"
+
+
+def test_removed_file_rebuilds_or_removes_its_characters(
+    enrich: Enrich, inputs: dict[str, str]
+) -> None:
+    os.remove(inputs["imp"])
+    os.remove(inputs["enrich2"])
+
+    assert enrich() == {"imp"}
+    assert _read_output("imp") == {"id": "imp", "team": "demon"}
+    # no input file contributes to it anymore
+    assert not os.path.exists(os.path.join(get_output_characters_dir(), "mime.json"))
+
+
+def test_missing_output_is_rebuilt(enrich: Enrich, inputs: dict[str, str]) -> None:
+    os.remove(os.path.join(get_output_characters_dir(), "mime.json"))
+
+    assert enrich() == {"mime"}
+    assert _read_output("mime") == {"id": "mime", "name": "Mime"}
+    assert inputs
+
+
+def test_reordered_layers_rebuild_their_characters(enrich: Enrich, inputs: dict[str, str]) -> None:
+    _write(
+        inputs["enrich2"],
+        json.dumps([{"id": "imp", "team": "traveler"}, {"id": "mime", "name": "Mime"}]),
+    )
+    assert enrich() == {"imp"}
+    assert _read_output("imp")["team"] == "traveler"
+
+    # a renamed layer rebuilds every character it contributes to, here applied before enrich1.json
+    os.rename(inputs["enrich2"], os.path.join(get_enrich_characters_dir(), "enrich0.json"))
+    assert enrich() == {"imp", "mime"}
+    assert _read_output("imp")["team"] == "demon"
+
+    os.rename(inputs["enrich1"], os.path.join(get_enrich_characters_dir(), "enrich5.json"))
+    assert enrich() == {"imp", "spy"}
+    assert _read_output("imp")["team"] == "demon"
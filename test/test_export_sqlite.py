@@ -0,0 +1,83 @@
+import os
+import sqlite3
+import sys
+from contextlib import closing
+from typing import Any, Iterator
+
+import pytest
+
+from content.export_sqlite import SCHEMA, main, search
+
+
+@pytest.fixture(name="connection")
+def fixture_connection() -> Iterator[sqlite3.Connection]:
+    connection = sqlite3.connect(":memory:")
+    connection.executescript(SCHEMA)
+    connection.execute(
+        "INSERT INTO characters_fts VALUES (?, ?, ?, ?, ?, ?)",
+        ("poisoner", "Poisoner", "Each night, choose a player: they are poisoned.", "", "", ""),
+    )
+    connection.execute(
+        "INSERT INTO glossary_fts VALUES (?, ?)", ("Drunk", "A drunk player has no ability.")
+    )
+    try:
+        yield connection
+    finally:
+        connection.close()
+
+
+def test_search(connection: sqlite3.Connection) -> None:
+    results = search(connection, "poisoned OR drunk")
+    assert {(kind, key) for kind, key, _, _ in results} == {
+        ("characters", "poisoner"),
+        ("glossary", "Drunk"),
+    }
+    assert search(connection, "drunk", kinds=["characters"]) == []
+
+
+@pytest.mark.parametrize("query", ['"poisoned', "-", "poisoned AND", "(", "name:", "kind:imp"])
+def test_search_rejects_invalid_query(connection: sqlite3.Connection, query: str) -> None:
+    with pytest.raises(ValueError, match="Invalid search query"):
+        search(connection, query)
+
+
+def test_search_raises_database_errors() -> None:
+    with closing(sqlite3.connect(":memory:")) as connection:
+        with pytest.raises(sqlite3.OperationalError, match="no such table"):
+            search(connection, "poisoned")
+
+
+def test_query_of_missing_database_asks_to_build(
+    tmp_path: Any, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    database_filepath = os.path.join(tmp_path, "content.sqlite3")
+    monkeypatch.setattr(
+        sys, "argv", ["export_sqlite.py", "-d", database_filepath, "character", "imp"]
+    )
+
+    with pytest.raises(SystemExit):
+        main()
+
+    assert "run build" in capsys.readouterr().err
+    assert not os.path.exists(database_filepath)
+
+
+def test_query_opens_database_read_only(
+    tmp_path: Any, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    database_filepath = os.path.join(tmp_path, "content #1.sqlite3")
+    with closing(sqlite3.connect(database_filepath)) as connection:
+        connection.executescript(SCHEMA)
+        connection.execute(
+            "INSERT INTO glossary_fts VALUES (?, ?)", ("Drunk", "A drunk player has no ability.")
+        )
+        connection.commit()
+    modified_time = os.stat(database_filepath).st_mtime_ns
+    monkeypatch.setattr(
+        sys, "argv", ["export_sqlite.py", "-d", database_filepath, "search", "drunk"]
+    )
+
+    main()
+
+    assert "Drunk" in capsys.readouterr().out
+    assert os.stat(database_filepath).st_mtime_ns == modified_time
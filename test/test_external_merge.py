@@ -0,0 +1,76 @@
+import io
+import json
+import math
+import os
+import random
+from typing import Any
+
+import pytest
+
+from content.external_merge import ExternalMerge, iter_json_array
+
+VALUES = [{"id": "imp", "night": 12.5e-1}, [1, -20, "]"], "a, b", 1234567890, None, True, -0.5]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1 << 16])
+def test_iter_json_array_across_chunks(chunk_size: int) -> None:
+    text = json.dumps(VALUES, indent=4)
+    assert list(iter_json_array(io.StringIO(text), chunk_size)) == VALUES
+
+
+@pytest.mark.parametrize("chunk_size", [1, 1 << 16])
+@pytest.mark.parametrize(
+    "text, values", [(" [ ] ", []), ("12345", [12345]), ('{"id": 1}', [{"id": 1}])]
+)
+def test_iter_json_array_of_no_or_lone_value(
+    text: str, values: list[Any], chunk_size: int
+) -> None:
+    assert list(iter_json_array(io.StringIO(text), chunk_size)) == values
+
+
+@pytest.mark.parametrize("text", ["[1, 2", "[1 2]", "[1,]", "[1] 2", ""])
+def test_iter_json_array_rejects_malformed_json(text: str) -> None:
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), chunk_size=2))
+
+
+def _write_files(tmp_path: Any, num_files: int, num_characters: int) -> list[list[dict[str, Any]]]:
+    random_generator = random.Random(0)
+    files_definitions = []
+    for file_position in range(num_files):
+        definitions = [
+            {"id": f"character{random_generator.randrange(num_characters)}", "file": file_position}
+            for _ in range(random_generator.randrange(1, 40))
+        ]
+        for position, definition in enumerate(definitions):
+            definition[f"field{position % 3}"] = position
+        with open(os.path.join(tmp_path, f"{file_position}.json"), "w", encoding="utf-8") as file:
+            json.dump(definitions, file)
+        files_definitions.append(definitions)
+    return files_definitions
+
+
+@pytest.mark.parametrize("run_size, fan_in", [(1000, 64), (7, 64), (3, 2)])
+def test_external_merge_is_the_same_as_in_memory(
+    tmp_path: Any, run_size: int, fan_in: int
+) -> None:
+    files_definitions = _write_files(tmp_path, num_files=6, num_characters=20)
+    id_to_definition: dict[str, dict[str, Any]] = {}
+    for definitions in files_definitions:
+        for definition in definitions:
+            id_to_definition.setdefault(definition["id"], {}).update(definition)
+
+    runs_dirpath = os.path.join(tmp_path, "runs")
+    os.mkdir(runs_dirpath)
+    external_merge = ExternalMerge(runs_dirpath, run_size, fan_in)
+    files = [os.path.join(tmp_path, f"{i}.json") for i in range(len(files_definitions))]
+    merged = list(external_merge.merge(files))
+
+    assert merged == [id_to_definition[character_id] for character_id in sorted(id_to_definition)]
+    assert external_merge.num_definitions == sum(map(len, files_definitions))
+    if run_size >= external_merge.num_definitions:
+        assert external_merge.num_runs == 0
+    else:
+        assert external_merge.num_runs >= math.ceil(external_merge.num_definitions / run_size)
+    # only the last runs are left to be removed with the directory
+    assert len(os.listdir(runs_dirpath)) <= fan_in
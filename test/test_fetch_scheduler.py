@@ -0,0 +1,124 @@
+import time
+from typing import Iterator
+
+import pytest
+import requests
+from conftest import FakeWiki, Fault
+
+from content import fetch_scheduler
+from content.fetch_scheduler import AimdLimiter, FetchScheduler, TokenBucket
+
+PAGE_PATH = "/Imp"
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    """Back off for milliseconds, so only a Retry-After makes a retry wait long"""
+    monkeypatch.setattr(fetch_scheduler, "BACKOFF_BASE", 0.001)
+    yield
+
+
+@pytest.fixture
+def wiki(fake_wiki: FakeWiki) -> FakeWiki:
+    """The fake wiki serving a page"""
+    fake_wiki.add_page(PAGE_PATH, "<h1>Imp</h1>")
+    return fake_wiki
+
+
+def test_retries_transient_failures(wiki: FakeWiki) -> None:
+    wiki.add_faults(PAGE_PATH, Fault(503), Fault(500), Fault(429))
+    scheduler = FetchScheduler(rate=0, retries=4)
+
+    response = scheduler.get(wiki.url(PAGE_PATH))
+
+    assert response.status_code == 200
+    assert response.text == "<h1>Imp</h1>"
+    assert len(wiki.get_requests(PAGE_PATH)) == 4
+    assert scheduler.counters["retries"] == 3
+    assert scheduler.counters["rate limited"] == 2
+
+
+def test_does_not_retry_client_errors(fake_wiki: FakeWiki) -> None:
+    scheduler = FetchScheduler(rate=0)
+
+    assert scheduler.get(fake_wiki.url("/Missing")).status_code == 404
+    assert len(fake_wiki.get_requests("/Missing")) == 1
+    assert "retries" not in scheduler.counters
+
+
+def test_respects_retry_after(wiki: FakeWiki) -> None:
+    wiki.add_faults(PAGE_PATH, Fault(429, {"Retry-After": "1"}))
+    scheduler = FetchScheduler(rate=0)
+
+    start = time.monotonic()
+    response = scheduler.get(wiki.url(PAGE_PATH))
+
+    assert response.status_code == 200
+    assert time.monotonic() - start >= 1.0
+
+
+def test_retries_timeouts(wiki: FakeWiki) -> None:
+    wiki.add_faults(PAGE_PATH, Fault(delay=1.0))
+    scheduler = FetchScheduler(rate=0, timeout=0.2)
+
+    assert scheduler.get(wiki.url(PAGE_PATH)).status_code == 200
+    assert scheduler.counters["timeouts"] == 1
+    assert scheduler.counters["retries"] == 1
+
+
+def test_returns_last_response_when_retries_run_out(wiki: FakeWiki) -> None:
+    wiki.add_faults(PAGE_PATH, *[Fault(503)] * 3, Fault(502))
+    scheduler = FetchScheduler(rate=0, retries=3)
+
+    response = scheduler.get(wiki.url(PAGE_PATH))
+
+    assert response.status_code == 502
+    assert len(wiki.get_requests(PAGE_PATH)) == 4
+    with pytest.raises(requests.HTTPError):
+        response.raise_for_status()
+
+
+def test_raises_timeout_when_retries_run_out(wiki: FakeWiki) -> None:
+    wiki.add_faults(PAGE_PATH, *[Fault(delay=0.5)] * 2)
+    scheduler = FetchScheduler(rate=0, timeout=0.1, retries=1)
+
+    with pytest.raises(requests.Timeout):
+        scheduler.get(wiki.url(PAGE_PATH))
+    assert scheduler.counters["timeouts"] == 2
+
+
+def test_halves_concurrency_when_throttled(wiki: FakeWiki) -> None:
+    wiki.add_faults(PAGE_PATH, Fault(429))
+    scheduler = FetchScheduler(rate=0, max_concurrency=8)
+
+    scheduler.get(wiki.url(PAGE_PATH))
+
+    (limit,) = scheduler.concurrency_limits.values()
+    # halved by the 429, then grown additively by the successful retry
+    assert limit == pytest.approx(4 + 1 / 4)
+    assert scheduler.counters["concurrency decreases"] == 1
+
+
+def test_aimd_limiter_decreases_once_per_window() -> None:
+    limiter = AimdLimiter(max_limit=8)
+    for _ in range(4):
+        limiter.acquire()
+
+    assert [limiter.release(congested=True) for _ in range(4)] == [True, False, False, False]
+    assert limiter.limit == 4
+
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release(congested=False)
+    assert 4 < limiter.limit < 5
+
+
+def test_token_bucket_paces_acquisitions() -> None:
+    bucket = TokenBucket(rate=20, capacity=2)
+
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    waits = [bucket.acquire() for _ in range(3)]
+
+    assert waits[0] == pytest.approx(0.05, abs=0.02)
+    assert sum(waits) == pytest.approx(0.15, abs=0.05)
@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+from content.glossary_linker import (
+    GlossaryAutomaton,
+    TermOccurrence,
+    find_terms_naively,
+    link_texts,
+)
+
+TERMS = ["Ability", "Alive", "Dead", "Dead Vote", "Drunk", "Poisoned", "Vote", "Mad", "Madness"]
+
+
+@pytest.mark.parametrize(
+    "text, occurrences",
+    [
+        ("You are drunk.", [TermOccurrence("Drunk", 8, 13)]),
+        # leftmost, then longest
+        ("Use your DEAD VOTE", [TermOccurrence("Dead Vote", 9, 18)]),
+        ("madness, not mad", [TermOccurrence("Madness", 0, 7), TermOccurrence("Mad", 13, 16)]),
+        # whole words only
+        ("Abilityless, undead, voter", []),
+        (
+            "dead_vote or dead-vote",
+            [TermOccurrence("Dead", 13, 17), TermOccurrence("Vote", 18, 22)],
+        ),
+        # offsets stay those of the original text when lowercasing changes lengths
+        ("İ Alive", [TermOccurrence("Alive", 2, 7)]),
+        ("", []),
+    ],
+)
+def test_find(text: str, occurrences: list[TermOccurrence]) -> None:
+    assert GlossaryAutomaton(TERMS).find(text) == occurrences
+
+
+def test_find_the_same_as_naively() -> None:
+    random_generator = random.Random(0)
+    words = [*TERMS, "dead vote", "the", "Storyteller", "un", ",", ".", "-"]
+    automaton = GlossaryAutomaton(TERMS)
+    for _ in range(200):
+        text = " ".join(random_generator.choices(words, k=random_generator.randrange(30)))
+        text = text.replace(" ,", ",").replace(" - ", "-")
+        assert automaton.find(text) == find_terms_naively(TERMS, text)
+
+
+def test_duplicate_terms_share_states() -> None:
+    automaton = GlossaryAutomaton(["Mad", "mad", "Madness"])
+    assert automaton.num_states == len("madness") + 1
+    assert automaton.find("MAD") == [TermOccurrence("Mad", 0, 3)]
+
+
+def test_link_prose_texts_by_json_pointer() -> None:
+    character = {
+        "id": "drunk",
+        "name": "Drunk",
+        "ability": "You think you are a Townsfolk, but you are drunk.",
+        "tips": {"Tips/Tricks": ["Stay alive.", "Nothing here."]},
+        "reminders": ["Drunk"],
+        "remindersGlobal": ["Drunk"],
+        "sprite": {"sheet": "sprites/Dead Vote.webp", "x": 0, "y": 0},
+    }
+
+    assert link_texts(GlossaryAutomaton(TERMS), character) == {
+        "/ability": [TermOccurrence("Drunk", 43, 48)],
+        "/tips/Tips~1Tricks/0": [TermOccurrence("Alive", 5, 10)],
+    }
@@ -0,0 +1,159 @@
+import os
+from typing import Any
+
+import pytest
+from conftest import LAST_MODIFIED, FakeWiki, Scraper, read_wiki_fixture
+
+from content import scrape_wiki
+from content.fetch_scheduler import FetchScheduler
+from content.http_cache import HttpCache
+from content.metrics import Metrics
+from content.scrape_journal import ScrapeJournal
+
+WIKI_PAGES = ("Main_Page", "Glossary", "General_Strategy")
+
+
+def _is_conditional(headers: dict[str, str]) -> bool:
+    return "If-None-Match" in headers or "If-Modified-Since" in headers
+
+
+def test_revalidates_conditionally(wiki: FakeWiki, tmp_path: Any) -> None:
+    url = wiki.url("/Glossary")
+    assert HttpCache(str(tmp_path), fetch_scheduler=FetchScheduler(rate=0)).get(url)
+
+    http_cache = HttpCache(str(tmp_path), fetch_scheduler=FetchScheduler(rate=0))
+    assert http_cache.get(url) == read_wiki_fixture("Glossary")
+    # revalidated at most once per run
+    http_cache.get(url)
+
+    first_headers, second_headers = wiki.get_requests("/Glossary")
+    assert not _is_conditional(first_headers)
+    assert second_headers["If-None-Match"] == '"Glossary-v1"'
+    assert second_headers["If-Modified-Since"] == LAST_MODIFIED
+    assert http_cache.is_unchanged(url)
+    assert http_cache.num_unchanged == 1
+
+
+def test_changed_page_is_refetched(wiki: FakeWiki, tmp_path: Any) -> None:
+    url = wiki.url("/Glossary")
+    HttpCache(str(tmp_path), fetch_scheduler=FetchScheduler(rate=0)).get(url)
+    wiki.add_page("/Glossary", "<p>Changed</p>", ETag='"Glossary-v2"')
+
+    http_cache = HttpCache(str(tmp_path), fetch_scheduler=FetchScheduler(rate=0))
+    assert http_cache.get(url) == "<p>Changed</p>"
+    assert not http_cache.is_unchanged(url)
+
+
+def test_offline_serves_cached_pages(wiki: FakeWiki, tmp_path: Any) -> None:
+    url = wiki.url("/Glossary")
+    HttpCache(str(tmp_path), fetch_scheduler=FetchScheduler(rate=0)).get(url)
+
+    http_cache = HttpCache(str(tmp_path), offline=True)
+    assert http_cache.get(url) == read_wiki_fixture("Glossary")
+    with pytest.raises(LookupError):
+        http_cache.get(wiki.url("/General_Strategy"))
+    assert len(wiki.get_requests("/Glossary")) == 1
+
+
+def test_unchanged_pages_are_neither_parsed_nor_rewritten(
+    wiki: FakeWiki, scraper: Scraper
+) -> None:
+    scraper.scrape()
+    modified_times = scraper.get_modified_times()
+    assert set(modified_times) == {"glossary.json", "General Strategy.json"}
+    assert scraper.num_parsed == len(WIKI_PAGES)
+
+    scraper.scrape()
+    for page in WIKI_PAGES:
+        assert _is_conditional(wiki.get_requests(f"/{page}")[-1])
+    # only the main page is parsed, to discover the links
+    assert scraper.num_parsed == 1
+    assert scraper.get_modified_times() == modified_times
+    http_cache = scrape_wiki._http_cache  # pylint: disable=protected-access
+    assert http_cache is not None
+    assert http_cache.num_unchanged == len(WIKI_PAGES)
+
+
+def test_no_cache_fetches_and_parses_every_page(wiki: FakeWiki, scraper: Scraper) -> None:
+    scraper.scrape(no_cache=True)
+    scraper.scrape(no_cache=True)
+
+    for page in WIKI_PAGES:
+        requests = wiki.get_requests(f"/{page}")
+        assert len(requests) == 2
+        assert not any(map(_is_conditional, requests))
+    assert scraper.num_parsed == len(WIKI_PAGES)
+    assert not os.listdir(scraper.http_cache_dirpath)
+
+
+def test_from_cache_makes_no_requests(wiki: FakeWiki, scraper: Scraper) -> None:
+    scraper.scrape()
+    for filename in os.listdir(scraper.output_dirpath):
+        os.remove(os.path.join(scraper.output_dirpath, filename))
+    num_requests = len(wiki.requests)
+
+    scraper.scrape(from_cache=True)
+
+    assert len(wiki.requests) == num_requests
+    assert scraper.num_parsed == len(WIKI_PAGES)
+    assert set(scraper.get_modified_times()) == {"glossary.json", "General Strategy.json"}
+
+
+def test_unchanged_pages_are_journaled_as_completed(wiki: FakeWiki, scraper: Scraper) -> None:
+    scraper.scrape()
+    scraper.scrape()
+
+    get_journal_filepath = (
+        scrape_wiki._get_scrape_journal_filepath
+    )  # pylint: disable=protected-access
+    journal_filepath = get_journal_filepath()
+    with ScrapeJournal(journal_filepath, resume=True) as scrape_journal:
+        assert scrape_journal.num_completed == 2
+        assert scrape_journal.is_completed(wiki.url("/Glossary"))
+        assert scrape_journal.is_completed(wiki.url("/General_Strategy"))
+
+
+def test_main_page_is_fetched_once_per_run(wiki: FakeWiki, scraper: Scraper) -> None:
+    # many more character pages than discovery pages, all extracted between uses of the main page
+    imp_paths = [f"/Imp_{copy}" for copy in range(32)]
+    for imp_path in imp_paths:
+        wiki.add_page(imp_path, read_wiki_fixture("Imp"))
+    wiki.add_page(
+        "/Category:Demons",
+        '<div id="content"><div class="mw-category-group">'
+        + "".join(f'<a href="{imp_path}">Imp</a>' for imp_path in imp_paths)
+        + "</div></div>",
+    )
+
+    scraper.scrape(all=True, no_cache=True)
+
+    assert len(wiki.get_requests("/Main_Page")) == 1
+    for category in ("/Category:Townsfolk", "/Category:Demons"):
+        assert len(wiki.get_requests(category)) == 1
+    assert set(scraper.read_outputs()) == {
+        os.path.join("editions", "Trouble Brewing.json"),
+        os.path.join("characters", "fortuneteller.json"),
+        os.path.join("characters", "imp.json"),
+        os.path.join("game-information", "glossary.json"),
+        os.path.join("game-information", "General Strategy.json"),
+    }
+
+
+def test_changed_pages_are_timed_as_fetched_once(
+    wiki: FakeWiki, scraper: Scraper, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    scraper.scrape()
+    for page in WIKI_PAGES[1:]:
+        page_text = read_wiki_fixture(page).replace("</body>", "<p>Edited</p></body>")
+        wiki.add_page(f"/{page}", page_text, ETag=f'"{page}-v2"')
+    metrics = Metrics()
+    metrics.enabled = True
+    monkeypatch.setattr(scrape_wiki, "metrics", metrics)
+
+    scraper.scrape()
+
+    fetched_urls = [record["url"] for record in metrics.records if record["stage"] == "fetch"]
+    assert sorted(fetched_urls) == sorted(wiki.url(f"/{page}") for page in WIKI_PAGES)
+    assert metrics.summarize()["fetch"]["count"] == len(WIKI_PAGES)
+    # revalidated before the changed pages are parsed, then read back from the cache
+    assert metrics.summarize()["read"]["count"] == len(WIKI_PAGES) - 1
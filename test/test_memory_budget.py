@@ -0,0 +1,105 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import pytest
+
+from content import scrape_wiki
+from content.memory_budget import MemoryBudget, estimate_parse_bytes
+from content.scrape_wiki import CHARACTER_PAGE
+
+# seconds to let a thread run into waiting
+WAIT_SECONDS = 0.2
+
+
+def _acquire_in_thread(memory_budget: MemoryBudget, num_bytes: int) -> threading.Event:
+    """Acquire bytes of the budget on another thread, returning an event set once acquired"""
+    acquired = threading.Event()
+
+    def acquire() -> None:
+        memory_budget.acquire(num_bytes)
+        acquired.set()
+
+    threading.Thread(target=acquire, daemon=True).start()
+    return acquired
+
+
+def _is_released(memory_budget: MemoryBudget) -> bool:
+    """Whether the whole budget can be acquired without waiting"""
+    num_waits = memory_budget.num_waits
+    acquired = _acquire_in_thread(memory_budget, memory_budget.budget_bytes)
+    if not acquired.wait(WAIT_SECONDS):
+        return False
+    memory_budget.release(memory_budget.budget_bytes)
+    return memory_budget.num_waits == num_waits
+
+
+def test_acquire_waits_until_released() -> None:
+    memory_budget = MemoryBudget(100)
+    memory_budget.acquire(60)
+
+    acquired = _acquire_in_thread(memory_budget, 60)
+    assert not acquired.wait(WAIT_SECONDS)
+    memory_budget.release(60)
+    assert acquired.wait(WAIT_SECONDS)
+
+    assert memory_budget.num_waits == 1
+    assert memory_budget.peak_reserved_bytes == 60
+
+
+def test_oversized_page_runs_alone() -> None:
+    memory_budget = MemoryBudget(100)
+
+    # let through rather than waiting forever for a budget it can never fit in
+    memory_budget.acquire(500)
+    acquired = _acquire_in_thread(memory_budget, 10)
+    assert not acquired.wait(WAIT_SECONDS)
+    memory_budget.release(500)
+    assert acquired.wait(WAIT_SECONDS)
+
+    assert memory_budget.peak_reserved_bytes == 500
+
+
+def test_reserve_releases_on_error() -> None:
+    memory_budget = MemoryBudget(100)
+
+    with pytest.raises(ValueError):
+        with memory_budget.reserve(80):
+            raise ValueError("Cannot extract")
+
+    assert _is_released(memory_budget)
+
+
+@pytest.fixture(name="memory_budget")
+def fixture_memory_budget(monkeypatch: pytest.MonkeyPatch) -> MemoryBudget:
+    memory_budget = MemoryBudget(estimate_parse_bytes("<p>Imp</p>"))
+    monkeypatch.setattr(scrape_wiki, "_memory_budget", memory_budget)
+    return memory_budget
+
+
+def test_failed_extraction_releases_budget(
+    memory_budget: MemoryBudget, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def extract_page_text(*_: Any) -> None:
+        raise MemoryError("Cannot parse")
+
+    monkeypatch.setattr(scrape_wiki, "_extract_page_text", extract_page_text)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        extraction = scrape_wiki._submit_extraction(  # pylint: disable=protected-access
+            executor, CHARACTER_PAGE, "https://wiki.bloodontheclocktower.com/Imp", "<p>Imp</p>"
+        )
+        assert isinstance(extraction.exception(), MemoryError)
+
+    assert _is_released(memory_budget)
+
+
+def test_failed_submission_releases_budget(memory_budget: MemoryBudget) -> None:
+    executor = ThreadPoolExecutor(max_workers=1)
+    executor.shutdown()
+
+    with pytest.raises(RuntimeError):
+        scrape_wiki._submit_extraction(  # pylint: disable=protected-access
+            executor, CHARACTER_PAGE, "https://wiki.bloodontheclocktower.com/Imp", "<p>Imp</p>"
+        )
+
+    assert _is_released(memory_budget)
@@ -0,0 +1,100 @@
+import os
+from typing import Any
+
+import pytest
+
+from content.output_writer import (
+    OutputWriter,
+    WriteStats,
+    serialize_json,
+    write_if_changed,
+)
+
+DATA = {"name": "Imp", "id": "imp"}
+
+
+def test_write_if_changed_skips_identical_content(tmp_path: Any) -> None:
+    filepath = os.path.join(tmp_path, "imp.json")
+    stats = WriteStats()
+
+    assert write_if_changed(filepath, b'{"id": "imp"}', stats)
+    modified_time = os.stat(filepath).st_mtime_ns
+    assert not write_if_changed(filepath, b'{"id": "imp"}', stats)
+    assert os.stat(filepath).st_mtime_ns == modified_time
+
+    assert (stats.num_written, stats.bytes_written) == (1, 13)
+    assert (stats.num_skipped, stats.bytes_saved) == (1, 13)
+
+
+@pytest.mark.parametrize("content", [b'{"id": "spy"}', b'{"id": "imp", "team": "demon"}'])
+def test_write_if_changed_replaces_different_content(tmp_path: Any, content: bytes) -> None:
+    filepath = os.path.join(tmp_path, "imp.json")
+    write_if_changed(filepath, b'{"id": "imp"}')
+
+    assert write_if_changed(filepath, content)
+    with open(filepath, "rb") as file:
+        assert file.read() == content
+    # the temporary file is renamed into place
+    assert os.listdir(tmp_path) == ["imp.json"]
+
+
+def test_failed_write_leaves_no_temporary_file(tmp_path: Any) -> None:
+    filepath = os.path.join(tmp_path, "imp.json")
+    write_if_changed(filepath, b'{"id": "imp"}')
+    # a directory cannot be replaced by the temporary file
+    os.mkdir(os.path.join(tmp_path, "spy.json"))
+
+    with pytest.raises(IsADirectoryError):
+        write_if_changed(os.path.join(tmp_path, "spy.json"), b'{"id": "spy"}')
+    with open(filepath, "rb") as file:
+        assert file.read() == b'{"id": "imp"}'
+    assert sorted(os.listdir(tmp_path)) == ["imp.json", "spy.json"]
+
+
+def test_serialize_json() -> None:
+    assert serialize_json(DATA, compact=True) == b'{"id":"imp","name":"Imp"}'
+    assert serialize_json(DATA) == b'{\n    "id": "imp",\n    "name": "Imp"\n}'
+
+
+def test_output_writer_writes_in_background(tmp_path: Any) -> None:
+    written_filenames = []
+    with OutputWriter(compact=True, max_pending=1) as output_writer:
+        for filename in ("imp.json", "spy.json", "imp.json"):
+            output_writer.write(
+                os.path.join(tmp_path, filename),
+                DATA,
+                lambda f=filename: written_filenames.append(f),
+            )
+
+    assert written_filenames == ["imp.json", "spy.json", "imp.json"]
+    assert output_writer.stats.num_written == 2
+    assert output_writer.stats.num_skipped == 1
+
+
+def test_output_writer_raises_write_error(tmp_path: Any) -> None:
+    output_writer = OutputWriter()
+    output_writer.write(os.path.join(tmp_path, "missing", "imp.json"), DATA)
+    output_writer.write(os.path.join(tmp_path, "spy.json"), DATA)
+
+    with pytest.raises(FileNotFoundError):
+        output_writer.flush()
+    # writes queued after the error are dropped
+    assert not os.listdir(tmp_path)
+    with pytest.raises(FileNotFoundError):
+        output_writer.close()
+
+
+def test_output_writer_error_is_sticky(tmp_path: Any) -> None:
+    output_writer = OutputWriter()
+    output_writer.write(os.path.join(tmp_path, "missing", "imp.json"), DATA)
+    with pytest.raises(FileNotFoundError):
+        output_writer.flush()
+
+    # the error keeps being raised instead of letting later writes through
+    with pytest.raises(FileNotFoundError):
+        output_writer.write(os.path.join(tmp_path, "spy.json"), DATA)
+    with pytest.raises(FileNotFoundError):
+        output_writer.flush()
+    with pytest.raises(FileNotFoundError):
+        output_writer.close()
+    assert not os.listdir(tmp_path)
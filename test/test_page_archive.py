@@ -0,0 +1,58 @@
+import os
+from typing import Any
+
+import pytest
+
+from content.page_archive import PageArchive
+
+URL_TO_PAGE_TEXT = {
+    "https://wiki.bloodontheclocktower.com/Imp": "<h1>Imp</h1>",
+    "https://wiki.bloodontheclocktower.com/Lil'_Monsta?action=raw": "<h1>Lil’ Monsta</h1>",
+}
+
+
+def _record(archive_filepath: str) -> None:
+    with PageArchive(archive_filepath, record=True) as page_archive:
+        for url, page_text in URL_TO_PAGE_TEXT.items():
+            page_archive.put(url, page_text)
+        page_archive.put("https://wiki.bloodontheclocktower.com/Imp", "<h1>Recorded later</h1>")
+
+
+def test_replays_recorded_pages(tmp_path: Any) -> None:
+    archive_filepath = os.path.join(tmp_path, "pages.zip")
+    _record(archive_filepath)
+
+    with PageArchive(archive_filepath) as page_archive:
+        assert not page_archive.recording
+        assert page_archive.get_urls() == list(URL_TO_PAGE_TEXT)
+        for url, page_text in URL_TO_PAGE_TEXT.items():
+            assert page_archive.get(url) == page_text
+        with pytest.raises(LookupError):
+            page_archive.get("https://wiki.bloodontheclocktower.com/Spy")
+
+
+def test_recording_is_reproducible(tmp_path: Any) -> None:
+    archive_filepaths = [os.path.join(tmp_path, f"pages-{i}.zip") for i in range(2)]
+    for archive_filepath in archive_filepaths:
+        _record(archive_filepath)
+
+    archive_data = []
+    for archive_filepath in archive_filepaths:
+        with open(archive_filepath, "rb") as file:
+            archive_data.append(file.read())
+    assert archive_data[0] == archive_data[1]
+
+
+def test_recording_replaces_archive_once_closed(tmp_path: Any) -> None:
+    archive_filepath = os.path.join(tmp_path, "pages.zip")
+    _record(archive_filepath)
+
+    page_archive = PageArchive(archive_filepath, record=True)
+    page_archive.put("https://wiki.bloodontheclocktower.com/Spy", "<h1>Spy</h1>")
+    with PageArchive(archive_filepath) as previous_page_archive:
+        assert previous_page_archive.get_urls() == list(URL_TO_PAGE_TEXT)
+
+    page_archive.close()
+    with PageArchive(archive_filepath) as page_archive:
+        assert page_archive.get_urls() == ["https://wiki.bloodontheclocktower.com/Spy"]
+    assert os.listdir(tmp_path) == ["pages.zip"]
@@ -0,0 +1,26 @@
+import pytest
+from conftest import read_wiki_fixture
+
+from content.page_index import PageIndex, SearchingPageIndex
+from content.scrape_stream import PAGE_KIND_TO_EXTRACTOR
+from content.scrape_wiki import PARSERS, parse_page
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+@pytest.mark.parametrize(
+    "page, page_kind",
+    [
+        ("Imp", "character"),
+        ("Fortune_Teller", "character"),
+        ("Trouble_Brewing", "edition"),
+        ("Glossary", "glossary"),
+        ("General_Strategy", "game-information"),
+    ],
+)
+def test_searching_extracts_the_same_as_indexing(page: str, page_kind: str, parser: str) -> None:
+    extractor = PAGE_KIND_TO_EXTRACTOR[page_kind]
+    soup = parse_page(read_wiki_fixture(page), extractor.regions, parser)
+
+    assert extractor.extract(SearchingPageIndex(soup), page) == extractor.extract(
+        PageIndex(soup), page
+    )
@@ -0,0 +1,76 @@
+import os
+from typing import Any
+
+from content.scrape_journal import ScrapeJournal
+
+LINKS = ["https://wiki.bloodontheclocktower.com/Imp", "https://wiki.bloodontheclocktower.com/Spy"]
+
+
+def _write_output(tmp_path: Any, filename: str) -> str:
+    filepath = os.path.join(tmp_path, filename)
+    with open(filepath, "w", encoding="utf-8") as file:
+        file.write("{}")
+    return filepath
+
+
+def test_resumes_discovered_links_and_completed_pages(tmp_path: Any) -> None:
+    journal_filepath = os.path.join(tmp_path, "scrape-journal.jsonl")
+    with ScrapeJournal(journal_filepath) as scrape_journal:
+        scrape_journal.add_links("character", LINKS)
+        scrape_journal.complete(LINKS[0], _write_output(tmp_path, "imp.json"))
+
+    with ScrapeJournal(journal_filepath, resume=True) as scrape_journal:
+        assert scrape_journal.get_links("character") == LINKS
+        assert scrape_journal.get_links("edition") is None
+        assert scrape_journal.is_completed(LINKS[0])
+        assert not scrape_journal.is_completed(LINKS[1])
+        scrape_journal.complete(LINKS[1], _write_output(tmp_path, "spy.json"))
+
+    with ScrapeJournal(journal_filepath, resume=True) as scrape_journal:
+        assert scrape_journal.num_completed == 2
+
+
+def test_starting_over_discards_the_journal(tmp_path: Any) -> None:
+    journal_filepath = os.path.join(tmp_path, "scrape-journal.jsonl")
+    with ScrapeJournal(journal_filepath) as scrape_journal:
+        scrape_journal.add_links("character", LINKS)
+
+    with ScrapeJournal(journal_filepath) as scrape_journal:
+        assert scrape_journal.get_links("character") is None
+    with ScrapeJournal(journal_filepath, resume=True) as scrape_journal:
+        assert scrape_journal.get_links("character") is None
+
+
+def test_page_whose_output_is_gone_is_not_completed(tmp_path: Any) -> None:
+    journal_filepath = os.path.join(tmp_path, "scrape-journal.jsonl")
+    with ScrapeJournal(journal_filepath) as scrape_journal:
+        scrape_journal.complete(LINKS[0], _write_output(tmp_path, "imp.json"))
+    os.remove(os.path.join(tmp_path, "imp.json"))
+
+    with ScrapeJournal(journal_filepath, resume=True) as scrape_journal:
+        assert not scrape_journal.is_completed(LINKS[0])
+
+
+def test_truncated_last_record_is_ignored(tmp_path: Any) -> None:
+    journal_filepath = os.path.join(tmp_path, "scrape-journal.jsonl")
+    with ScrapeJournal(journal_filepath) as scrape_journal:
+        scrape_journal.add_links("character", LINKS)
+        scrape_journal.complete(LINKS[0], _write_output(tmp_path, "imp.json"))
+    # a crash in the middle of appending the last record
+    with open(journal_filepath, "a", encoding="utf-8") as file:
+        file.write('{"url": "https://wiki.bloodontheclocktower.com/Spy", "out')
+
+    with ScrapeJournal(journal_filepath, resume=True) as scrape_journal:
+        assert scrape_journal.get_links("character") == LINKS
+        assert scrape_journal.num_completed == 1
+
+
+def test_records_are_synced_in_batches(tmp_path: Any) -> None:
+    journal_filepath = os.path.join(tmp_path, "scrape-journal.jsonl")
+    with ScrapeJournal(journal_filepath, sync_interval=2) as scrape_journal:
+        scrape_journal.add_links("character", LINKS)
+        assert os.path.getsize(journal_filepath) == 0
+        scrape_journal.complete(LINKS[0], _write_output(tmp_path, "imp.json"))
+
+        with open(journal_filepath, "r", encoding="utf-8") as file:
+            assert len(file.readlines()) == 2
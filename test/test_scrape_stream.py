@@ -0,0 +1,124 @@
+import io
+import json
+import sys
+import threading
+import time
+from typing import Iterator, Optional
+
+import pytest
+from conftest import FakeWiki, Fault, read_wiki_fixture
+
+from content import scrape_wiki
+from content.common import get_console
+from content.fetch_scheduler import FetchScheduler
+from content.page_index import PageIndex
+from content.scrape_stream import (
+    PAGES_IN_FLIGHT_PER_THREAD,
+    classify_page,
+    main,
+    stream_pages,
+    write_json_lines,
+)
+from content.scrape_wiki import CHARACTER_REGIONS, parse_page
+
+
+@pytest.fixture(name="stream_wiki")
+def fixture_stream_wiki(wiki: FakeWiki, monkeypatch: pytest.MonkeyPatch) -> FakeWiki:
+    """The fake wiki serving every saved wiki page, fetched without rate limits"""
+    monkeypatch.setattr(scrape_wiki, "MAIN_PAGE_URL", wiki.url("/Main_Page"))
+    monkeypatch.setattr(scrape_wiki, "_fetch_scheduler", FetchScheduler(rate=0, max_concurrency=4))
+    # restore the globals set by the command line
+    for name in ("_http_cache", "_page_archive", "_memory_budget", "_parser"):
+        monkeypatch.setattr(scrape_wiki, name, getattr(scrape_wiki, name))
+    console = get_console()
+    monkeypatch.setattr(console, "stderr", console.stderr)
+    return wiki
+
+
+@pytest.mark.parametrize(
+    "page, page_kind",
+    [
+        ("Imp", "character"),
+        ("Fortune_Teller", "character"),
+        ("Trouble_Brewing", "edition"),
+        ("Glossary", "glossary"),
+        ("General_Strategy", "game-information"),
+        ("Main_Page", None),
+    ],
+)
+def test_classify_page(page: str, page_kind: Optional[str]) -> None:
+    index = PageIndex(parse_page(read_wiki_fixture(page), CHARACTER_REGIONS))
+
+    assert classify_page(index) == page_kind
+
+
+@pytest.mark.parametrize("ordered", [False, True])
+def test_pages_are_streamed_as_finished_unless_ordered(
+    stream_wiki: FakeWiki, ordered: bool
+) -> None:
+    stream_wiki.add_faults("/Imp", Fault(delay=0.5))
+    urls = [stream_wiki.url("/Imp"), stream_wiki.url("/Glossary")]
+
+    scraped_pages = list(stream_pages(urls, concurrency=2, ordered=ordered))
+
+    assert [scraped_page.kind for scraped_page in scraped_pages] == (
+        ["character", "glossary"] if ordered else ["glossary", "character"]
+    )
+    assert all(scraped_page.data for scraped_page in scraped_pages)
+
+
+def test_urls_are_read_while_pages_are_yielded(stream_wiki: FakeWiki) -> None:
+    paths = [f"/Imp_{copy}" for copy in range(16)]
+    for path in paths:
+        stream_wiki.add_page(path, read_wiki_fixture("Imp"))
+    num_read = 0
+    lock = threading.Lock()
+
+    def read_urls() -> Iterator[str]:
+        nonlocal num_read
+        for path in paths:
+            with lock:
+                num_read += 1
+            yield stream_wiki.url(path)
+
+    concurrency = 2
+    scraped_pages = stream_pages(read_urls(), concurrency=concurrency)
+    scraped_page = next(scraped_pages)
+    time.sleep(0.5)
+
+    # the pages in flight and the URL waiting for one of them to be yielded
+    assert num_read == concurrency * PAGES_IN_FLIGHT_PER_THREAD + 1
+    assert len([scraped_page, *scraped_pages]) == len(paths)
+
+
+def test_pages_that_cannot_be_scraped_have_null_data(stream_wiki: FakeWiki) -> None:
+    urls = [stream_wiki.url("/Glossary"), stream_wiki.url("/Missing"), stream_wiki.url("/Imp")]
+    output = io.StringIO()
+
+    num_lines = write_json_lines(stream_pages(urls, ordered=True, page_kind="character"), output)
+
+    assert num_lines == len(urls)
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [line["url"] for line in lines] == urls
+    # extracting the glossary as a character fails, the missing page cannot be fetched
+    assert [line["data"] is None for line in lines] == [True, True, False]
+    assert {line["kind"] for line in lines} == {"character"}
+
+
+def test_main_streams_listed_pages(
+    stream_wiki: FakeWiki,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    monkeypatch.setattr(sys, "stdin", io.StringIO("Imp\n# comment\n\nTrouble_Brewing\n"))
+    monkeypatch.setattr(
+        sys, "argv", ["scrape_stream.py", "-", "--ordered", "--no-cache", "--rate", "0"]
+    )
+
+    main()
+
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(line["url"], line["kind"]) for line in lines] == [
+        (stream_wiki.url("/Imp"), "character"),
+        (stream_wiki.url("/Trouble_Brewing"), "edition"),
+    ]
@@ -0,0 +1,84 @@
+import os
+from typing import Any, Optional
+
+import pytest
+from conftest import Scraper
+
+from content.page_index import PageIndex
+from content.scrape_wiki import (
+    CHARACTER_PAGE,
+    EDITION_PAGE,
+    GAME_INFORMATION_PAGE,
+    GLOSSARY_PAGE,
+    PARSERS,
+    parse_page,
+)
+
+WIKI_FIXTURES_DIRPATH = os.path.join(os.path.dirname(__file__), "fixtures", "wiki")
+PAGE_TO_EXTRACTOR = {
+    "Imp": CHARACTER_PAGE,
+    "Fortune_Teller": CHARACTER_PAGE,
+    "Trouble_Brewing": EDITION_PAGE,
+    "Glossary": GLOSSARY_PAGE,
+    "General_Strategy": GAME_INFORMATION_PAGE,
+}
+
+
+def _extract(page: str, parser: str, regions: Optional[tuple[str, ...]]) -> Any:
+    with open(os.path.join(WIKI_FIXTURES_DIRPATH, f"{page}.html"), encoding="utf-8") as file:
+        page_text = file.read()
+    url = f"https://wiki.bloodontheclocktower.com/{page}"
+    return PAGE_TO_EXTRACTOR[page].extract(PageIndex(parse_page(page_text, regions, parser)), url)
+
+
+@pytest.mark.parametrize("page", PAGE_TO_EXTRACTOR)
+def test_parsers_extract_identically(page: str) -> None:
+    regions = PAGE_TO_EXTRACTOR[page].regions
+    extracted = [_extract(page, parser, regions) for parser in PARSERS]
+
+    assert extracted[0]
+    assert all(data == extracted[0] for data in extracted[1:])
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+@pytest.mark.parametrize("page", PAGE_TO_EXTRACTOR)
+def test_partial_parsing_extracts_as_full_tree(page: str, parser: str) -> None:
+    assert _extract(page, parser, PAGE_TO_EXTRACTOR[page].regions) == _extract(page, parser, None)
+
+
+def test_extract_character_page() -> None:
+    character = _extract("Fortune_Teller", "html.parser", CHARACTER_PAGE.regions)
+
+    assert character["id"] == "fortuneteller"
+    assert character["edition"] == "trouble brewing"
+    # without a category of its type, the type is inferred from where it appears
+    assert character["team"] == "Trouble Brewing"
+    assert character["ability"].startswith("Each night, choose 2 players")
+    assert character["gameplay"][0].endswith("& learns a ‘no’.")
+    assert list(character["tips"]) == ["Tips & Tricks", "Bluffing as the Fortune Teller"]
+
+
+def test_extract_edition_page() -> None:
+    edition = _extract("Trouble_Brewing", "html.parser", EDITION_PAGE.regions)
+
+    assert edition["characters"] == {
+        "townsfolk": ["Washerwoman", "Fortune Teller", "Monk"],
+        "demons": ["Imp", "Al-Hadikhia"],
+    }
+    assert edition["difficulty"] == "Beginner"
+    assert edition["guide"]["evil players"] == "Evil players will lie."
+
+
+@pytest.mark.parametrize("memory_budget", [None, 1.0])
+def test_parse_processes_write_the_same_files(
+    scraper: Scraper, memory_budget: Optional[float]
+) -> None:
+    scraper.scrape(all=True, no_cache=True, memory_budget=memory_budget)
+    outputs = scraper.read_outputs()
+    for output in outputs:
+        os.remove(os.path.join(os.path.dirname(scraper.output_dirpath), output))
+
+    scraper.scrape(all=True, no_cache=True, memory_budget=memory_budget, processes=2)
+
+    assert len(outputs) == 5
+    assert scraper.read_outputs() == outputs
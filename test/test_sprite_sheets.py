@@ -0,0 +1,136 @@
+import json
+import os
+from typing import Any
+
+import pytest
+
+from content import enrich_characters, sprite_sheets
+from content.common import get_output_characters_dir, get_raw_characters_dir
+from content.sprite_sheets import SpriteSheet, build_sprite_sheets, record_sprite
+
+ICON_SIZE = 16
+# edition and whether the character has an icon, by character id
+CHARACTERS = {
+    "imp": ("Trouble Brewing", True),
+    "spy": ("Trouble Brewing", True),
+    "washerwoman": ("Trouble Brewing", True),
+    "poisoner": ("Trouble Brewing", True),
+    "zombuul": ("Bad Moon Rising", True),
+    "mime": ("Bad Moon Rising", False),
+}
+
+
+def _read_json(filepath: str) -> Any:
+    with open(filepath, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _write_json(filepath: str, data: Any) -> None:
+    with open(filepath, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+
+
+@pytest.fixture(name="characters_dirpath")
+def fixture_characters_dirpath(root_dir: str) -> str:
+    """Raw characters with icons, enriched into the output directory"""
+    from PIL import Image  # pylint: disable=import-outside-toplevel
+
+    icons_dirpath = os.path.join(root_dir, "static", "icons")
+    os.makedirs(icons_dirpath)
+    for character_id, (edition, has_icon) in CHARACTERS.items():
+        image = f"static/icons/{character_id}.png"
+        if has_icon:
+            Image.new("RGBA", (32, 32), (len(character_id), 0, 0, 255)).save(
+                os.path.join(root_dir, image)
+            )
+        _write_json(
+            os.path.join(get_raw_characters_dir(), f"{character_id}.json"),
+            {"id": character_id, "edition": edition, "image": image},
+        )
+    enrich_characters.enrich()
+    return get_output_characters_dir()
+
+
+def test_sheet_packs_icons_row_by_row() -> None:
+    sheet = SpriteSheet("tb", ["a", "b", "c", "d", "e"], [""] * 5, ICON_SIZE)
+
+    assert (sheet.columns, sheet.rows) == (3, 2)
+    assert [sheet.get_offset(index) for index in range(5)] == [
+        (0, 0),
+        (16, 0),
+        (32, 0),
+        (0, 16),
+        (16, 16),
+    ]
+    empty_sheet = SpriteSheet("empty", [], [], ICON_SIZE)
+    assert (empty_sheet.columns, empty_sheet.rows) == (1, 1)
+
+
+def test_record_sprite() -> None:
+    sprite = {"png": "assets/sprites/tb.png", "x": 0, "y": 0}
+    character = {"id": "imp"}
+
+    assert record_sprite(character, {"imp": sprite})
+    assert character["sprite"] == sprite
+    assert not record_sprite(character, {"imp": dict(sprite)})
+    assert record_sprite(character, {})
+    assert "sprite" not in character
+    assert not record_sprite(character, {})
+
+
+def test_build_sprite_sheets(root_dir: str, characters_dirpath: str) -> None:
+    from PIL import Image  # pylint: disable=import-outside-toplevel
+
+    build_sprite_sheets(icon_size=ICON_SIZE, processes=1)
+
+    sprites_dirpath = os.path.join(root_dir, "assets", "sprites")
+    assert sorted(os.listdir(sprites_dirpath)) == [
+        "bad-moon-rising.png",
+        "bad-moon-rising.webp",
+        "manifest.json",
+        "trouble-brewing.png",
+        "trouble-brewing.webp",
+    ]
+    with Image.open(os.path.join(sprites_dirpath, "trouble-brewing.png")) as image:
+        assert image.size == (2 * ICON_SIZE, 2 * ICON_SIZE)
+        # icons are packed in the order of character ids
+        assert image.getpixel((ICON_SIZE, 0))[0] == len("poisoner")
+
+    sprite_manifest = _read_json(os.path.join(sprites_dirpath, "manifest.json"))
+    assert sorted(sprite_manifest) == ["imp", "poisoner", "spy", "washerwoman", "zombuul"]
+    assert sprite_manifest["washerwoman"] == {
+        "png": "assets/sprites/trouble-brewing.png",
+        "webp": "assets/sprites/trouble-brewing.webp",
+        "x": ICON_SIZE,
+        "y": ICON_SIZE,
+        "width": ICON_SIZE,
+        "height": ICON_SIZE,
+    }
+    for character_id in CHARACTERS:
+        character = _read_json(os.path.join(characters_dirpath, f"{character_id}.json"))
+        assert character.get("sprite") == sprite_manifest.get(character_id)
+
+
+def test_rebuilt_characters_keep_sprites(
+    characters_dirpath: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # of the icon size enrichment builds sprite sheets with
+    build_sprite_sheets(processes=1)
+    imp_filepath = os.path.join(characters_dirpath, "imp.json")
+    sprite = _read_json(imp_filepath)["sprite"]
+
+    raw_imp_filepath = os.path.join(get_raw_characters_dir(), "imp.json")
+    _write_json(raw_imp_filepath, {**_read_json(raw_imp_filepath), "name": "Imp"})
+    enrich_characters.enrich()
+    assert _read_json(imp_filepath)["sprite"] == sprite
+    assert _read_json(imp_filepath)["name"] == "Imp"
+
+    # sprites are recorded as rebuilt characters are written rather than rewritten afterwards
+    annotated_filepaths = []
+    monkeypatch.setattr(
+        sprite_sheets, "write_json", lambda filepath, _: annotated_filepaths.append(filepath)
+    )
+    _write_json(raw_imp_filepath, {**_read_json(raw_imp_filepath), "name": "The Imp"})
+    enrich_characters.enrich(sprites=True)
+    assert _read_json(imp_filepath)["name"] == "The Imp"
+    assert imp_filepath not in annotated_filepaths